@@ -1,18 +1,30 @@
 import argparse
 import os.path
 
+from .instagram.batch import BatchScraper, Target, read_targets
+from .instagram.feed import FeedScraper
 from .instagram.post import Downloader
 from .instagram.url import URLScraper
-from .utils.webaddr import get_url, validate_url
+from .utils import settings
+from .utils.cache import PostCache
+from .utils.index import DownloadIndex
+from .utils.meta import SINKS, open_sink
+from .utils.postprocess import PostProcessor
+from .utils.settings import CACHE_TTL, POOL_MAXSIZE, RATE_LIMIT
+from .utils.store import ContentStore
+from .utils.webaddr import get_url
+from .utils.writer import DiskWriter
 from .web.client import HTTPHeaders
 from .web.geckoloader import GeckoLoader
+from .web.ratelimit import RateLimiter
+from .web.session import HTTPSession
 
 
 def get_arguments():
     """Get arguments passed to the program by the user."""
 
     name = "instasave"
-    usage = "%(prog)s [options] input"
+    usage = "%(prog)s [options] input\n       %(prog)s [options] --batch FILE"
     descr = (
         "Download images, videos and metadata from public Instagram posts."
         "Can scrape data from individual post's URL or multiple posts from a"
@@ -22,6 +34,7 @@ def get_arguments():
     parser = argparse.ArgumentParser(prog=name, usage=usage, description=descr)
     parser.add_argument(
         "input",
+        nargs="?",
         help=(
             "URL to post, users or hashtags."
             "A name is enough for users and hashtags."
@@ -54,28 +67,181 @@ def get_arguments():
         action="store_true",
         help="Download posts from a hashtag page.",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Download this many posts and files at the same time.",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=float,
+        default=RATE_LIMIT,
+        metavar="N",
+        help=(
+            "Send at most this many requests per second to a host, "
+            "0 for no limit."
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=CACHE_TTL,
+        metavar="SECONDS",
+        help="Revalidate cached post data older than this.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always fetch post data from the post pages.",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=settings.BASE_URL,
+        metavar="URL",
+        help="Fetch pages from another server, like a local fake Instagram.",
+    )
+    parser.add_argument(
+        "--batch",
+        type=argparse.FileType("r"),
+        metavar="FILE",
+        help=(
+            "Download from every user, #hashtag and post url in the file, "
+            "one per line. Use - to read from stdin."
+        ),
+    )
+    parser.add_argument(
+        "--feed-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Scrape this many users and hashtags at the same time.",
+    )
+    parser.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help=(
+            "Rebuild the index of downloaded posts from the files in the "
+            "download location."
+        ),
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help=(
+            "Store files with the same content once and link them into "
+            "every post they belong to."
+        ),
+    )
+    parser.add_argument(
+        "--meta",
+        choices=list(SINKS),
+        default="csv",
+        help=(
+            "Save data about every downloaded file in data.csv, data.jsonl "
+            "or data.sqlite3 in the download location."
+        ),
+    )
+    parser.add_argument(
+        "--process-workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Check and strip meta data from downloaded files in this many "
+            "processes, 0 to do it in the download threads."
+        ),
+    )
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help=(
+            "Download files to local temporary storage and write them to "
+            "the download location in a thread of its own, so slow storage "
+            "doesn't hold up the downloads."
+        ),
+    )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="Sync written files to disk, used together with --write-behind.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["browser", "http"],
+        default="browser",
+        help=(
+            "Scroll through user and hashtag feeds in a browser, or page "
+            "through them over plain HTTP."
+        ),
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Record every request and response into an archive.",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Answer every request from an archive made with --record.",
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Replay with the recorded latency, used together with --replay.",
+    )
 
     args = parser.parse_args()
 
+    if not args.input and not args.batch and not args.rebuild_index:
+        raise parser.error("input or --batch FILE is required")
+
     # Check that there is a download limit if hashtag is set.
     if args.hashtag and args.post < 1:
         raise parser.error(
             "-p LIMIT, --post LIMIT is required if -H, --hashtag is set"
         )
 
-    return parser.parse_args()
+    if args.workers < 1:
+        raise parser.error("-w N, --workers N must be at least 1")
+
+    if args.feed_workers < 1:
+        raise parser.error("--feed-workers N must be at least 1")
+
+    if args.process_workers < 0:
+        raise parser.error("--process-workers N can't be negative")
+
+    if args.rate < 0:
+        raise parser.error("-r N, --rate N can't be negative")
+
+    if args.record and args.replay:
+        raise parser.error("--record and --replay can't be used together")
+
+    if args.fsync and not args.write_behind:
+        raise parser.error("--write-behind is required if --fsync is set")
 
+    if args.realtime and not args.replay:
+        raise parser.error("--replay FILE is required if --realtime is set")
 
-def set_downloader(headers, output, verbose):
-    """Prepare to download files."""
+    return args
+
+
+def set_downloader(headers, output, verbose, **options):
+    """Prepare to download files.
+
+    Any other options, like the session and number of workers, are passed
+    on to the Downloader.
+    """
 
     # Set custom download location.
-    if output:
-        if not os.path.exists(output[0]):
-            raise SystemExit("Path doesn't exist.")
-        return Downloader(headers, output, verbose=verbose)
+    if output and not os.path.exists(output[0]):
+        raise SystemExit("Path doesn't exist.")
 
-    return Downloader(headers, verbose=verbose)
+    return Downloader(headers, output, verbose=verbose, **options)
 
 
 def main():
@@ -83,41 +249,217 @@ def main():
 
     # Command line arguments from user.
     args = get_arguments()
-    urls = [args.input]
-    post_limit = args.post
-    is_hashtag = args.hashtag
     is_verbose = args.verbose
-    output_path = args.output
+    workers = args.workers
+
+    # Every Instagram url is built from the base url.
+    settings.BASE_URL = args.base_url.rstrip("/")
 
     # HTTP headers with random user agent for requests.
     http_req = HTTPHeaders(is_verbose)
     headers = http_req.headers
     useragent = http_req.headers["User-Agent"]
 
-    # Get latest geckdriver for the system if isn't already in path.
-    GeckoLoader(headers, is_verbose)
+    # Replayed requests never reach a server, so they aren't rate limited.
+    limiter = None
+    if not args.replay:
+        limiter = RateLimiter(args.rate, verbose=is_verbose)
+
+    # Connection pooled session that every request is sent through.
+    # Every worker may hold one connection for a post and one for a file.
+    session = HTTPSession(
+        headers,
+        pool_maxsize=max(POOL_MAXSIZE, workers * 2),
+        limiter=limiter,
+    )
+
+    if args.record:
+        session.record(args.record)
+    elif args.replay:
+        session.replay(args.replay, args.realtime)
+
+    # Everything is closed even if the run is stopped, so a recorded
+    # archive can always be replayed.
+    try:
+        run(args, headers, useragent, session)
+    finally:
+        session.close()
+
 
-    # Set custom download directory otherwise use current working directory.
-    file = set_downloader(headers, output_path, is_verbose)
-    output_path = file.output
+def run(args, headers, useragent, session):
+    """Scrape the targets and download their posts with the session."""
 
-    # Scrape post data from user or hashtag feed.
-    if post_limit > 0:
+    post_limit = args.post
+    is_hashtag = args.hashtag
+    is_verbose = args.verbose
+    output_path = args.output
+    workers = args.workers
+
+    # Users, hashtags and posts to download from, if there is anything
+    # else to do than to rebuild the index.
+    if args.batch:
+        targets = read_targets(args.batch)
+        args.batch.close()
+    elif not args.input:
+        targets = []
+    elif post_limit > 0:
         # Get full url to the username or hashtag.
-        page_url = get_url(urls[0], is_hashtag)
-        if page_url:
-            webdriver = URLScraper(useragent, output_path)
-            webdriver.open(page_url)
-            urls = webdriver.scrape(post_limit, is_hashtag)
-            webdriver.close()
-
-    # Download files and save them to the output directory.
-    for url in urls:
-        post = validate_url(url)
-        file.download(post)
-
-    if not is_verbose:
-        print()
+        kind = "hashtag" if is_hashtag else "user"
+        targets = [Target(kind, get_url(args.input, is_hashtag))]
+    else:
+        targets = [Target("post", args.input)]
+
+    if post_limit < 1 and any(t.kind != "post" for t in targets):
+        raise SystemExit("-p LIMIT is required to download users or hashtags")
+
+    # Get latest geckdriver for the system if isn't already in path.
+    if targets and args.backend == "browser":
+        GeckoLoader(headers, is_verbose, session)
+
+    cache = None
+    index = None
+
+    try:
+        # Set custom download directory otherwise use current working
+        # directory.
+        file = set_downloader(
+            headers,
+            output_path,
+            is_verbose,
+            session=session,
+            workers=workers,
+        )
+        output_path = file.output
+
+        # Index of downloaded posts, built from the files on disk if it's new.
+        index = file.index = DownloadIndex(output_path)
+        if index.is_new or args.rebuild_index:
+            count = index.rebuild()
+            if is_verbose or args.rebuild_index:
+                print(f"Indexed {count} downloaded files.")
+
+        # Nothing else is opened when the index is only rebuilt.
+        if not targets:
+            return
+
+        # Cache with post data from already fetched post pages.
+        if not args.no_cache:
+            cache = file.cache = PostCache(ttl=args.cache_ttl)
+
+        # Store files with the same content only once.
+        store = None
+        if args.dedup:
+            store = file.store = ContentStore(output_path)
+
+        # Data about every downloaded file, written in batches.
+        meta = file.meta = open_sink(args.meta, output_path)
+
+        # Processes that downloaded files are moved into place in.
+        processor = None
+        if args.process_workers:
+            processor = PostProcessor(args.process_workers)
+            file.processor = processor
+
+        # Thread that downloaded files are written to disk in.
+        writer = None
+        if args.write_behind:
+            writer = file.writer = DiskWriter(fsync=args.fsync)
+
+        def new_scraper():
+            """Return scraper for user and hashtag feeds."""
+
+            if args.backend == "http":
+                return FeedScraper(headers, output_path, session, index)
+
+            return URLScraper(useragent, output_path, index)
+
+        # Scrape post urls from user and hashtag feeds.
+        scraper = BatchScraper(new_scraper, args.feed_workers)
+        urls = scraper.scrape(targets, post_limit)
+
+        if is_verbose and scraper.stats:
+            stats = ", ".join(
+                f"{round(value, 2)} {key}"
+                for key, value in scraper.stats.items()
+            )
+            print(f"Scraped feeds: {stats}.")
+
+        # Download files and save them to the output directory. Buffered data
+        # about the files is written even if the downloads are stopped.
+        try:
+            file.download_all(urls)
+        finally:
+            try:
+                if writer:
+                    writer.close()
+            finally:
+                meta.close()
+                if processor:
+                    processor.close()
+
+        if not is_verbose:
+            print()
+        else:
+            stats = session.stats
+            if args.replay:
+                print(
+                    f"Replayed {stats['replayed']} requests, "
+                    f"{stats['throttled']} throttled."
+                )
+            else:
+                print(
+                    f"Sent {stats['requests']} requests over "
+                    f"{stats['connections']} connections "
+                    f"({stats['reused']} reused), "
+                    f"{stats['throttled']} throttled."
+                )
+            if cache:
+                stats = cache.stats
+                print(
+                    f"Post cache: {stats['hits']} hits, "
+                    f"{stats['misses']} misses "
+                    f"({stats['revalidated']} revalidated)."
+                )
+            if processor:
+                stats = processor.stats
+                print(
+                    f"Processed {stats['files']} files in "
+                    f"{round(stats['seconds'], 2)} seconds "
+                    f"(slowest {round(stats['max_seconds'], 3)}), "
+                    f"waited {round(stats['waited'], 2)} seconds in the queue "
+                    f"with up to {stats['max_queued']} files."
+                )
+            if writer:
+                stats = writer.stats
+                print(
+                    f"Wrote {stats['jobs']} jobs in "
+                    f"{stats['batches']} batches to "
+                    f"{stats['folders']} folders in "
+                    f"{round(stats['seconds'], 2)} seconds "
+                    f"(slowest {round(stats['max_seconds'], 3)}), waited "
+                    f"{round(stats['blocked'], 2)} seconds for a full queue "
+                    f"with up to {stats['max_queued']} jobs."
+                )
+            if store:
+                stats = store.stats
+                print(
+                    f"Content store: {stats['files']} unique files, "
+                    f"{stats['duplicates']} duplicates linked "
+                    f"({stats['saved']} bytes saved)."
+                )
+
+        # Failed targets are only skipped, but the run fails if every one
+        # of them failed, like a single post that isn't available.
+        failed = set(scraper.failed)
+        failed.update(t for t in targets if t.url in file.failed)
+        if len(failed) == len(set(targets)):
+            raise SystemExit("Nothing could be downloaded.")
+
+    finally:
+        if index:
+            index.close()
+        if cache:
+            cache.close()
 
 
 if __name__ == "__main__":
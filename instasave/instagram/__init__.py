@@ -1 +1 @@
-__all__ = ["post", "url"]
+__all__ = ["batch", "feed", "post", "record", "url"]
@@ -0,0 +1,138 @@
+import threading
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from instasave.utils.color import TextColors
+from instasave.utils.webaddr import clean_url, get_url, is_post_url
+
+# User, hashtag or post to download from, where kind is the type of page.
+Target = namedtuple("Target", ["kind", "url"])
+
+
+def read_targets(lines):
+    """Return targets from lines with users, hashtags and post urls.
+
+    Hashtags are written with a leading "#" or as an url, and blank lines
+    are skipped. Lines that can't be matched are skipped with a warning.
+
+    Args:
+        lines (iter): Lines from a batch file.
+
+    """
+
+    targets = []
+
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+
+        if not line:
+            continue
+
+        try:
+            if is_post_url(line):
+                targets.append(Target("post", clean_url(line)))
+            elif line.startswith("#"):
+                targets.append(Target("hashtag", get_url(line[1:], True)))
+            elif "/explore/tags/" in line:
+                targets.append(Target("hashtag", get_url(line, True)))
+            else:
+                targets.append(Target("user", get_url(line, False)))
+        except SystemExit:
+            text = TextColors()
+            print(text.warning(f"Skip line {number}, couldn't match {line}"))
+
+    return targets
+
+
+class BatchScraper:
+    """Collect post urls from many users and hashtags at the same time.
+
+    Every worker thread has its own scraper, with its own browser if it
+    uses one, that is reused for every target the thread scrapes.
+
+    Attributes:
+        factory (func): Return a new URLScraper or FeedScraper.
+        workers (int): Number of targets to scrape at the same time.
+        stats (Counter): Stats of every scraper added together.
+        failed (list): Targets that couldn't be scraped.
+
+    """
+
+    def __init__(self, factory, workers=1):
+        self.factory = factory
+        self.workers = workers
+        self.stats = Counter()
+        self.failed = []
+        self._local = threading.local()
+        self._scrapers = []
+        self._lock = threading.Lock()
+
+    def scrape(self, targets, limit):
+        """Return urls to posts from every target, without duplicates.
+
+        Args:
+            targets (list): Targets to collect posts from.
+            limit (int): Max number of posts from every user or hashtag.
+
+        Returns:
+            List with post urls in the same order as the targets.
+
+        """
+
+        feeds = [target for target in targets if target.kind != "post"]
+        feeds = list(dict.fromkeys(feeds))
+        workers = max(min(self.workers, len(feeds)), 1)
+
+        try:
+            with ThreadPoolExecutor(workers) as executor:
+                results = executor.map(
+                    lambda target: self._scrape(target, limit), feeds
+                )
+                results = dict(zip(feeds, results))
+        finally:
+            for scraper in self._scrapers:
+                scraper.close()
+            self._scrapers = []
+
+        urls = []
+        for target in targets:
+            if target.kind == "post":
+                urls.append(target.url)
+            else:
+                urls.extend(results[target])
+
+        return list(dict.fromkeys(urls))
+
+    def _scrape(self, target, limit):
+        """Return post urls from a user or hashtag.
+
+        A target that fails is skipped with a warning, so the rest of the
+        batch is still scraped.
+        """
+
+        try:
+            return self._scrape_target(target, limit)
+        except (SystemExit, Exception) as e:
+            text = TextColors()
+            print(text.warning(f"Skip {target.url}, {e}"))
+            with self._lock:
+                self.failed.append(target)
+            return []
+
+    def _scrape_target(self, target, limit):
+        """Return post urls from a target with the thread's scraper."""
+
+        scraper = getattr(self._local, "scraper", None)
+
+        if scraper is None:
+            scraper = self._local.scraper = self.factory()
+            with self._lock:
+                self._scrapers.append(scraper)
+
+        scraper.open(target.url)
+        urls = scraper.scrape(limit, target.kind == "hashtag")
+
+        with self._lock:
+            self.stats.update(scraper.stats)
+
+        return urls
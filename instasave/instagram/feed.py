@@ -0,0 +1,138 @@
+import json
+import re
+from urllib.parse import urlencode
+
+from instasave.instagram.url import PageSnapshot, downloaded_shortcodes
+from instasave.utils import settings
+from instasave.utils.jsonparser import MissingKeyError, extract
+from instasave.utils.settings import (
+    FEED_PAGE_SIZE,
+    HASHTAG_QUERY_HASH,
+    USER_QUERY_HASH,
+)
+from instasave.utils.webaddr import fetch_page
+
+# Paths to the first page of a feed in the shared data.
+USER_FEED = "entry_data.ProfilePage[0].graphql.user"
+HASHTAG_FEED = "entry_data.TagPage[0].graphql.hashtag"
+
+
+class FeedScraper:
+    """Collect post urls to download without a browser.
+
+    The first posts are read from the user or hashtag page, and the rest
+    are fetched page by page from the same GraphQL queries that the feed
+    uses when it's scrolled. Works as a drop-in for URLScraper.
+
+    Attributes:
+        headers (dict): HTTP headers.
+        session (obj): Session to send requests with.
+        filelist (set): Shortcodes that belongs to already downloaded
+            posts, or a DownloadIndex.
+        page (obj): PageSnapshot of the opened page.
+        stats (dict): Number of feed pages fetched in the last scrape.
+
+    """
+
+    def __init__(self, headers, output, session=None, filelist=None):
+        """Initialize set of downloaded posts, like URLScraper."""
+
+        self.headers = headers
+        self.session = session
+        if filelist is None:
+            filelist = downloaded_shortcodes(output)
+        self.filelist = filelist
+        self.page = None
+        self.stats = {}
+
+    def open(self, url):
+        """Fetch the user or hashtag page."""
+
+        self.stats = {}
+        r = fetch_page(url, self.session, self.headers, statuses=(200, 404))
+        match = re.search(r"<title>\s*(.*?)\s*</title>", r.text, re.S)
+        self.page = PageSnapshot(match.group(1) if match else "", r.text)
+
+    def close(self):
+        """Nothing to close, every request is sent through the session."""
+
+    def scrape(self, limit, hashtag):
+        """Scrape post urls if user or hashtag page exists.
+
+        Args:
+            limit (int): Stop scraping post urls when limit is reached.
+            hashtag (bool): Tell if page belongs to hashtag or user.
+
+        Returns:
+            List with urls to posts that hasn't been downloaded yet.
+
+        Raises:
+            SystemExit: The page is private or doesn't exist.
+
+        """
+
+        # Hashtag or profile doesn't exists.
+        if not self.page.exists:
+            raise SystemExit("Doesn't exists.")
+
+        # Private profile.
+        if not self.page.is_public(hashtag):
+            raise SystemExit("Account is private.")
+
+        return self._get_urls(limit, hashtag)
+
+    def _get_urls(self, limit, hashtag):
+        """Return list with post urls to download files from."""
+
+        if hashtag:
+            feed = extract(self.page.data, HASHTAG_FEED)
+            media = feed["edge_hashtag_to_media"]
+            variables = {"tag_name": feed["name"]}
+        else:
+            feed = extract(self.page.data, USER_FEED)
+            media = feed["edge_owner_to_timeline_media"]
+            variables = {"id": feed["id"]}
+
+        urls = []
+        self.stats = {"pages": 1}
+
+        while True:
+            for edge in media["edges"]:
+                # Stop when all wanted urls has been added to the list.
+                if len(urls) == limit:
+                    return urls
+
+                # Add posts not previously downloaded.
+                shortcode = edge["node"]["shortcode"]
+                if shortcode not in self.filelist:
+                    urls.append(settings.BASE_URL + "/p/" + shortcode)
+
+            # Stop at the end of the feed.
+            if len(urls) == limit or not media["page_info"]["has_next_page"]:
+                return urls
+
+            variables["after"] = media["page_info"]["end_cursor"]
+            media = self._next_page(variables, hashtag)
+            self.stats["pages"] += 1
+
+    def _next_page(self, variables, hashtag):
+        """Return next page of posts in the feed."""
+
+        variables = dict(variables, first=FEED_PAGE_SIZE)
+        query = urlencode(
+            {
+                "query_hash": (
+                    HASHTAG_QUERY_HASH if hashtag else USER_QUERY_HASH
+                ),
+                "variables": json.dumps(variables, separators=(",", ":")),
+            }
+        )
+        url = settings.BASE_URL + "/graphql/query/?" + query
+        r = fetch_page(url, self.session, self.headers)
+
+        try:
+            if hashtag:
+                return extract(r.json(), "data.hashtag.edge_hashtag_to_media")
+            return extract(r.json(), "data.user.edge_owner_to_timeline_media")
+        except (ValueError, MissingKeyError) as e:
+            raise SystemExit(f"Unexpected feed page: {e}")
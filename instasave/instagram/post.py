@@ -1,13 +1,18 @@
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import requests
 
+from instasave.instagram.record import PostRecord
 from instasave.utils import decorator, hook
 from instasave.utils.color import TextColors
+from instasave.utils.index import file_key
 from instasave.utils.jsonparser import parse_json
-from instasave.utils.path import save_file, save_meta
-from instasave.utils.settings import JSON_CSS_SELECTOR
+from instasave.utils.path import move_file, save_file
+from instasave.utils.settings import JSON_CSS_SELECTOR, STAGING_DIR
+from instasave.utils.webaddr import fetch_page, validate_url
+from instasave.web.transfer import PartialDownload
 
 
 class PostScraper:
@@ -15,39 +20,74 @@ class PostScraper:
 
     Attributes:
         headers (dict): HTTP headers.
-        data (dict): JSON data from Instagram's HTML code.
+        session (obj): Session to send requests with, falls back to
+            module level requests functions if not set.
+        cache (obj): PostCache to look up post data in before fetching it.
+        post (obj): PostRecord with the data about the post.
         verbose (bool): Display more information if set to true.
 
     """
 
-    def __init__(self, headers):
+    def __init__(self, headers, session=None, cache=None):
         """Prepare scraping post data by initializing attributes."""
         self.headers = headers
-        self.data = None
+        self.session = session or requests
+        self.cache = cache
+        self.post = None
 
     @property
     def username(self):
-        return self.data["owner"]["username"]
+        return self.post.username
 
     @property
     def shortcode(self):
-        return self.data["shortcode"]
+        return self.post.shortcode
 
     @property
     def created_at(self):
-        t = self.data["taken_at_timestamp"]
-        # Convert unix timestamp to custom date format.
-        date = datetime.utcfromtimestamp(t).strftime("%Y%m%d%H%M%S")
-        return date
+        return self.post.created_at
 
     def post_data(self, url):
-        source = requests.get(url, headers=self.headers).text
-        self.data = parse_json(source, JSON_CSS_SELECTOR, hook.shortcode_media)
-        type = self._get_type(self.data)
-        url = self._get_url(self.data, type)
+        # Only the used data is kept, the rest of the page data is dropped.
+        data = self._get_data(url)
+        self.post = PostRecord(data)
+        type = self._get_type(data)
+        url = self._get_url(data, type)
 
         return (url, type)
 
+    def _get_data(self, url):
+        """Return post data from the cache or the post page."""
+
+        shortcode = url.rstrip("/").rsplit("/", 1)[-1]
+        entry = self.cache.get(shortcode) if self.cache else None
+
+        if entry and entry.fresh:
+            return entry.data
+
+        # Ask the server if an old cached post has changed.
+        headers = dict(self.headers)
+        if entry:
+            headers.update(entry.headers)
+
+        r = fetch_page(url, self.session, headers)
+
+        if r.status_code == 304 and entry:
+            self.cache.revalidate(shortcode)
+            return entry.data
+
+        data = parse_json(r.text, JSON_CSS_SELECTOR, path=hook.SHORTCODE_MEDIA)
+
+        if self.cache:
+            self.cache.put(
+                shortcode,
+                data,
+                r.headers.get("ETag"),
+                r.headers.get("Last-Modified"),
+            )
+
+        return data
+
     def _get_type(self, data):
         """Return post type."""
         # Return the type of the post.
@@ -79,22 +119,58 @@ class PostScraper:
 class Downloader:
     """Download files from Instagram posts.
 
+    Every post gets its own PostScraper, so posts can be downloaded from
+    several threads at once without sharing any per-post state.
+
     Attributes:
-        scraper (obj): PostScraper object.
         headers (dict): HTTP headers.
         output (str): Download location.
         verbose (bool): Display more information if set to true.
+        session (obj): Session shared by every scraper.
+        workers (int): Number of posts and files to download at once.
+        cache (obj): PostCache shared by every scraper.
+        index (obj): DownloadIndex that saved files are added to.
+        store (obj): ContentStore that links files with the same content
+            to a single copy.
+        meta (obj): MetaSink that data about every saved file is added to.
+        processor (obj): PostProcessor that moves downloaded files into
+            place in other processes.
+        writer (obj): DiskWriter that saves downloaded files in the
+            background, so the next download can start right away.
+        failed (list): Urls to posts that couldn't be downloaded.
 
     """
 
-    def __init__(self, headers, output=None, verbose=False):
+    def __init__(
+        self,
+        headers,
+        output=None,
+        verbose=False,
+        session=None,
+        workers=1,
+        cache=None,
+        index=None,
+        store=None,
+        meta=None,
+        processor=None,
+        writer=None,
+    ):
         """Initialize Downloader."""
-        self.scraper = PostScraper(headers)
+        self.session = session or requests
+        self.cache = cache
+        self.index = index
+        self.store = store
+        self.meta = meta
+        self.processor = processor
+        self.writer = writer
         self.headers = headers
         self.output = output
         self.verbose = verbose
+        self.workers = workers
         self.text = TextColors()
-        self.index = 0
+        self.failed = []
+        self._files = None
+        self._lock = threading.Lock()
 
     @property
     def output(self):
@@ -110,48 +186,249 @@ class Downloader:
         else:
             self.__output = os.path.join(os.getcwd(), "downloads")
 
+    def download_all(self, urls):
+        """Validate post urls and download their files.
+
+        With more than one worker, posts are resolved in one thread pool
+        and their files, including every file in a sidecar, are downloaded
+        in another, so a post never waits for a free worker that is busy
+        waiting for its own files.
+        """
+
+        if self.workers < 2:
+            for url in urls:
+                self._download_url(url)
+            return
+
+        posts = ThreadPoolExecutor(self.workers)
+        self._files = ThreadPoolExecutor(self.workers)
+        futures = [posts.submit(self._download_url, url) for url in urls]
+
+        try:
+            for future in as_completed(futures):
+                future.result()
+        # Stop the remaining downloads if one of them fails.
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            posts.shutdown()
+            self._files.shutdown()
+            self._files = None
+
+    def _download_url(self, url):
+        """Validate post url and download its files.
+
+        A post that can't be downloaded, like a deleted or private post, is
+        skipped with a warning, so the other posts are still downloaded.
+        """
+
+        try:
+            self.download(validate_url(url))
+        except (SystemExit, requests.exceptions.RequestException) as e:
+            print(self.text.warning(f"Skip {url}, {e}"))
+            with self._lock:
+                self.failed.append(url)
+
     @decorator.count_calls
     def download(self, url):
-        """Download files to disk."""
+        """Download files to disk.
+
+        Posts with every file already saved are skipped without fetching
+        anything, if they are in the index.
+        """
+
+        shortcode = url.rstrip("/").rsplit("/", 1)[-1]
+
+        if self.index is not None and self.index.is_complete(shortcode):
+            if self.verbose:
+                print(f"Skip {shortcode}, already downloaded.")
+            return
 
-        post_url, post_type = self.scraper.post_data(url)
+        scraper = PostScraper(self.headers, self.session, self.cache)
+        post_url, post_type = scraper.post_data(url)
 
         if post_type == "GraphSidecar":
-            for url in post_url:
-                self._download_file(url)
+            # Download the files in the sidecar at the same time if possible.
+            if self._files:
+                futures = [
+                    self._files.submit(self._download_file, url, scraper, i)
+                    for i, url in enumerate(post_url)
+                ]
+                paths = [future.result() for future in futures]
+            else:
+                paths = [
+                    self._download_file(url, scraper, i)
+                    for i, url in enumerate(post_url)
+                ]
         elif post_type in ["GraphVideo", "GraphImage"]:
-            self._download_file(post_url)
+            paths = [self._download_file(post_url, scraper)]
+        else:
+            return
+
+        if self.index is None:
+            return
+
+        # Files are written in order, so the post is complete once the
+        # job after its files is done.
+        if self.writer is not None:
+            self.writer.submit(self._complete, scraper.shortcode, paths)
+        else:
+            self._complete(scraper.shortcode, paths)
+
+    def _complete(self, shortcode, paths):
+        """Record a post as complete if every file in it was saved."""
+
+        # Files saved by the writer are futures until they're written.
+        paths = [
+            path.result() if isinstance(path, Future) else path
+            for path in paths
+        ]
+
+        if all(paths):
+            self.index.complete(shortcode, paths)
 
-    def _download_file(self, url):
-        """Get content from the url, pick a name for the file and save it."""
+    def _download_file(self, url, scraper, position=0):
+        """Get content from the url, pick a name for the file and save it.
+
+        Args:
+            url (str): Url to the image or video file.
+            scraper (obj): PostScraper with data about the post.
+            position (int): Position of the file in a sidecar.
+
+        Returns:
+            Path to the saved file, or None if it wasn't saved. A Future
+            with the path if the file is saved by the writer.
+
+        """
 
-        r = requests.get(url, headers=self.headers)
-        filename = self._pick_filename(r.headers)
         # Change date format from 'yyyymmddhhmmss' to 'yyyy-mm-dd' for folders.
-        d = self.scraper.created_at[:8]
+        d = scraper.created_at[:8]
         date = "-".join([d[:4], d[4:6], d[6:8]])
         output = os.path.join(
-            self.output, self.scraper.username, date, self.scraper.shortcode
+            self.output, scraper.username, date, scraper.shortcode
         )
-        save_file(r.content, output, filename)
-        self.index = save_meta(self.scraper.data, output, self.index)
+
+        # The same file always gets the same name, so a file that is
+        # already saved doesn't have to be downloaded again.
+        is_video = scraper.post.media[position].is_video
+        key = file_key(scraper.shortcode, position, len(scraper.post.media))
+        filename = self._pick_filename(scraper, is_video, key=key)
+        path = os.path.join(output, filename)
+
+        if os.path.isfile(path):
+            if self.index is not None:
+                self.index.add(scraper.shortcode, path)
+            return path
+
+        # With the writer, files are downloaded and processed on local
+        # storage, and only the writer writes to the download location.
+        folder = STAGING_DIR if self.writer is not None else output
+
+        # Download to a part file that is resumed if the download breaks.
+        part = PartialDownload(url, folder, self.headers, self.session)
+        file = part.fetch()
+
+        # Files are processed in the pool right away, even if the writer
+        # is still busy with earlier files.
+        if self.processor is not None:
+            file = self.processor.submit(file, folder, filename)
+
+        if self.writer is not None:
+            return self.writer.submit(
+                self._write_file,
+                part,
+                file,
+                output,
+                filename,
+                scraper,
+                position,
+                folder=output,
+            )
+
+        if self.processor is not None:
+            return self._add_file(part, file, scraper, position)
+
+        return self._save_file(part, file, output, filename, scraper, position)
+
+    def _save_file(self, part, file, output, filename, scraper, position):
+        """Move a downloaded file into place and record it.
+
+        Returns:
+            Path to the saved file, or None if it wasn't saved.
+
+        """
+
+        path = save_file(file, output, filename)
+
+        return self._add_file(part, path, scraper, position)
+
+    def _write_file(self, part, file, output, filename, scraper, position):
+        """Move a staged file to the download location and record it.
+
+        Runs in the writer, after the folder has been created. The file is
+        processed here, unless it's a Future from the processor.
+
+        Returns:
+            Path to the saved file, or None if it wasn't saved.
+
+        """
+
+        if isinstance(file, Future):
+            staged = file.result()
+        else:
+            staged = save_file(file, STAGING_DIR, filename)
+
+        path = move_file(staged, output) if staged else None
+
+        return self._add_file(part, path, scraper, position)
+
+    def _add_file(self, part, path, scraper, position):
+        """Record a file that has been moved into place.
+
+        Args:
+            part (obj): PartialDownload the file was downloaded with.
+            path (str): Path to the saved file, or a Future with it.
+            scraper (obj): PostScraper with data about the post.
+            position (int): Position of the file in a sidecar.
+
+        Returns:
+            Path to the saved file, or None if it wasn't saved.
+
+        """
+
+        if isinstance(path, Future):
+            path = path.result()
+        part.remove()
+
+        if path and self.store is not None:
+            self.store.add(path, part.digest)
+
+        if path and self.index is not None:
+            self.index.add(scraper.shortcode, path)
+
+        if self.meta is not None:
+            self.meta.add(scraper.post, position)
 
         if self.verbose:
-            file = self.text.blue(r.headers["Content-Type"])
-            user = self.text.green(self.scraper.username)
+            file = self.text.blue(str(part.content_type))
+            user = self.text.green(scraper.username)
             print(f"Download { file } from { user }...")
 
+        return path
+
     @decorator.unique_filename
-    def _pick_filename(self, headers):
+    def _pick_filename(self, scraper, is_video):
         """Create a filename based username, date, url and file type.
 
             Example: [username]_[post date]_[shortcode].[file extension]"""
 
-        filename = self.scraper.username
-        filename += "_" + self.scraper.created_at
-        filename += "_" + self.scraper.shortcode
-        # Add file extension based on the contents type.
-        if headers.get("content-type") == "video/mp4":
+        filename = scraper.username
+        filename += "_" + scraper.created_at
+        filename += "_" + scraper.shortcode
+        # Add file extension based on the type of the file.
+        if is_video:
             filename += ".mp4"
         else:
             filename += ".jpg"
@@ -0,0 +1,152 @@
+from datetime import datetime
+
+
+class MediaItem:
+    """Image or video file in a post, or in a sidecar.
+
+    Attributes:
+        type (str): GraphImage or GraphVideo.
+        shortcode (str): Shortcode of the file.
+        is_video (bool): True if the file is a video.
+        accessibility_caption (str): Description of an image.
+        title (str): Title of a video.
+        duration (float): Length of a video in seconds.
+        product_type (str): Where a video was published.
+
+    """
+
+    __slots__ = [
+        "type",
+        "shortcode",
+        "is_video",
+        "accessibility_caption",
+        "title",
+        "duration",
+        "product_type",
+    ]
+
+    def __init__(
+        self,
+        type,
+        shortcode,
+        is_video,
+        accessibility_caption=None,
+        title=None,
+        duration=None,
+        product_type=None,
+    ):
+        self.type = type
+        self.shortcode = shortcode
+        self.is_video = is_video
+        self.accessibility_caption = accessibility_caption
+        self.title = title
+        self.duration = duration
+        self.product_type = product_type
+
+
+class PostRecord:
+    """The data about a post that is used, extracted once from the page.
+
+    Attributes:
+        shortcode (str): Shortcode of the post.
+        type (str): GraphImage, GraphVideo or GraphSidecar.
+        username (str): Username of the owner.
+        full_name (str): Full name of the owner.
+        is_private (bool): The owner's account is private.
+        is_verified (bool): The owner's account is verified.
+        taken_at (int): Unix timestamp when the post was published.
+        created_at (str): Publish date in the format yyyymmddhhmmss.
+        caption (str): Text of the post.
+        caption_is_edited (bool): The caption has been edited.
+        comments_disabled (bool): Comments are turned off.
+        likes (int): Number of likes.
+        comments (int): Number of comments.
+        location_name (str): Name of the location tag.
+        media (list): MediaItem for the file, or every file in a sidecar.
+
+    """
+
+    __slots__ = [
+        "shortcode",
+        "type",
+        "username",
+        "full_name",
+        "is_private",
+        "is_verified",
+        "taken_at",
+        "created_at",
+        "caption",
+        "caption_is_edited",
+        "comments_disabled",
+        "likes",
+        "comments",
+        "location_name",
+        "media",
+    ]
+
+    def __init__(self, data):
+        """Extract the fields from post data embedded in a post page."""
+
+        owner = data["owner"]
+        self.shortcode = data["shortcode"]
+        self.type = data["__typename"]
+        self.username = owner["username"]
+        self.full_name = owner["full_name"]
+        self.is_private = owner["is_private"]
+        self.is_verified = owner["is_verified"]
+        self.taken_at = data["taken_at_timestamp"]
+        self.created_at = datetime.utcfromtimestamp(self.taken_at).strftime(
+            "%Y%m%d%H%M%S"
+        )
+        self.caption_is_edited = data["caption_is_edited"]
+        self.comments_disabled = data["comments_disabled"]
+        self.likes = data["edge_media_preview_like"]["count"]
+
+        # Handle posts without caption.
+        edges = data["edge_media_to_caption"]["edges"]
+        self.caption = edges[0]["node"]["text"] if edges else None
+
+        # Handle posts without location tag.
+        location = data["location"]
+        self.location_name = location["name"] if location else location
+
+        # The key to the comment count number can be either of the two.
+        try:
+            self.comments = data["edge_media_to_parent_comment"]["count"]
+        except KeyError:
+            self.comments = data["edge_media_to_comment"]["count"]
+
+        if self.type == "GraphImage":
+            self.media = [
+                MediaItem(
+                    self.type,
+                    self.shortcode,
+                    data["is_video"],
+                    data["accessibility_caption"],
+                )
+            ]
+        elif self.type == "GraphVideo":
+            self.media = [
+                MediaItem(
+                    self.type,
+                    self.shortcode,
+                    data["is_video"],
+                    title=data["title"],
+                    duration=data["video_duration"],
+                    product_type=data["product_type"],
+                )
+            ]
+        elif self.type == "GraphSidecar":
+            edges = data["edge_sidecar_to_children"]["edges"]
+            self.media = [
+                MediaItem(
+                    edge["node"]["__typename"],
+                    edge["node"]["shortcode"],
+                    edge["node"]["is_video"],
+                    # Videos don't have accessibility caption.
+                    edge["node"].get("accessibility_caption"),
+                )
+                for edge in edges
+            ]
+        else:
+            self.media = []
@@ -1,13 +1,14 @@
 import os.path
+import time
 from pathlib import Path
 
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.common import exceptions
 from selenium.webdriver.firefox.options import Options
+from urllib3.exceptions import HTTPError
 
-from instasave.utils import hook
-from instasave.utils.jsonparser import parse_json
+from instasave.utils import hook, settings
+from instasave.utils.jsonparser import MissingKeyError, extract, parse_json
 from instasave.utils.path import check_path
 from instasave.utils.settings import (
     GECKODRIVER,
@@ -15,15 +16,139 @@ from instasave.utils.settings import (
     LOG_DIR,
     MAIN_CONTENT,
     POST,
+    SCROLL_POLL,
+    SCROLL_STALLS,
+    SCROLL_STEP,
+    SCROLL_STEP_MAX,
+    SCROLL_TARGET,
+    SCROLL_TIMEOUT,
 )
 
+# Script that returns shortcodes of posts added to the feed since it last
+# ran, so only new posts are sent from the browser. The seen posts are
+# kept in the page and are forgotten when another page is opened.
+NEW_POSTS = """
+const seen = window.instasaveSeen = window.instasaveSeen || new Set();
+const main = document.getElementsByClassName(arguments[0])[0];
+const shortcodes = [];
+
+if (!main) {
+    return shortcodes;
+}
+
+for (const post of main.getElementsByClassName(arguments[1])) {
+    const href = post.parentElement.getAttribute("href");
+    if (href && !seen.has(href)) {
+        seen.add(href);
+        shortcodes.push(href.split("/")[2]);
+    }
+}
+
+return shortcodes;
+"""
+
+# Script that scrolls down and returns the new height of the page.
+SCROLL = """
+window.scrollBy(0, arguments[0]);
+return document.body.scrollHeight;
+"""
+
+# Script that clears storage left by the previous page.
+CLEAR_STORAGE = """
+try {
+    window.localStorage.clear();
+    window.sessionStorage.clear();
+} catch (e) {}
+"""
+
+# Errors from a browser that has crashed or been closed.
+BROWSER_ERRORS = (exceptions.WebDriverException, HTTPError, OSError)
+
 
 class WebDriver:
-    """Responsible for starting and closing Selenium."""
+    """Responsible for starting, restarting and closing Selenium.
+
+    The same browser is used for every page that is opened, and state
+    left by the previous page is cleared first. A browser that has
+    crashed is restarted.
+
+    Attributes:
+        useragent (str): User agent the browser identifies itself with.
+        restarts (int): Number of times the browser has been restarted.
+
+    """
 
     def __init__(self, useragent):
         """Initialize headless webdriver with random user agent."""
 
+        self.useragent = useragent
+        self.restarts = 0
+
+        # Create log directory for geckodriver.log if it doesn't exist.
+        check_path(LOG_DIR)
+
+        self.driver = self._start()
+
+    @property
+    def is_alive(self):
+        """Return true if the browser still answers commands."""
+
+        try:
+            self.driver.current_url
+        except BROWSER_ERRORS:
+            return False
+
+        return True
+
+    def open(self, url):
+        """Visit url, in a restarted browser if it has crashed."""
+
+        if self.is_alive:
+            self.reset()
+        else:
+            self.restart()
+
+        try:
+            self.driver.get(url)
+        except exceptions.WebDriverException as e:
+            # Try once more if the browser crashed on the way.
+            if self.is_alive:
+                self.close(e)
+            self.restart()
+            try:
+                self.driver.get(url)
+            except exceptions.WebDriverException as e:
+                self.close(e)
+
+    def reset(self):
+        """Clear cookies and storage left by the previous page."""
+
+        try:
+            self.driver.delete_all_cookies()
+            self.driver.execute_script(CLEAR_STORAGE)
+        except exceptions.WebDriverException:
+            pass
+
+    def restart(self):
+        """Quit the browser, if it's still running, and start a new one."""
+
+        try:
+            self.driver.quit()
+        except BROWSER_ERRORS:
+            pass
+
+        self.driver = self._start()
+        self.restarts += 1
+
+    def close(self, msg=None):
+        """Close webdriver."""
+        self.driver.quit()
+        if msg:
+            raise SystemExit(msg)
+
+    def _start(self):
+        """Return a new headless browser."""
+
         options = Options()
         profile = webdriver.FirefoxProfile()
 
@@ -31,13 +156,10 @@ class WebDriver:
         options.headless = True
 
         # Change settings in about:config.
-        profile.set_preference("general.useragent.override", useragent)
-
-        # Create log directory for geckodriver.log if it doesn't exist.
-        check_path(LOG_DIR)
+        profile.set_preference("general.useragent.override", self.useragent)
 
         try:
-            self.driver = webdriver.Firefox(
+            return webdriver.Firefox(
                 firefox_profile=profile,
                 options=options,
                 executable_path=GECKODRIVER,
@@ -46,18 +168,55 @@ class WebDriver:
         except (TypeError, exceptions.WebDriverException) as e:
             raise SystemExit(e)
 
-    def open(self, url):
-        """Start webdriver and visit url."""
-        try:
-            self.driver.get(url)
-        except exceptions.WebDriverException as e:
-            self.close(e)
 
-    def close(self, msg=None):
-        """Close webdriver."""
-        self.driver.quit()
-        if msg:
-            raise SystemExit(msg)
+class PageSnapshot:
+    """Source and shared data of a user or hashtag page.
+
+    The page source is only fetched from the browser once, and the shared
+    data is only parsed once, no matter how many questions are asked
+    about the page.
+
+    Attributes:
+        title (str): Title of the page.
+        source (str): Page source.
+
+    """
+
+    def __init__(self, title, source):
+        self.title = title
+        self.source = source
+        self._data = None
+
+    @property
+    def data(self):
+        """Return the shared data embedded in the page."""
+
+        if self._data is None:
+            self._data = parse_json(self.source, JSON_CSS_SELECTOR, None)
+
+        return self._data
+
+    @property
+    def exists(self):
+        """Return true if user or hashtag exists."""
+        return "Page Not Found" not in self.title
+
+    def is_public(self, hashtag=False):
+        """Return true if hashtag or public account."""
+
+        if not hashtag:
+            return not extract(self.data, hook.PRIVATE_PROFILE)
+
+        return True
+
+    @property
+    def post_count(self):
+        """Return number of posts by the user or tagged with the hashtag."""
+
+        try:
+            return extract(self.data, hook.USER_POST_COUNT)
+        except MissingKeyError:
+            return extract(self.data, hook.HASHTAG_POST_COUNT)
 
 
 class URLScraper(WebDriver):
@@ -66,19 +225,44 @@ class URLScraper(WebDriver):
     Inherit from WebDriver.
 
     Attributes:
-        filelist (list): List with shortcodes that belongs to already
-            downloaded posts.
+        filelist (set): Shortcodes that belongs to already downloaded
+            posts, or a DownloadIndex.
+        stats (dict): Scroll steps, posts seen and seconds spent waiting
+            for posts to load in the last scraped feed.
 
     """
 
-    def __init__(self, useragent, output):
-        """Inherit from WebDriver and initialize list of downloaded posts."""
+    def __init__(self, useragent, output, filelist=None):
+        """Inherit from WebDriver and initialize list of downloaded posts.
+
+        The files in the output are only scanned if no DownloadIndex or
+        other collection of downloaded shortcodes is passed as filelist.
+        """
 
         super().__init__(useragent)
-        # Scan downloaded files and get their shortcodes.
-        self.filelist = [
-            str(file)[-36:-25] for file in Path(output).rglob("*.*")
-        ]
+        if filelist is None:
+            filelist = downloaded_shortcodes(output)
+        self.filelist = filelist
+        self.stats = {}
+        self._page = None
+
+    @property
+    def page(self):
+        """Return snapshot of the page the browser is on."""
+
+        if self._page is None:
+            self._page = PageSnapshot(
+                self.driver.title, self.driver.page_source
+            )
+
+        return self._page
+
+    def open(self, url):
+        """Visit url and forget everything about the previous page."""
+
+        self._page = None
+        self.stats = {}
+        super().open(url)
 
     def scrape(self, limit, hashtag):
         """Scrape post urls if user or hashtag page exists.
@@ -88,56 +272,28 @@ class URLScraper(WebDriver):
             hashtag (bool): Tell if page belongs to hashtag or user.
 
         Returns:
-            List with urls to posts that hasn't been downloaded yet. If the
-            list is empty, the page is private or doesn't exist.
-
-        """
-        if self._exists():
-            # Hashtag or a public profile.
-            if self._exists() and self._is_public(hashtag):
-                limit = self._check_limit(limit)
-                return self._get_urls(limit)
-            # Private profile.
-        elif self._exists() and not self._is_public():
-            print("Account is private.")
-            return []
-        # Hashtag or profile doesn't exists.
-        print("Doesn't exists.")
-        return []
+            List with urls to posts that hasn't been downloaded yet.
 
-    def _exists(self):
-        """Return true if user or hashtag exists."""
+        Raises:
+            SystemExit: The page is private or doesn't exist.
 
-        if "Page Not Found" in self.driver.title:
-            return False
-
-        return True
+        """
 
-    def _is_public(self, hashtag=False):
-        """Return true if account is public."""
+        # Hashtag or profile doesn't exists.
+        if not self.page.exists:
+            raise SystemExit("Doesn't exists.")
 
-        if not hashtag:
-            private = parse_json(
-                self.driver.page_source, JSON_CSS_SELECTOR, hook.private_profile
-            )
-            if private:
-                return False
+        # Private profile.
+        if not self.page.is_public(hashtag):
+            raise SystemExit("Account is private.")
 
-        return True
+        limit = self._check_limit(limit)
+        return self._get_urls(limit)
 
     def _check_limit(self, limit):
         """Return limit that is less than or equal to existing posts."""
 
-        try:
-            total_posts = parse_json(
-                self.driver.page_source, JSON_CSS_SELECTOR, hook.user_post_count
-            )
-        except KeyError:
-            total_posts = parse_json(
-                self.driver.page_source,
-                JSON_CSS_SELECTOR,
-                hook.hashtag_post_count,
-            )
+        total_posts = self.page.post_count
 
         if limit > total_posts:
             return total_posts
@@ -147,42 +303,117 @@ class URLScraper(WebDriver):
     def _get_urls(self, limit):
         """Return list with post urls to download files from."""
 
-        def update_post_list():
-            """Update lookup list with post urls."""
-
-            main = self.driver.find_element_by_class_name(MAIN_CONTENT)
-            innerHTML = main.get_attribute("innerHTML")
-            soup = BeautifulSoup(innerHTML, "html.parser")
-
-            return soup.find_all(class_=POST)
-
-        urls = set()
-        scroll_pos = 0
-        posts = update_post_list()
+        scroller = ScrollController(self.driver)
+        shortcodes = scroller.new_posts()
+        urls = []
 
         while True:
-            # Go through all scraped post urls.
-            for post in posts:
+            # Go through the posts that appeared since the last scroll.
+            for shortcode in shortcodes:
                 # Stop when all wanted urls has been added to the list.
                 if len(urls) == limit:
                     break
 
-                shortcode = post.parent["href"][3:-1]
-
                 # Add posts not previously downloaded.
                 if shortcode not in self.filelist:
-                    url = "https://www.instagram.com/p/" + shortcode
-                    urls.add(url)
-
-            # Get new urls as long as limit hasn't been reached.
-            if len(urls) < limit:
-                posts = update_post_list()
-                # Scroll down to see more posts in the feed.
-                self.driver.execute_script(f"window.scrollTo(0, {scroll_pos});")
-                scroll_pos += 500
+                    urls.append(settings.BASE_URL + "/p/" + shortcode)
 
+            # Get new urls until the limit is reached or the feed ends.
+            if len(urls) < limit and not scroller.done:
+                shortcodes = scroller.scroll()
                 continue
 
             break
 
-        return list(urls)
+        self.stats = scroller.stats
+
+        return urls
+
+
+class ScrollController:
+    """Scroll down a feed and wait for new posts to load.
+
+    The scroll step grows when a step loads few posts and shrinks when it
+    loads many. The feed has ended, or stalled, when several steps in a
+    row neither load new posts nor make the page any longer.
+
+    Attributes:
+        driver (obj): Webdriver with the feed open.
+        step (int): Pixels to scroll next time.
+        timeout (float): Seconds to wait for new posts after scrolling.
+        max_stalls (int): Steps without new posts before giving up.
+
+    """
+
+    def __init__(
+        self,
+        driver,
+        step=SCROLL_STEP,
+        timeout=SCROLL_TIMEOUT,
+        max_stalls=SCROLL_STALLS,
+    ):
+        self.driver = driver
+        self.step = step
+        self.timeout = timeout
+        self.max_stalls = max_stalls
+        self.steps = 0
+        self.posts = 0
+        self.waited = 0.0
+        self._stalls = 0
+        self._height = None
+
+    @property
+    def done(self):
+        """Return true if the feed has ended or stopped loading."""
+        return self._stalls >= self.max_stalls
+
+    @property
+    def stats(self):
+        """Return number of steps, posts and seconds spent waiting."""
+
+        return {
+            "steps": self.steps,
+            "posts": self.posts,
+            "seconds": round(self.waited, 2),
+        }
+
+    def new_posts(self):
+        """Return shortcodes of posts not seen before on the page."""
+
+        shortcodes = self.driver.execute_script(NEW_POSTS, MAIN_CONTENT, POST)
+        self.posts += len(shortcodes)
+
+        return shortcodes
+
+    def scroll(self):
+        """Scroll down and return shortcodes of the posts that loaded."""
+
+        height = self.driver.execute_script(SCROLL, self.step)
+        self.steps += 1
+
+        # Wait for the feed to load more posts.
+        start = time.monotonic()
+        while True:
+            shortcodes = self.new_posts()
+            if shortcodes or time.monotonic() - start >= self.timeout:
+                break
+            time.sleep(SCROLL_POLL)
+        self.waited += time.monotonic() - start
+
+        if shortcodes or height != self._height:
+            self._stalls = 0
+        else:
+            self._stalls += 1
+        self._height = height
+
+        if len(shortcodes) < SCROLL_TARGET // 2:
+            self.step = min(self.step * 2, SCROLL_STEP_MAX)
+        elif len(shortcodes) > SCROLL_TARGET * 2:
+            self.step = max(self.step // 2, SCROLL_STEP)
+
+        return shortcodes
+
+
+def downloaded_shortcodes(output):
+    """Return set with shortcodes of posts with files in the output."""
+    return {str(file)[-36:-25] for file in Path(output).rglob("*.*")}
@@ -1,9 +1,16 @@
 __all__ = [
+    "cache",
     "color",
     "decorator",
     "hook",
+    "index",
+    "jpeg",
     "jsonparser",
+    "meta",
     "path",
+    "postprocess",
     "settings",
+    "store",
     "webaddr",
+    "writer",
 ]
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from instasave.utils.settings import CACHE_MAX_SIZE, CACHE_TTL, POST_CACHE
+
+
+class CacheEntry:
+    """Cached post data and the validators it was fetched with."""
+
+    __slots__ = ["data", "etag", "last_modified", "fresh"]
+
+    def __init__(self, data, etag, last_modified, fresh):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    @property
+    def headers(self):
+        """Return HTTP headers to revalidate the entry with."""
+
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class PostCache:
+    """Persistent cache with post data keyed by shortcode.
+
+    Posts older than `ttl` seconds are revalidated, and the least recently
+    used posts are evicted when the cache grows larger than `max_size`.
+
+    Attributes:
+        path (str): Path to the database file.
+        ttl (int): Seconds before a cached post has to be revalidated.
+        max_size (int): Max number of bytes of cached post data.
+        hits (int): Posts found in the cache.
+        misses (int): Posts not in the cache or too old.
+        revalidated (int): Old posts that were unchanged on the server.
+
+    """
+
+    def __init__(
+        self, path=POST_CACHE, ttl=CACHE_TTL, max_size=CACHE_MAX_SIZE
+    ):
+        """Open the database and create the table if it doesn't exist."""
+
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                "shortcode TEXT PRIMARY KEY, data TEXT, etag TEXT, "
+                "last_modified TEXT, size INTEGER, stored_at REAL, "
+                "accessed_at REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS accessed ON posts (accessed_at)"
+            )
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM posts"
+        ).fetchone()[0]
+
+    @property
+    def stats(self):
+        """Return dict with hit and miss counters."""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
+
+    def get(self, shortcode):
+        """Return CacheEntry for the post, None if it isn't cached."""
+
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, etag, last_modified, stored_at FROM posts "
+                "WHERE shortcode = ?",
+                (shortcode,),
+            ).fetchone()
+
+            if not row:
+                self.misses += 1
+                return None
+
+            with self._db:
+                self._db.execute(
+                    "UPDATE posts SET accessed_at = ? WHERE shortcode = ?",
+                    (now, shortcode),
+                )
+
+            data, etag, last_modified, stored_at = row
+            fresh = now - stored_at < self.ttl
+
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return CacheEntry(json.loads(data), etag, last_modified, fresh)
+
+    def put(self, shortcode, data, etag=None, last_modified=None):
+        """Save post data and evict old posts if the cache is too large."""
+
+        data = json.dumps(data, separators=(",", ":"))
+        size = len(data.encode())
+        now = time.time()
+
+        with self._lock, self._db:
+            old = self._db.execute(
+                "SELECT size FROM posts WHERE shortcode = ?", (shortcode,)
+            ).fetchone()
+            self._db.execute(
+                "REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (shortcode, data, etag, last_modified, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def revalidate(self, shortcode):
+        """Mark an old post as unchanged on the server."""
+
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE posts SET stored_at = ? WHERE shortcode = ?",
+                (time.time(), shortcode),
+            )
+            self.revalidated += 1
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def _evict(self):
+        """Remove least recently used posts until the cache fits."""
+
+        rows = self._db.execute(
+            "SELECT shortcode, size FROM posts ORDER BY accessed_at"
+        )
+
+        evict = []
+        for shortcode, size in rows:
+            if self._size <= self.max_size:
+                break
+            evict.append((shortcode,))
+            self._size -= size
+
+        self._db.executemany("DELETE FROM posts WHERE shortcode = ?", evict)
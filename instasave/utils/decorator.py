@@ -1,18 +1,20 @@
 import functools
+import threading
 import uuid
 from hashlib import blake2b
 
 
 def unique_filename(func):
-    """Return filename with an unique id appended to it's end."""
+    """Return filename with an unique id appended to it's end.
+
+    The id is random, unless a key is passed to the decorated function,
+    then the same key always gives the same id.
+    """
 
     @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+    def wrapper(*args, key=None, **kwargs):
         filename = func(*args, **kwargs)
-        # Convert the random UUID to bytes.
-        id = str.encode(str(uuid.uuid4()))
-        # Convert the id to a 10 character long string.
-        hash = blake2b(digest_size=10, key=id).hexdigest()
+        hash = file_id(key)
         # Separate the file extension from the name.
         filename = [filename[:-4], filename[-3:]]
         # Append the hash at the end of the name.
@@ -24,16 +26,29 @@ def unique_filename(func):
     return wrapper
 
 
+def file_id(key=None):
+    """Return the id unique_filename appends to a filename with the key."""
+
+    # Convert the key, or a random UUID, to bytes.
+    id = str.encode(key if key is not None else str(uuid.uuid4()))
+    # Convert the id to a 20 character long string.
+    return blake2b(digest_size=10, key=id).hexdigest()
+
+
 def count_calls(func):
     """Count function calls."""
 
+    # Functions may be called from several threads at once.
+    lock = threading.Lock()
+
     @functools.wraps(func)
     def wrapper_count_calls(*args, **kwargs):
-        wrapper_count_calls.num_calls += 1
-        if args[0].verbose:
-            print(f"Post {wrapper_count_calls.num_calls}")
-        else:
-            print(".", end="", flush=True)
+        with lock:
+            wrapper_count_calls.num_calls += 1
+            if args[0].verbose:
+                print(f"Post {wrapper_count_calls.num_calls}")
+            else:
+                print(".", end="", flush=True)
         return func(*args, **kwargs)
 
     wrapper_count_calls.num_calls = 0
@@ -1,28 +1,36 @@
+from instasave.utils.jsonparser import extract
+
+# Paths to the parts of the shared data that are used.
+PRIVATE_PROFILE = "entry_data.ProfilePage[0].graphql.user.is_private"
+HASHTAG_POST_COUNT = (
+    "entry_data.TagPage[0].graphql.hashtag.edge_hashtag_to_media.count"
+)
+USER_POST_COUNT = (
+    "entry_data.ProfilePage[0].graphql.user."
+    "edge_owner_to_timeline_media.count"
+)
+SHORTCODE_MEDIA = "entry_data.PostPage[0].graphql.shortcode_media"
+
+
 def private_profile(data):
     if "entry_data" in data:
-        return data["entry_data"]["ProfilePage"][0]["graphql"]["user"][
-            "is_private"
-        ]
+        return extract(data, PRIVATE_PROFILE)
     return data
 
 
 def hashtag_post_count(data):
     if "entry_data" in data:
-        return data["entry_data"]["TagPage"][0]["graphql"]["hashtag"][
-            "edge_hashtag_to_media"
-        ]["count"]
+        return extract(data, HASHTAG_POST_COUNT)
     return data
 
 
 def user_post_count(data):
     if "entry_data" in data:
-        return data["entry_data"]["ProfilePage"][0]["graphql"]["user"][
-            "edge_owner_to_timeline_media"
-        ]["count"]
+        return extract(data, USER_POST_COUNT)
     return data
 
 
 def shortcode_media(data):
     if "entry_data" in data:
-        return data["entry_data"]["PostPage"][0]["graphql"]["shortcode_media"]
+        return extract(data, SHORTCODE_MEDIA)
     return data
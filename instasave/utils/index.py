@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from instasave.utils.decorator import file_id
+from instasave.utils.settings import DOWNLOAD_INDEX
+
+
+def file_key(shortcode, position, count):
+    """Return the key a file in a post is named with.
+
+    Args:
+        shortcode (str): Shortcode of the post.
+        position (int): Position of the file in the post.
+        count (int): Number of files in the post.
+
+    """
+    return f"{shortcode}:{position}:{count}"
+
+
+class DownloadIndex:
+    """Persistent index of downloaded files and their shortcodes.
+
+    Lives in the download location and is updated every time a file is
+    saved, so already downloaded posts can be looked up without scanning
+    the files on disk.
+
+    Attributes:
+        output (str): Download location that is indexed.
+        path (str): Path to the database file.
+        is_new (bool): The database didn't exist before it was opened.
+
+    """
+
+    def __init__(self, output, name=DOWNLOAD_INDEX):
+        """Open the database and create the table if it doesn't exist."""
+
+        self.output = output
+        self.path = os.path.join(output, name)
+        self.is_new = not os.path.exists(self.path)
+        self._lock = threading.Lock()
+
+        os.makedirs(output, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, shortcode TEXT, size INTEGER, "
+                "added_at REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS shortcodes ON files (shortcode)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                "shortcode TEXT PRIMARY KEY, paths TEXT)"
+            )
+
+    def __contains__(self, shortcode):
+        """Return true if a file from the post has been downloaded."""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM files WHERE shortcode = ? LIMIT 1",
+                (shortcode,),
+            ).fetchone()
+
+        return row is not None
+
+    def __len__(self):
+        """Return number of indexed files."""
+
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def add(self, shortcode, path):
+        """Add a saved file from the post to the index."""
+
+        row = (self._relpath(path), shortcode, os.path.getsize(path))
+
+        with self._lock, self._db:
+            self._db.execute(
+                "REPLACE INTO files VALUES (?, ?, ?, ?)", row + (time.time(),)
+            )
+
+    def complete(self, shortcode, paths):
+        """Record that every file in the post has been saved.
+
+        Args:
+            shortcode (str): Shortcode of the post.
+            paths (list): Paths to every file in the post.
+
+        """
+
+        paths = json.dumps([self._relpath(path) for path in paths])
+
+        with self._lock, self._db:
+            self._db.execute(
+                "REPLACE INTO posts VALUES (?, ?)", (shortcode, paths)
+            )
+
+    def is_complete(self, shortcode):
+        """Return true if every file in the post is saved and still exists.
+
+        Only posts recorded as complete are checked, since the files in a
+        post aren't known before its page has been fetched.
+        """
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT paths FROM posts WHERE shortcode = ?", (shortcode,)
+            ).fetchone()
+
+        if row is None:
+            return False
+
+        return all(
+            os.path.isfile(os.path.join(self.output, path))
+            for path in json.loads(row[0])
+        )
+
+    def rebuild(self):
+        """Replace the index with the files in the download location.
+
+        Shortcodes are read from the filenames, which end with the
+        shortcode and a 20 characters long hash. A post is complete if
+        its folder has the file for every position, which is known from
+        the hashes of the files that were named by their position and the
+        number of files in the post.
+        """
+
+        now = time.time()
+        rows = []
+        folders = defaultdict(dict)
+
+        for root, dirs, files in os.walk(self.output):
+            # Skip hidden folders, like the content store.
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if not name.endswith((".jpg", ".mp4")) or len(name) < 36:
+                    continue
+                path = os.path.join(root, name)
+                shortcode = name[-36:-25]
+                rows.append(
+                    (
+                        self._relpath(path),
+                        shortcode,
+                        os.path.getsize(path),
+                        now,
+                    )
+                )
+                folders[root, shortcode][name[-24:-4]] = path
+
+        posts = []
+        for (_, shortcode), files in folders.items():
+            paths = _complete_post(shortcode, files)
+            if paths is not None:
+                posts.append(
+                    (
+                        shortcode,
+                        json.dumps([self._relpath(path) for path in paths]),
+                    )
+                )
+
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM files")
+            self._db.execute("DELETE FROM posts")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO posts VALUES (?, ?)", posts
+            )
+
+        return len(rows)
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def _relpath(self, path):
+        """Return path relative to the download location."""
+        return os.path.relpath(path, self.output)
+
+
+def _complete_post(shortcode, files):
+    """Return paths to every file in the post, or None if any is missing.
+
+    Args:
+        shortcode (str): Shortcode of the post.
+        files (dict): Paths to the files in the post's folder by the hash
+            at the end of their names.
+
+    """
+
+    # Random names from before don't match any count, so the most files
+    # a post can have is the number of files in the folder.
+    for count in range(len(files), 0, -1):
+        ids = [file_id(file_key(shortcode, i, count)) for i in range(count)]
+        if all(id in files for id in ids):
+            return [files[id] for id in ids]
+
+    return None
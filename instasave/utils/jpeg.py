@@ -0,0 +1,137 @@
+from instasave.utils.settings import JPEG_KEEP_SEGMENTS
+
+# Markers without a length, that are only two bytes long.
+STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+
+# Markers of segments with meta data, APP0-APP15 and comments.
+META_MARKERS = set(range(0xE0, 0xF0)) | {0xFE}
+
+# Start of scan, followed by the compressed image data.
+SOS = 0xDA
+
+# End of image.
+EOI = 0xD9
+
+
+class MalformedJPEG(Exception):
+    """Raised when the segments of a JPEG file can't be read."""
+
+
+class JPEGFilter:
+    """Remove meta data segments from a JPEG file as it's streamed.
+
+    The segments before the image data are read one at a time, and APPn
+    and comment segments that aren't in the allow-list are dropped. The
+    image data after the first start of scan is copied untouched, so the
+    image is exactly the same as before. Data can be fed in chunks of any
+    size, like the chunks of a download.
+
+    Attributes:
+        keep (set): Markers of meta data segments to keep.
+
+    """
+
+    def __init__(self, keep=JPEG_KEEP_SEGMENTS):
+        self.keep = set(keep)
+        self._buffer = b""
+        self._state = "start"
+        # Bytes left of the current segment, and if they're kept.
+        self._remaining = 0
+        self._copy = True
+
+    def feed(self, data):
+        """Return the filtered part of the data that can be written."""
+
+        if self._state == "scan" and not self._remaining:
+            return bytes(data)
+
+        buffer = self._buffer + bytes(data)
+        output = bytearray()
+        pos = 0
+
+        while True:
+            available = len(buffer) - pos
+
+            # Copy or drop the rest of the current segment.
+            if self._remaining:
+                size = min(self._remaining, available)
+                if self._copy:
+                    output += buffer[pos : pos + size]
+                pos += size
+                self._remaining -= size
+                if self._remaining:
+                    break
+                continue
+
+            if self._state == "scan":
+                output += buffer[pos:]
+                pos = len(buffer)
+                break
+
+            # Anything after the end of the image is dropped.
+            if self._state == "end":
+                pos = len(buffer)
+                break
+
+            if available < 2:
+                break
+
+            if self._state == "start":
+                if buffer[pos : pos + 2] != b"\xff\xd8":
+                    raise MalformedJPEG("Missing start of image")
+                output += buffer[pos : pos + 2]
+                pos += 2
+                self._state = "segments"
+                continue
+
+            if buffer[pos] != 0xFF:
+                raise MalformedJPEG(f"Expected a marker at {pos}")
+
+            marker = buffer[pos + 1]
+
+            # Markers may be padded with any number of fill bytes.
+            if marker == 0xFF:
+                pos += 1
+                continue
+
+            if marker == EOI:
+                output += buffer[pos : pos + 2]
+                pos += 2
+                self._state = "end"
+                continue
+
+            if marker in STANDALONE_MARKERS:
+                output += buffer[pos : pos + 2]
+                pos += 2
+                continue
+
+            if marker < 0xC0:
+                raise MalformedJPEG(f"Invalid marker {marker:#x}")
+
+            if available < 4:
+                break
+
+            length = int.from_bytes(buffer[pos + 2 : pos + 4], "big")
+            if length < 2:
+                raise MalformedJPEG(f"Invalid segment length {length}")
+
+            self._copy = marker not in META_MARKERS or marker in self.keep
+            if self._copy:
+                output += buffer[pos : pos + 4]
+            pos += 4
+            self._remaining = length - 2
+
+            if marker == SOS:
+                self._state = "scan"
+
+        self._buffer = buffer[pos:]
+
+        return bytes(output)
+
+    def close(self):
+        """Check that the whole file was read."""
+
+        if self._state in ["start", "segments"] or (
+            self._state != "end" and self._remaining
+        ):
+            raise MalformedJPEG("Unexpected end of file")
@@ -1,11 +1,104 @@
 import json
+import re
+from functools import lru_cache
 
 from bs4 import BeautifulSoup
 
+from instasave.utils.settings import JSON_PREFIX
 
-def parse_json(source, selector, hook):
-    soup = BeautifulSoup(source, "html.parser")
-    script = soup.select(selector)
-    data = script[0].text[21:-1]
 
-    return json.loads(data, object_hook=hook)
+class MissingKeyError(KeyError):
+    """Key or index along a path is missing from the json data.
+
+    Attributes:
+        path (str): Path that was looked up.
+        key (str): First key or index that was missing.
+
+    """
+
+    def __init__(self, path, key):
+        super().__init__(path, key)
+        self.path = path
+        self.key = key
+
+    def __str__(self):
+        return f"{self.key!r} is missing from {self.path}"
+
+
+def parse_json(source, selector, hook=None, path=None):
+    """Return json data embedded in a page.
+
+    The data is first looked for right after its variable name in the raw
+    page, which avoids building a tree of the whole page. The script is
+    only looked up with the CSS selector if that fails.
+
+    Args:
+        source (str): Page source.
+        selector (str): CSS selector for the script with the data.
+        hook (func): Called with every object while decoding.
+        path (str): Path to the only part of the data to return, like
+            "entry_data.PostPage[0].graphql.shortcode_media".
+
+    Raises:
+        MissingKeyError: Part of the path is missing from the data.
+
+    """
+
+    try:
+        data = _scan(source, hook)
+    except ValueError:
+        soup = BeautifulSoup(source, "html.parser")
+        script = soup.select(selector)
+        data = script[0].text[len(JSON_PREFIX) : -1]
+        data = json.loads(data, object_hook=hook)
+
+    if path:
+        return extract(data, path)
+
+    return data
+
+
+def extract(data, path):
+    """Return the value at the path in the json data.
+
+    Args:
+        data (dict): Decoded json data.
+        path (str): Keys separated by dots and list indexes in brackets.
+
+    Raises:
+        MissingKeyError: Part of the path is missing from the data.
+
+    """
+
+    for key in _split(path):
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            raise MissingKeyError(path, key) from None
+
+    return data
+
+
+@lru_cache(maxsize=None)
+def _split(path):
+    """Return keys and indexes in the path."""
+
+    return tuple(
+        int(index) if index else key
+        for key, index in re.findall(r"([^.\[\]]+)|\[(\d+)\]", path)
+    )
+
+
+def _scan(source, hook):
+    """Return json data that follows the variable name in the page.
+
+    Raises:
+        ValueError: The variable isn't in the page or isn't valid json.
+
+    """
+
+    start = source.index(JSON_PREFIX) + len(JSON_PREFIX)
+    decoder = json.JSONDecoder(object_hook=hook)
+    data, _ = decoder.raw_decode(source, start)
+
+    return data
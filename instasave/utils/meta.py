@@ -0,0 +1,264 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from instasave.utils.settings import (
+    META_BATCH_SIZE,
+    META_FILENAME,
+    META_FLUSH_INTERVAL,
+)
+
+# Columns saved for every downloaded file.
+FIELDNAMES = [
+    "username",
+    "full_name",
+    "shortcode",
+    "sub_shortcode",
+    "type",
+    "sub_type",
+    "data_scraped_at",
+    "published",
+    "date",
+    "time",
+    "location_name",
+    "accessibility_caption",
+    "is_video",
+    "video_duration",
+    "product_type",
+    "is_verified",
+    "is_private",
+    "likes",
+    "comments",
+    "comments_disabled",
+    "caption_is_edited",
+    "title",
+    "caption",
+]
+
+
+def meta_row(post, position=0):
+    """Return data about a downloaded file.
+
+    Args:
+        post (obj): PostRecord with data about the post.
+        position (int): Position of the file in a sidecar.
+
+    """
+
+    published = post.taken_at
+    media = post.media[position]
+
+    sub_type = None
+    sub_shortcode = None
+
+    # Files in a sidecar have their own type and shortcode.
+    if post.type == "GraphSidecar":
+        sub_type = media.type
+        sub_shortcode = media.shortcode
+
+    return {
+        "username": post.username,
+        "full_name": post.full_name,
+        "shortcode": post.shortcode,
+        "sub_shortcode": sub_shortcode,
+        "type": post.type,
+        "sub_type": sub_type,
+        "data_scraped_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "published": published,
+        "date": datetime.utcfromtimestamp(published).strftime("%Y-%m-%d"),
+        "time": datetime.utcfromtimestamp(published).strftime("%H:%M:%S"),
+        "location_name": post.location_name,
+        "accessibility_caption": media.accessibility_caption,
+        "is_video": media.is_video,
+        "video_duration": media.duration,
+        "product_type": media.product_type,
+        "is_verified": post.is_verified,
+        "is_private": post.is_private,
+        "likes": post.likes,
+        "comments": post.comments,
+        "comments_disabled": post.comments_disabled,
+        "caption_is_edited": post.caption_is_edited,
+        "title": media.title,
+        "caption": post.caption,
+    }
+
+
+class MetaSink:
+    """Collect data about downloaded files and write it in batches.
+
+    Rows are buffered and written over one open file when the buffer is
+    full or the oldest buffered row has waited long enough, and the rest
+    when the sink is closed. The wait is timed in a thread of its own, so
+    rows are written in time even if no more rows are added for a while.
+    Subclasses write the rows in a format.
+
+    Attributes:
+        path (str): Path to the file the data is saved in.
+        batch_size (int): Max number of buffered rows.
+        interval (float): Max seconds a row is buffered.
+        written (int): Number of rows written to the file.
+
+    """
+
+    # File extension of the format.
+    extension = None
+
+    def __init__(
+        self,
+        output,
+        batch_size=META_BATCH_SIZE,
+        interval=META_FLUSH_INTERVAL,
+        name=META_FILENAME,
+    ):
+        """Open the file in the download location."""
+
+        self.path = os.path.join(output, name + self.extension)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.written = 0
+        self._rows = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+        os.makedirs(output, exist_ok=True)
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, post, position=0):
+        """Buffer data about a downloaded file.
+
+        Args:
+            post (obj): PostRecord with data about the post.
+            position (int): Position of the file in a sidecar.
+
+        """
+
+        row = meta_row(post, position)
+
+        with self._lock:
+            self._rows.append(row)
+
+            if len(self._rows) >= self.batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write every buffered row."""
+
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Write every buffered row and close the file."""
+
+        with self._lock:
+            self._flush()
+            self._close()
+
+    def _flush(self):
+        """Write buffered rows, the lock must be held."""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._rows:
+            self._write(self._rows)
+            self.written += len(self._rows)
+            self._rows = []
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write(self, rows):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class CSVSink(MetaSink):
+    """Append data about downloaded files to a CSV file."""
+
+    extension = ".csv"
+
+    def _open(self):
+        self._file = open(self.path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDNAMES)
+
+        # Writes fieldname headers if it's the first time appending data.
+        if not self._file.tell():
+            self._writer.writeheader()
+
+    def _write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class JSONLinesSink(MetaSink):
+    """Append data about downloaded files to a JSON Lines file."""
+
+    extension = ".jsonl"
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, rows):
+        self._file.writelines(
+            json.dumps(row, ensure_ascii=False) + "\n" for row in rows
+        )
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class SQLiteSink(MetaSink):
+    """Insert data about downloaded files into a SQLite database."""
+
+    extension = ".sqlite3"
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS files ({', '.join(FIELDNAMES)})"
+            )
+
+    def _write(self, rows):
+        columns = ", ".join(":" + name for name in FIELDNAMES)
+        with self._db:
+            self._db.executemany(f"INSERT INTO files VALUES ({columns})", rows)
+
+    def _close(self):
+        self._db.close()
+
+
+# Sinks by the name of their format.
+SINKS = {"csv": CSVSink, "jsonl": JSONLinesSink, "sqlite": SQLiteSink}
+
+
+def open_sink(format, output, **options):
+    """Return sink that saves data about downloaded files in the format.
+
+    Args:
+        format (str): One of csv, jsonl or sqlite.
+        output (str): Download location to save the file in.
+
+    """
+
+    return SINKS[format](output, **options)
@@ -1,173 +1,40 @@
-import csv
-import io
+import errno
 import os
-from datetime import datetime
+import shutil
+import tempfile
 
 import magic
 from PIL import Image
 
+from instasave.utils.jpeg import JPEGFilter, MalformedJPEG
+from instasave.utils.settings import CHUNK_SIZE
+
 
 def check_path(output):
     """Create folder for downloaded files if it not exist."""
 
-    if not os.path.isdir(output):
-        os.makedirs(output)
-
-
-def save_meta(data, output, index):
-    """Save data from downloaded posts in a CSV file."""
-
-    output = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.dirname(output))), "data.csv"
-    )
-    exists = os.path.isfile(output)
-
-    # Data from posts.
-    published = data["taken_at_timestamp"]
-    data_scraped_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    date = datetime.utcfromtimestamp(published).strftime("%Y-%m-%d")
-    time = datetime.utcfromtimestamp(published).strftime("%H:%M:%S")
-
-    post_type = data["__typename"]
-    username = data["owner"]["username"]
-    full_name = data["owner"]["full_name"]
-    is_private = data["owner"]["is_private"]
-    is_verified = data["owner"]["is_verified"]
-    caption_is_edited = data["caption_is_edited"]
-    comments_disabled = data["comments_disabled"]
-    likes = data["edge_media_preview_like"]["count"]
-    caption = data["edge_media_to_caption"]["edges"][0]["node"]["text"]
-
-    title = None
-    sub_type = None
-    is_video = None
-    duration = None
-    comments = None
-    shortcode = None
-    access_cap = None
-    product_type = None
-    location_name = None
-    sub_shortcode = None
-
-    # Handle posts without location tag.
-    try:
-        location_name = data["location"]["name"]
-    except TypeError:
-        location_name = data["location"]
+    # Folders may be created by another thread at the same time.
+    os.makedirs(output, exist_ok=True)
 
-    # The key to the comment count number can be either of the two.
-    try:
-        comments = data["edge_media_to_parent_comment"]["count"]
-    except KeyError:
-        comments = data["edge_media_to_comment"]["count"]
-
-    # Differentiate assignment depending on post type.
-    if post_type == "GraphImage":
-        is_video = data["is_video"]
-        shortcode = data["shortcode"]
-        access_cap = data["accessibility_caption"]
-
-    elif post_type == "GraphVideo":
-        title = data["title"]
-        is_video = data["is_video"]
-        shortcode = data["shortcode"]
-        duration = data["video_duration"]
-        product_type = data["product_type"]
-
-    elif post_type == "GraphSidecar":
-        node = data["edge_sidecar_to_children"]["edges"][index]["node"]
-        sub_type = node["__typename"]
-        sub_shortcode = node["shortcode"]
-        is_video = node["is_video"]
-        post_type = post_type
-        shortcode = data["shortcode"]
-
-        # Videos don't have accessibility caption.
-        if sub_type != "GraphVideo":
-            access_cap = node["accessibility_caption"]
-
-        # Remember index in the sidecar, reset when done.
-        edges = len(data["edge_sidecar_to_children"]["edges"])
-        if index < edges - 1:
-            index += 1
-        else:
-            index = 0
-
-    # Append post data to the csv file.
-    with open(output, "a") as csvfile:
-        fieldnames = [
-            "username",
-            "full_name",
-            "shortcode",
-            "sub_shortcode",
-            "type",
-            "sub_type",
-            "data_scraped_at",
-            "published",
-            "date",
-            "time",
-            "location_name",
-            "accessibility_caption",
-            "is_video",
-            "video_duration",
-            "product_type",
-            "is_verified",
-            "is_private",
-            "likes",
-            "comments",
-            "comments_disabled",
-            "caption_is_edited",
-            "title",
-            "caption",
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-        # Writes fieldname headers if it's the first time appending data.
-        if not exists:
-            writer.writeheader()
-
-        writer.writerow(
-            {
-                "username": username,
-                "full_name": full_name,
-                "shortcode": shortcode,
-                "sub_shortcode": sub_shortcode,
-                "type": post_type,
-                "sub_type": sub_type,
-                "data_scraped_at": data_scraped_at,
-                "published": published,
-                "date": date,
-                "time": time,
-                "location_name": location_name,
-                "accessibility_caption": access_cap,
-                "is_video": is_video,
-                "video_duration": duration,
-                "product_type": product_type,
-                "is_verified": is_verified,
-                "is_private": is_private,
-                "likes": likes,
-                "comments": comments,
-                "comments_disabled": comments_disabled,
-                "caption_is_edited": caption_is_edited,
-                "title": title,
-                "caption": caption,
-            }
-        )
-
-    return index
-
-
-def save_file(buffer, output, filename):
-    """Write content to file.
+
+def save_file(file, output, filename):
+    """Move downloaded file into place.
 
     Saves every file in a folder named after the uploaders in the output
     folder. Tries to remove any unvanted meta data from jpeg files
     and still keep the original quality. Mp4 files are unmodified.
 
+    The file is renamed into place when complete, so a file is never left
+    half written under its real name. Files of any other type are removed.
+
     Args:
-        buffer (bytes): File content in byte code.
+        file (str): Path to the completely downloaded file.
         output (str): Where to save the file.
         filename (str): Name of the file.
+
+    Returns:
+        Path to the saved file, or None if it wasn't saved.
+
     """
 
     check_path(output)
@@ -176,14 +43,86 @@ def save_file(buffer, output, filename):
     # because the first 4 bytes are needed for JPEGs and MP4 signatures
     # are 8 bytes long and are offset by 4 bytes, which means 12 bytes are
     # a minimum requirement in those cases.
-    file_type = magic.from_buffer(buffer[:12], mime=True)
-
-    if file_type == "image/jpeg":
-        bytes = io.BytesIO(buffer)
-        op = os.path.join(output, filename)
-        # Save the image with Pillow to remove any unwanted meta data.
-        # Also try to keep the same quality when saved.
-        Image.open(bytes).save(op, quality="keep")
-    elif file_type == "video/mp4":
-        with open(os.path.join(output, filename), "wb") as f:
-            f.write(buffer)
+    with open(file, "rb") as f:
+        file_type = magic.from_buffer(f.read(12), mime=True)
+
+    try:
+        if file_type == "image/jpeg":
+            _strip_meta(file)
+        if file_type in ["image/jpeg", "video/mp4"]:
+            os.replace(file, os.path.join(output, filename))
+            return os.path.join(output, filename)
+    finally:
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def move_file(file, output):
+    """Move a file into a folder that already exists.
+
+    A file on another file system, like local temporary storage, is copied
+    to a temporary file in the folder and renamed into place, so a file is
+    never left half written under its real name.
+
+    Args:
+        file (str): Path to the file.
+        output (str): Folder to move the file to.
+
+    Returns:
+        Path to the moved file.
+
+    """
+
+    path = os.path.join(output, os.path.basename(file))
+
+    try:
+        os.replace(file, path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        temp = _temp_file(output)
+        try:
+            shutil.copyfile(file, temp)
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+        os.remove(file)
+
+    return path
+
+
+def _strip_meta(file):
+    """Remove meta data from a jpeg file.
+
+    The meta data segments are filtered out of the file without decoding
+    the image, so the image data stays exactly the same. Files that can't
+    be filtered are saved again with Pillow instead, which tries to keep
+    the same quality.
+    """
+
+    temp = _temp_file(os.path.dirname(file))
+
+    try:
+        try:
+            with open(file, "rb") as src, open(temp, "wb") as dst:
+                jpeg = JPEGFilter()
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dst.write(jpeg.feed(chunk))
+                jpeg.close()
+        except MalformedJPEG:
+            with Image.open(file) as image:
+                image.save(temp, format="JPEG", quality="keep")
+        os.replace(temp, file)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def _temp_file(output):
+    """Create a new empty temporary file and return its path."""
+
+    fd, temp = tempfile.mkstemp(dir=output, suffix=".tmp")
+    os.close(fd)
+
+    return temp
@@ -0,0 +1,109 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from instasave.utils.path import save_file
+
+
+class PostProcessor:
+    """Move downloaded files into place in a pool of processes.
+
+    Checking the file type and stripping meta data is CPU bound, so it's
+    done in other processes and the downloads carry on in the meantime.
+
+    Attributes:
+        workers (int): Number of processes, defaults to number of CPUs.
+        stats (dict): Number of processed files, the most files waiting
+            at once and seconds spent processing and waiting in the queue.
+
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.stats = {
+            "files": 0,
+            "max_queued": 0,
+            "seconds": 0.0,
+            "max_seconds": 0.0,
+            "waited": 0.0,
+        }
+        self._queued = 0
+        self._lock = threading.Lock()
+        # Forking while other threads hold locks can deadlock the children,
+        # so they are started from a clean server process instead, or a new
+        # interpreter where there is no fork server.
+        methods = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in methods else "spawn"
+        self._executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context(method)
+        )
+
+    @property
+    def queued(self):
+        """Return number of files that are processed or waiting to be."""
+        return self._queued
+
+    def submit(self, file, output, filename):
+        """Start moving a downloaded file into place in another process.
+
+        Takes the same arguments as save_file.
+
+        Returns:
+            Future with the path to the saved file, or None if it wasn't
+            saved.
+
+        """
+
+        with self._lock:
+            self._queued += 1
+            self.stats["max_queued"] = max(
+                self.stats["max_queued"], self._queued
+            )
+
+        start = time.monotonic()
+        result = Future()
+
+        def done(future):
+            with self._lock:
+                self._queued -= 1
+
+            try:
+                path, seconds = future.result()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+
+            with self._lock:
+                self.stats["files"] += 1
+                self.stats["seconds"] += seconds
+                self.stats["max_seconds"] = max(
+                    self.stats["max_seconds"], seconds
+                )
+                self.stats["waited"] += time.monotonic() - start - seconds
+
+            result.set_result(path)
+
+        try:
+            future = self._executor.submit(_save_file, file, output, filename)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+        future.add_done_callback(done)
+
+        return result
+
+    def close(self):
+        """Wait for every file and stop the processes."""
+        self._executor.shutdown()
+
+
+def _save_file(file, output, filename):
+    """Return path to the saved file and seconds it took to save it."""
+
+    start = time.perf_counter()
+    path = save_file(file, output, filename)
+
+    return path, time.perf_counter() - start
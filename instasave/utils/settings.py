@@ -1,4 +1,5 @@
 import os.path
+import tempfile
 
 # Projects absolute path.
 BASE_DIR = os.path.dirname(
@@ -11,6 +12,10 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 # Path to the "data" directory.
 LOG_DIR = os.path.join(BASE_DIR, "log")
 
+# Instagram's address, can be pointed to another server, like a local
+# stand-in for load testing.
+BASE_URL = os.environ.get("INSTASAVE_BASE_URL", "https://www.instagram.com")
+
 # Text file with a list of different user agents.
 USER_AGENT_FILE = os.path.join(DATA_DIR, "useragents.txt")
 
@@ -25,3 +30,103 @@ POST = "eLAPa"
 
 # CSS selector for script with json data.
 JSON_CSS_SELECTOR = "body > script:nth-child(5)"
+
+# Start of the script with json data.
+JSON_PREFIX = "window._sharedData = "
+
+# Query hashes of the GraphQL queries for the next page of a feed.
+USER_QUERY_HASH = "e769aa130647d2354c40ea6a439bfc08"
+HASHTAG_QUERY_HASH = "ded47faa9a1aaded10161a2ff32abb6b"
+
+# Number of posts to ask for on every page of a feed.
+FEED_PAGE_SIZE = 50
+
+# Pixels to scroll a feed at first, and at most.
+SCROLL_STEP = 500
+SCROLL_STEP_MAX = 8000
+
+# Number of new posts every scroll step should aim to load.
+SCROLL_TARGET = 12
+
+# Seconds to wait for new posts after scrolling, and between checks.
+SCROLL_TIMEOUT = 3.0
+SCROLL_POLL = 0.1
+
+# Scroll steps in a row without new posts before the feed has ended.
+SCROLL_STALLS = 3
+
+# Number of hosts to keep pooled connections for.
+POOL_CONNECTIONS = 10
+
+# Max number of kept-alive connections to a single host.
+POOL_MAXSIZE = 10
+
+# Times to retry a request that failed to connect, read or on the server.
+MAX_RETRIES = 3
+
+# Seconds to back off between retries, doubled after every attempt.
+RETRY_BACKOFF = 0.5
+
+# Bytes to read from the network at a time when downloading files.
+CHUNK_SIZE = 64 * 1024
+
+# Max requests per second to a single host, lowered while throttled.
+RATE_LIMIT = 5.0
+
+# Lowest request rate to a host after it has throttled requests.
+MIN_RATE_LIMIT = 0.1
+
+# Times to retry a request that was throttled.
+THROTTLE_RETRIES = 5
+
+# Seconds to back off after the first throttled request, doubled after
+# every attempt but never more than the max.
+THROTTLE_BACKOFF = 2.0
+THROTTLE_BACKOFF_MAX = 120.0
+
+# Pause every request for a while after this many throttled requests
+# in a row.
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_COOLDOWN = 300.0
+
+# Path to the "cache" directory.
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+
+# Database with post data from already fetched post pages.
+POST_CACHE = os.path.join(CACHE_DIR, "posts.sqlite3")
+
+# Seconds before cached post data has to be revalidated.
+CACHE_TTL = 24 * 60 * 60
+
+# Max size in bytes of cached post data before the least recently used
+# posts are evicted.
+CACHE_MAX_SIZE = 100 * 1024 * 1024
+
+# Database in the download location with every downloaded file.
+DOWNLOAD_INDEX = ".instasave.sqlite3"
+
+# Hidden folder in the download location where unique files are stored.
+CONTENT_STORE = ".store"
+
+# Name of the file in the download location with data about every file.
+META_FILENAME = "data"
+
+# Max number of rows with data about files that are written at once.
+META_BATCH_SIZE = 100
+
+# Max seconds data about a file is kept before it's written.
+META_FLUSH_INTERVAL = 5.0
+
+# Meta data segments kept in JPEG files, APP0 with JFIF, APP2 with the
+# color profile and APP14 with the Adobe color transform.
+JPEG_KEEP_SEGMENTS = (0xE0, 0xE2, 0xEE)
+
+# Max number of downloaded files waiting to be written to disk.
+WRITE_QUEUE_SIZE = 64
+
+# Max number of files written to disk before they are synced.
+WRITE_BATCH_SIZE = 16
+
+# Folder on local storage that files are downloaded and processed in,
+# before they are written to the download location by the writer.
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "instasave")
@@ -0,0 +1,135 @@
+import errno
+import os
+import threading
+import uuid
+
+from instasave.utils.color import TextColors
+from instasave.utils.settings import CONTENT_STORE
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Request code for cloning a file on Linux filesystems like Btrfs and XFS.
+FICLONE = 0x40049409
+
+
+class ContentStore:
+    """Store every unique file once and link it to where it's saved.
+
+    Files are stored by the hash of their content in a hidden folder in the
+    download location. A saved file with the same content as a stored one
+    is replaced by a hardlink to it, or a reflink if hardlinks can't be
+    used, so it still shows up under the post it belongs to. Files are
+    never copied into the store, so on filesystems without either kind of
+    link the store is turned off with a warning instead.
+
+    Attributes:
+        root (str): Folder the unique files are stored in.
+        enabled (bool): Files can be linked in the download location.
+        stats (dict): Number of stored and linked files and bytes saved.
+
+    """
+
+    def __init__(self, output, name=CONTENT_STORE):
+        self.root = os.path.join(output, name)
+        self.enabled = True
+        self.stats = {"files": 0, "duplicates": 0, "saved": 0}
+        self._lock = threading.Lock()
+
+    def add(self, path, digest):
+        """Add a saved file to the store, or link it to a stored copy.
+
+        Args:
+            path (str): Path to the saved file.
+            digest (str): Hash of the file content.
+
+        Returns:
+            True if the file was a duplicate of a stored file.
+
+        """
+
+        if not self.enabled:
+            return False
+
+        extension = os.path.splitext(path)[1]
+        folder = os.path.join(self.root, digest[:2])
+        stored = os.path.join(folder, digest + extension)
+        os.makedirs(folder, exist_ok=True)
+
+        # Files with the same content may be saved by two threads at once.
+        with self._lock:
+            if not os.path.exists(stored):
+                if _link(path, stored):
+                    self.stats["files"] += 1
+                else:
+                    self._disable()
+                return False
+
+        if os.path.samefile(path, stored):
+            return True
+
+        # Link under a temporary name so the file is replaced in one step.
+        temp = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+        try:
+            if not _link(stored, temp):
+                with self._lock:
+                    self._disable()
+                return False
+            size = os.path.getsize(path)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+        with self._lock:
+            self.stats["duplicates"] += 1
+            self.stats["saved"] += size
+
+        return True
+
+    def _disable(self):
+        """Stop storing files, the lock must be held."""
+
+        if self.enabled:
+            self.enabled = False
+            text = TextColors()
+            print(
+                text.warning(
+                    "Files can't be linked in the download location, "
+                    "duplicates won't be stored once."
+                )
+            )
+
+
+def _link(source, target):
+    """Link target to the source file with a hardlink or a reflink.
+
+    Returns:
+        False if neither kind of link is supported.
+
+    """
+
+    try:
+        os.link(source, target)
+        return True
+    except OSError as e:
+        # Hardlinks can't cross filesystems or aren't supported.
+        if e.errno not in [errno.EXDEV, errno.EPERM, errno.EMLINK]:
+            raise
+
+    if fcntl is None:
+        return False
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+
+    # Reflinks aren't supported either.
+    os.remove(target)
+    return False
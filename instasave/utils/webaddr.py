@@ -1,26 +1,28 @@
 import re
+from urllib.parse import urlsplit
 
 import requests
 
+from instasave.utils import settings
 
-def validate_url(url):
-    """Validate that the url is working and belongs to a post."""
+# Path of a link to an Instagram post.
+POST_PATTERN = "/[ptv]{1,2}/[a-zA-Z0-9_-]{11}"
 
-    url = clean_url(url)
 
-    if not is_working(url):
-        raise SystemExit("Sorry, this page isn't available.")
+def validate_url(url):
+    """Validate that the url belongs to a post.
 
-    return url
+    The url isn't checked to be working, since the post page is fetched
+    anyway when the post is downloaded.
+    """
+    return clean_url(url)
 
 
 def clean_url(url):
     """Return clean post URL without UTM code at the end."""
 
     # Pattern that match a link to an Instagram post.
-    match = re.match(
-        "^http[s]?://www.instagram.com/[ptv]{1,2}/[a-zA-Z0-9_-]{11}", url
-    )
+    match = re.match(_host() + POST_PATTERN, url)
     # Shut down the program if the URL didn't match the pattern.
     if not match:
         raise SystemExit("Didn't match a post url.")
@@ -30,29 +32,30 @@ def clean_url(url):
     return clean_url
 
 
+def is_post_url(url):
+    """Return true if the url links to a post."""
+    return bool(re.match(_host() + POST_PATTERN, url))
+
+
 def get_url(id, hashtag):
     """Return URL to a hashtag or a user."""
 
     if hashtag:
         # Pattern for hashtags.
-        url = re.match(
-            "^http[s]?://www.instagram.com/explore/tags/[a-zA-Z0-9_]+", id
-        )
+        url = re.match(_host() + "/explore/tags/[a-zA-Z0-9_]+", id)
         name = re.match("^[a-zA-Z0-9_]+$", id)
     else:
         # Patterns for usernames.
-        url = re.match(
-            r"^http[s]?://www.instagram.com/[a-zA-Z0-9_\.]{2,30}[/]?$", id
-        )
+        url = re.match(_host() + r"/[a-zA-Z0-9_\.]{2,30}[/]?$", id)
         name = re.match(r"^[a-zA-Z0-9_\.]{2,30}$", id)
 
     # Return full username or hashtag url.
     if url:
         return url.group()
     elif name and hashtag:
-        return "https://www.instagram.com/explore/tags/" + name.group()
+        return settings.BASE_URL + "/explore/tags/" + name.group()
     elif name and not hashtag:
-        return "https://www.instagram.com/" + name.group()
+        return settings.BASE_URL + "/" + name.group()
     # Shut down program if some unexpected error occurres.
     else:
         raise SystemExit(
@@ -60,11 +63,40 @@ def get_url(id, hashtag):
         )
 
 
-def is_working(url):
-    """Check if URL is working."""
+def is_working(url, session=None):
+    """Check if URL is working without downloading the page."""
+
+    r = _request("head", url, session, allow_redirects=True)
+
+    if r.status_code != 200:
+        return False
+
+    return True
+
+
+def fetch_page(url, session=None, headers=None, statuses=(200, 304)):
+    """Return response from a working page.
+
+    A page that hasn't been modified since it was last fetched is working
+    too, when it's requested with conditional headers. Pass other status
+    codes to accept, like 404 for pages that may not exist.
+    """
+
+    r = _request("get", url, session, headers=headers)
+
+    if r.status_code not in statuses:
+        raise SystemExit("Sorry, this page isn't available.")
+
+    return r
+
+
+def _request(method, url, session=None, **kwargs):
+    """Send request and shut down the program if it couldn't be sent."""
+
+    session = session or requests
 
     try:
-        r = requests.get(url)
+        return getattr(session, method)(url, **kwargs)
     except requests.exceptions.MissingSchema:
         raise SystemExit("Invalid URL")
     except requests.exceptions.ConnectionError:
@@ -72,7 +104,9 @@ def is_working(url):
     except requests.exceptions.Timeout:
         raise SystemExit("Timeout")
 
-    if r.status_code != 200:
-        return False
 
-    return True
+def _host():
+    """Return pattern that match the start of an url to Instagram."""
+
+    host = urlsplit(settings.BASE_URL).netloc
+    return "^http[s]?://" + re.escape(host)
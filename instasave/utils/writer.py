@@ -0,0 +1,200 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from instasave.utils.settings import WRITE_BATCH_SIZE, WRITE_QUEUE_SIZE
+
+
+class DiskWriter:
+    """Do the disk writes after a download in a thread of their own.
+
+    Jobs are put in a bounded queue and run in order by one thread, so
+    slow storage doesn't hold up the downloads until the queue is full,
+    and then the downloads wait for a free spot instead of using more
+    memory. Jobs are taken from the queue in batches. The folders the jobs
+    in a batch write to are created before the jobs run, every folder
+    once, and if fsync is set the paths returned by the jobs are synced
+    to disk together with their folders.
+
+    Attributes:
+        maxsize (int): Max number of jobs waiting in the queue.
+        batch_size (int): Max number of jobs taken from the queue at once.
+        fsync (bool): Sync the saved files to disk.
+        stats (dict): Number of jobs, batches and created folders, the
+            most jobs waiting at once, seconds spent writing and seconds
+            waited for a spot.
+
+    """
+
+    def __init__(
+        self,
+        maxsize=WRITE_QUEUE_SIZE,
+        batch_size=WRITE_BATCH_SIZE,
+        fsync=False,
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.stats = {
+            "jobs": 0,
+            "batches": 0,
+            "folders": 0,
+            "max_queued": 0,
+            "seconds": 0.0,
+            "max_seconds": 0.0,
+            "blocked": 0.0,
+        }
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def queued(self):
+        """Return number of jobs waiting in the queue."""
+        return self._queue.qsize()
+
+    def submit(self, func, *args, folder=None):
+        """Queue a job, wait for a spot in the queue if it's full.
+
+        Args:
+            func (func): Called with the args in the writer thread.
+            folder (str): Folder the job writes to, created before the
+                job runs if it doesn't exist.
+
+        Returns:
+            Future with the result of the job.
+
+        """
+
+        # Stop taking jobs when one of them has failed.
+        if self._error is not None:
+            raise self._error
+
+        future = Future()
+        start = time.monotonic()
+        self._queue.put((future, func, args, folder))
+
+        with self._lock:
+            self.stats["blocked"] += time.monotonic() - start
+            self.stats["max_queued"] = max(
+                self.stats["max_queued"], self._queue.qsize()
+            )
+
+        return future
+
+    def close(self):
+        """Wait for every queued job to be done and stop the thread.
+
+        Raises the error of the first failed job, if any.
+        """
+
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        """Run queued jobs in batches until the writer is closed."""
+
+        while True:
+            batch = [self._queue.get()]
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            jobs = [job for job in batch if job is not None]
+            failed = self._create_folders({job[3] for job in jobs} - {None})
+
+            paths = []
+            for future, func, args, folder in jobs:
+                if folder in failed:
+                    self._fail(future, failed[folder])
+                else:
+                    paths.append(self._do(future, func, args))
+
+            if self.fsync:
+                try:
+                    _sync([path for path in paths if isinstance(path, str)])
+                except OSError as e:
+                    if self._error is None:
+                        self._error = e
+
+            with self._lock:
+                self.stats["batches"] += 1
+
+            if None in batch:
+                return
+
+    def _create_folders(self, folders):
+        """Create the folders and return errors by the folders that failed."""
+
+        failed = {}
+
+        for folder in folders:
+            try:
+                os.makedirs(folder, exist_ok=True)
+            except OSError as e:
+                failed[folder] = e
+
+        with self._lock:
+            self.stats["folders"] += len(folders)
+
+        return failed
+
+    def _fail(self, future, error):
+        """Fail a job with the error."""
+
+        if self._error is None:
+            self._error = error
+        future.set_exception(error)
+
+    def _do(self, future, func, args):
+        """Run a job and return its result."""
+
+        start = time.perf_counter()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._fail(future, e)
+            return None
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stats["jobs"] += 1
+                self.stats["seconds"] += seconds
+                self.stats["max_seconds"] = max(
+                    self.stats["max_seconds"], seconds
+                )
+
+        future.set_result(result)
+
+        return result
+
+
+def _sync(paths):
+    """Sync the files and every folder they are in to disk."""
+
+    folders = set()
+
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+        folders.add(os.path.dirname(path))
+
+    for folder in folders:
+        fd = os.open(folder, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
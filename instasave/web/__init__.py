@@ -1 +1,9 @@
-__all__ = ["client", "geckoloader"]
+__all__ = [
+    "client",
+    "fakeserver",
+    "geckoloader",
+    "ratelimit",
+    "replay",
+    "session",
+    "transfer",
+]
@@ -0,0 +1,539 @@
+import argparse
+import io
+import json
+import random
+import re
+import string
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+# Page layout with the shared data script as the body's fifth child,
+# where the CSS selector in the settings expects it to be.
+PAGE = """<!DOCTYPE html>
+<html>
+    <head>
+      <title>{title}</title>
+    </head>
+    <body>
+    <span></span>
+    <link/>
+    <link/>
+    <link/>
+<script type="text/javascript">window._sharedData = {data};</script>
+{content}
+    </body>
+</html>
+"""
+
+# Number of posts embedded in the shared data of feed pages.
+FIRST_PAGE = 12
+
+# Characters in shortcodes.
+SHORTCODE_CHARS = string.ascii_letters + string.digits + "_-"
+
+
+class FakeInstagram:
+    """Generated users, hashtags and posts served by a FakeServer.
+
+    Every user has the same number of posts, which are spread out evenly
+    over the hashtags. There is also a private user named "private".
+
+    Attributes:
+        users (dict): Usernames and shortcodes of their posts.
+        hashtags (dict): Hashtags and shortcodes of their posts.
+        posts (dict): Shortcodes and data about the posts.
+        media_size (int): Size in bytes of every image and video.
+
+    """
+
+    def __init__(
+        self, users=3, posts=50, hashtags=2, media_size=100 * 1024, seed=0
+    ):
+        """Generate users and posts from the seed."""
+
+        rng = random.Random(seed)
+        self.media_size = media_size
+        self.users = {}
+        self.hashtags = {f"tag{i}": [] for i in range(hashtags)}
+        self.posts = {}
+        self._jpeg = _jpeg_header()
+
+        for u in range(users):
+            username = f"user{u}"
+            self.users[username] = []
+
+            for p in range(posts):
+                shortcode = self._shortcode(rng)
+                kind = rng.choices(
+                    ["GraphImage", "GraphVideo", "GraphSidecar"], [6, 2, 2]
+                )[0]
+                children = []
+                if kind == "GraphSidecar":
+                    children = [
+                        (self._shortcode(rng), rng.random() < 0.3)
+                        for _ in range(rng.randint(2, 5))
+                    ]
+                tag = f"tag{p % hashtags}" if hashtags else None
+
+                self.posts[shortcode] = {
+                    "shortcode": shortcode,
+                    "username": username,
+                    "type": kind,
+                    "taken_at": 1570000000 - p * 3600 - u,
+                    "children": children,
+                    "likes": rng.randint(0, 10000),
+                    "comments": rng.randint(0, 500),
+                    "caption": f"Post {p} by {username} #{tag}",
+                }
+                self.users[username].append(shortcode)
+                if tag:
+                    self.hashtags[tag].append(shortcode)
+
+        self.users["private"] = []
+
+    def shortcode_media(self, shortcode, base_url):
+        """Return post data like it's embedded in a post page."""
+
+        post = self.posts[shortcode]
+        media = {
+            "__typename": post["type"],
+            "shortcode": shortcode,
+            "taken_at_timestamp": post["taken_at"],
+            "owner": {
+                "username": post["username"],
+                "full_name": post["username"].title(),
+                "is_private": False,
+                "is_verified": False,
+            },
+            "caption_is_edited": False,
+            "comments_disabled": False,
+            "edge_media_preview_like": {"count": post["likes"]},
+            "edge_media_to_parent_comment": {"count": post["comments"]},
+            "edge_media_to_caption": {
+                "edges": [{"node": {"text": post["caption"]}}]
+            },
+            "location": None,
+            "is_video": post["type"] == "GraphVideo",
+        }
+        media.update(self._media(shortcode, 0, media["is_video"], base_url))
+
+        if post["type"] == "GraphVideo":
+            media["title"] = ""
+            media["video_duration"] = 10.0
+            media["product_type"] = "feed"
+        elif post["type"] == "GraphSidecar":
+            media["edge_sidecar_to_children"] = {
+                "edges": [
+                    {
+                        "node": dict(
+                            {
+                                "__typename": (
+                                    "GraphVideo" if is_video else "GraphImage"
+                                ),
+                                "shortcode": child,
+                                "is_video": is_video,
+                            },
+                            **self._media(child, i, is_video, base_url),
+                        )
+                    }
+                    for i, (child, is_video) in enumerate(post["children"])
+                ]
+            }
+
+        return media
+
+    def media(self, name):
+        """Return content of an image or video file, None if unknown."""
+
+        match = re.match(r"^([A-Za-z0-9_-]{11})_(\d+)\.(jpg|mp4)$", name)
+        if not match:
+            return None
+
+        # Every file starts with a valid signature and is unique.
+        if match.group(3) == "jpg":
+            head = self._jpeg + name.encode()
+        else:
+            head = b"\x00\x00\x00\x18ftypmp42" + name.encode()
+
+        return head + bytes(max(self.media_size - len(head), 0))
+
+    def _media(self, shortcode, index, is_video, base_url):
+        """Return urls to the file of a post or a file in a sidecar."""
+
+        ext = "mp4" if is_video else "jpg"
+        # Signatures like the ones on Instagram's CDN.
+        url = f"{base_url}/media/{shortcode}_{index}.{ext}?oh=0"
+
+        media = {"display_url": url.replace(".mp4", ".jpg")}
+        if is_video:
+            media["video_url"] = url
+        else:
+            media["accessibility_caption"] = "Generated image."
+
+        return media
+
+    def _shortcode(self, rng):
+        """Return new unique shortcode."""
+
+        while True:
+            shortcode = "".join(rng.choice(SHORTCODE_CHARS) for _ in range(11))
+            if shortcode not in self.posts:
+                return shortcode
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Local stand-in for Instagram and its CDN.
+
+    Serves post pages, user and hashtag feed pages and media files like
+    Instagram does, with configurable latency, bandwidth and error rates.
+
+    Attributes:
+        instagram (obj): FakeInstagram with the users and posts to serve.
+        latency (float): Seconds to wait before every response.
+        bandwidth (int): Bytes per second to send every response with,
+            unlimited if zero.
+        error_rate (float): Share of requests that fail with a 500 error.
+        throttle_rate (float): Share of requests that are throttled with
+            a 429 response.
+        stats (Counter): Number of responses sent by kind.
+
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        instagram=None,
+        latency=0,
+        bandwidth=0,
+        error_rate=0,
+        throttle_rate=0,
+        seed=0,
+    ):
+        """Bind the server to the address."""
+
+        super().__init__(address, FakeHandler)
+        self.instagram = instagram or FakeInstagram(seed=seed)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """Return url that InstaSave's base url should be set to."""
+
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve requests in a background thread."""
+
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop serving requests and close the socket."""
+
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def count(self, kind):
+        """Count a sent response."""
+
+        with self._lock:
+            self.stats[kind] += 1
+
+    def fail(self):
+        """Return status code to fail the request with, or None."""
+
+        with self._lock:
+            roll = self._rng.random()
+
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+
+        return None
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Answer requests to a FakeServer."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        server = self.server
+        instagram = server.instagram
+        url = urlsplit(self.path)
+        path = url.path
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        status = server.fail()
+        if status:
+            server.count(str(status))
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return self._send(status, b"", "text/html", headers, body)
+
+        match = re.match(r"^/(p|tv)/([A-Za-z0-9_-]{11})/?$", path)
+        if match and match.group(2) in instagram.posts:
+            server.count("post")
+            media = instagram.shortcode_media(match.group(2), server.base_url)
+            data = {
+                "entry_data": {
+                    "PostPage": [{"graphql": {"shortcode_media": media}}]
+                }
+            }
+            return self._page("Post", data, "", body)
+
+        match = re.match(r"^/explore/tags/([a-zA-Z0-9_]+)/?$", path)
+        if match and match.group(1) in instagram.hashtags:
+            server.count("hashtag")
+            posts = instagram.hashtags[match.group(1)]
+            media = dict(self._edges(posts), count=len(posts))
+            hashtag = {"name": match.group(1), "edge_hashtag_to_media": media}
+            data = {
+                "entry_data": {"TagPage": [{"graphql": {"hashtag": hashtag}}]}
+            }
+            return self._page("Hashtag", data, self._feed(posts), body)
+
+        if path == "/graphql/query/":
+            server.count("feed")
+            return self._query(parse_qs(url.query), body)
+
+        match = re.match(r"^/([a-zA-Z0-9_\.]{2,30})/?$", path)
+        if match and match.group(1) in instagram.users:
+            server.count("user")
+            posts = instagram.users[match.group(1)]
+            media = dict(self._edges(posts), count=len(posts))
+            user = {
+                "id": str(list(instagram.users).index(match.group(1)) + 1),
+                "username": match.group(1),
+                "is_private": match.group(1) == "private",
+                "edge_owner_to_timeline_media": media,
+            }
+            data = {
+                "entry_data": {"ProfilePage": [{"graphql": {"user": user}}]}
+            }
+            return self._page("User", data, self._feed(posts), body)
+
+        match = re.match(r"^/media/([^/]+)$", path)
+        content = instagram.media(match.group(1)) if match else None
+        if content is not None:
+            server.count("media")
+            return self._media(match.group(1), content, body)
+
+        server.count("404")
+        page = PAGE.format(
+            title="Page Not Found • Instagram", data="{}", content=""
+        )
+        self._send(404, page.encode(), "text/html", {}, body)
+
+    def log_message(self, *args):
+        pass
+
+    def _page(self, title, data, content, body):
+        """Send page with embedded shared data."""
+
+        page = PAGE.format(title=title, data=json.dumps(data), content=content)
+        self._send(200, page.encode(), "text/html; charset=utf-8", {}, body)
+
+    def _feed(self, posts):
+        """Return main content of a feed page with links to every post."""
+
+        links = "".join(
+            f'<a href="/p/{shortcode}/"><div class="eLAPa"></div></a>'
+            for shortcode in posts
+        )
+
+        return f'<main><div class="SCxLW">{links}</div></main>'
+
+    def _query(self, query, body):
+        """Send next page of a user or hashtag feed as json."""
+
+        instagram = self.server.instagram
+
+        try:
+            variables = json.loads(query["variables"][0])
+            start = int(variables.get("after") or 0)
+            count = int(variables.get("first", FIRST_PAGE))
+        except (KeyError, ValueError):
+            return self._send(400, b"", "application/json", {}, body)
+
+        users = list(instagram.users)
+        user = variables.get("id", "")
+        tag = variables.get("tag_name")
+
+        if user.isdigit() and 0 < int(user) <= len(users):
+            posts = instagram.users[users[int(user) - 1]]
+            media = self._edges(posts, start, count)
+            data = {"user": {"edge_owner_to_timeline_media": media}}
+        elif tag in instagram.hashtags:
+            posts = instagram.hashtags[tag]
+            media = self._edges(posts, start, count)
+            data = {"hashtag": {"edge_hashtag_to_media": media}}
+        else:
+            data = {"user": None}
+
+        content = json.dumps({"data": data, "status": "ok"}).encode()
+        self._send(200, content, "application/json", {}, body)
+
+    def _edges(self, posts, start=0, count=FIRST_PAGE):
+        """Return a page of posts in a feed and where the next one starts.
+
+        Cursors are simply the position of the first post on a page.
+        """
+
+        end = start + count
+
+        return {
+            "page_info": {
+                "has_next_page": len(posts) > end,
+                "end_cursor": str(end) if len(posts) > end else None,
+            },
+            "edges": [
+                {"node": {"shortcode": shortcode}}
+                for shortcode in posts[start:end]
+            ],
+        }
+
+    def _media(self, name, content, body):
+        """Send image or video file, or the requested range of it."""
+
+        content_type = "video/mp4" if name.endswith(".mp4") else "image/jpeg"
+        headers = {"ETag": f'"{name}"', "Accept-Ranges": "bytes"}
+        match = re.match(r"^bytes=(\d+)-$", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        start = int(match.group(1)) if match else 0
+
+        if start and if_range not in [None, headers["ETag"]]:
+            start = 0
+
+        if start >= len(content) > 0:
+            headers["Content-Range"] = f"bytes */{len(content)}"
+            return self._send(416, b"", content_type, headers, body)
+
+        if start:
+            end = len(content) - 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+            return self._send(
+                206, content[start:], content_type, headers, body
+            )
+
+        self._send(200, content, content_type, headers, body)
+
+    def _send(self, status, content, content_type, headers, body):
+        """Send response, limited to the server's bandwidth."""
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        if not body:
+            return
+
+        bandwidth = self.server.bandwidth
+        chunk_size = min(bandwidth, 64 * 1024) if bandwidth else len(content)
+        view = memoryview(content)
+
+        for i in range(0, len(content), chunk_size or 1):
+            self.wfile.write(view[i : i + chunk_size])
+            if bandwidth:
+                time.sleep(chunk_size / bandwidth)
+
+
+def _jpeg_header():
+    """Return a small but valid jpeg image."""
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "white").save(buffer, "JPEG")
+
+    return buffer.getvalue()
+
+
+def main():
+    """Start a fake Instagram server for end-to-end load testing."""
+
+    parser = argparse.ArgumentParser(
+        prog="python -m instasave.web.fakeserver",
+        description=(
+            "Serve generated Instagram posts, feeds and media files locally. "
+            "Point InstaSave at it with --base-url or INSTASAVE_BASE_URL."
+        ),
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--posts", type=int, default=50, help="Per user.")
+    parser.add_argument("--hashtags", type=int, default=2)
+    parser.add_argument(
+        "--media-size", type=int, default=100 * 1024, metavar="BYTES"
+    )
+    parser.add_argument("--latency", type=float, default=0, metavar="SECONDS")
+    parser.add_argument(
+        "--bandwidth",
+        type=int,
+        default=0,
+        metavar="BYTES",
+        help="Bytes per second per response, 0 for no limit.",
+    )
+    parser.add_argument("--error-rate", type=float, default=0, metavar="RATE")
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0, metavar="RATE"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    instagram = FakeInstagram(
+        args.users, args.posts, args.hashtags, args.media_size, args.seed
+    )
+    server = FakeServer(
+        (args.host, args.port),
+        instagram,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+
+    print(f"Serving fake Instagram on {server.base_url}")
+    print(f"Users: {', '.join(instagram.users)}")
+    print(f"Hashtags: {', '.join(instagram.hashtags)}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(dict(server.stats))
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
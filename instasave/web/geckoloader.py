@@ -14,10 +14,11 @@ from instasave.utils.settings import DATA_DIR, GECKODRIVER
 class GeckoLoader:
     """Download latest geckodriver from github."""
 
-    def __init__(self, headers, verbose=False):
+    def __init__(self, headers, verbose=False, session=None):
         """Takes HTTP headers as argument and downloads the geckodriver."""
 
         self._text = TextColors()
+        self._session = session or requests
         self._url = "https://github.com/mozilla/geckodriver/releases/latest"
 
         downloaded_driver = self._get_geckodriver(self._url, headers)
@@ -76,7 +77,7 @@ class GeckoLoader:
             if system_name and architecture_bits:
 
                 url = self._url[:19] + driver
-                file_content = requests.get(url, headers).content
+                file_content = self._session.get(url, headers=headers).content
                 pattern = r"geckodriver-v[0-9\.-]+[a-z0-9]+\.[a-z\.]+$"
                 filename = re.search(pattern, driver).group()
 
@@ -96,7 +97,7 @@ class GeckoLoader:
     def _get_driver_paths(self, url, headers):
         """Return list of available geckodrivers."""
 
-        r = requests.get(url, headers)
+        r = self._session.get(url, headers=headers)
         soup = BeautifulSoup(r.text, "html.parser")
         pattern = r"([/][a-z]+)+[0-9\./]+geckodriver-v[a-z0-9\.\-]+"
         paths = [
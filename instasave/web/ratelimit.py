@@ -0,0 +1,246 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from instasave.utils.color import TextColors
+from instasave.utils.settings import (
+    CIRCUIT_BREAKER_COOLDOWN,
+    CIRCUIT_BREAKER_THRESHOLD,
+    MIN_RATE_LIMIT,
+    RATE_LIMIT,
+    THROTTLE_BACKOFF,
+    THROTTLE_BACKOFF_MAX,
+    THROTTLE_RETRIES,
+)
+
+# Responses that mean the server wants fewer requests.
+THROTTLE_STATUSES = [429, 503]
+
+
+class TokenBucket:
+    """Limit the number of requests sent per second.
+
+    The rate is halved when the host throttles a request and then raised
+    again a tenth of the max rate for every successful request, so the
+    rate settles just below the host's limit. Requests sent at the old
+    rate are often throttled together, so the rate is halved at most once
+    per backoff window, the time between two requests at the new rate.
+
+    Attributes:
+        max_rate (float): Highest number of requests per second.
+        rate (float): Current number of requests per second.
+        capacity (float): Number of requests that can be sent at once.
+
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Initialize a full bucket."""
+
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._slowed = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request can be sent."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Reserve a token, waiting threads queue up in negative tokens.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+    def slow_down(self):
+        """Halve the rate, unless it was halved within the backoff window.
+
+        Returns:
+            True if the rate was halved.
+
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            if self._slowed is not None and now - self._slowed < 1 / self.rate:
+                return False
+            self._slowed = now
+            self.rate = max(self.rate / 2, MIN_RATE_LIMIT)
+
+            return True
+
+    def speed_up(self):
+        """Raise the rate, but never above the max rate."""
+
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate / 10, self.max_rate)
+
+
+class CircuitBreaker:
+    """Pause every request when a host keeps throttling requests.
+
+    Attributes:
+        threshold (int): Throttled requests in a row that opens the breaker.
+        cooldown (float): Seconds to pause every request when open.
+
+    """
+
+    def __init__(
+        self,
+        threshold=CIRCUIT_BREAKER_THRESHOLD,
+        cooldown=CIRCUIT_BREAKER_COOLDOWN,
+    ):
+        """Initialize a closed breaker."""
+
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """Return true if requests are paused."""
+        return self._open_until > time.monotonic()
+
+    def wait(self):
+        """Wait until requests are no longer paused."""
+
+        delay = self._open_until - time.monotonic()
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._open_until - time.monotonic()
+
+    def record(self, throttled, delay=0):
+        """Record the outcome of a request.
+
+        Args:
+            throttled (bool): The request was throttled.
+            delay (float): Seconds the server asked to wait.
+
+        Returns:
+            True if the breaker opened because of this request.
+
+        """
+
+        with self._lock:
+            if not throttled:
+                self._failures = 0
+                return False
+
+            self._failures += 1
+            if self._failures < self.threshold:
+                return False
+
+            self._failures = 0
+            pause = max(self.cooldown, delay)
+            self._open_until = max(self._open_until, time.monotonic() + pause)
+
+            return True
+
+
+class RateLimiter:
+    """Schedule requests to stay below the request rate of every host.
+
+    Attributes:
+        rate (float): Max requests per second to a single host, no limit
+            if zero.
+        retries (int): Times to retry a throttled request.
+        breaker (obj): CircuitBreaker shared by every host.
+        verbose (bool): Display more information if set to true.
+
+    """
+
+    def __init__(
+        self, rate=RATE_LIMIT, retries=THROTTLE_RETRIES, verbose=False
+    ):
+        """Initialize rate limiter without any known hosts."""
+
+        self.rate = rate
+        self.retries = retries
+        self.breaker = CircuitBreaker()
+        self.verbose = verbose
+        self.throttled_requests = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Wait until a request can be sent to the host."""
+
+        self.breaker.wait()
+
+        if self.rate:
+            self._bucket(host).acquire()
+
+    def success(self, host):
+        """Record a request that wasn't throttled."""
+
+        self.breaker.record(False)
+
+        if self.rate:
+            self._bucket(host).speed_up()
+
+    def throttled(self, host, attempt, retry_after=None):
+        """Record a throttled request and return seconds to back off.
+
+        Args:
+            host (str): Host that throttled the request.
+            attempt (int): Number of times the request has been retried.
+            retry_after (str): Value of the Retry-After header if any.
+
+        """
+
+        with self._lock:
+            self.throttled_requests += 1
+
+        if self.rate:
+            self._bucket(host).slow_down()
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            # Exponential backoff with full jitter.
+            delay = random.uniform(
+                0, min(THROTTLE_BACKOFF * 2**attempt, THROTTLE_BACKOFF_MAX)
+            )
+
+        if self.breaker.record(True, delay) and self.verbose:
+            text = TextColors()
+            print(text.warning(f"Throttled by {host}, pausing requests."))
+
+        return delay
+
+    def _bucket(self, host):
+        """Return token bucket for the host."""
+
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate)
+            return self._buckets[host]
+
+
+def parse_retry_after(value):
+    """Return seconds to wait from a Retry-After header, or None."""
+
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(date.timestamp() - time.time(), 0)
@@ -0,0 +1,278 @@
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict, deque
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from instasave.utils.settings import CHUNK_SIZE
+
+# Name of the file in the archive with every recorded exchange.
+INDEX = "index.json"
+
+
+class RecordAdapter(BaseAdapter):
+    """Transport adapter that records every exchange into a zip archive.
+
+    Requests are sent through another adapter, and the bodies are copied
+    to a temporary file as the caller reads them, so downloads are still
+    streamed. An exchange is saved in the archive when its body has been
+    read or the response is closed, and the rest of the body is read
+    first if it wasn't. Bodies are saved as they are received, compressed
+    if they are text.
+
+    Attributes:
+        adapter (obj): Adapter that sends the requests.
+        path (str): Path to the archive.
+
+    """
+
+    def __init__(self, adapter, path):
+        """Create a new archive and start recording."""
+
+        super().__init__()
+        self.adapter = adapter
+        self.path = path
+        self._entries = []
+        self._pending = set()
+        self._archive = zipfile.ZipFile(path, "w")
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """Return the stats of the adapter that sends the requests."""
+        return self.adapter.stats
+
+    def send(self, request, **kwargs):
+        """Send request and record the response as it's read."""
+
+        start = time.perf_counter()
+        r = self.adapter.send(request, **kwargs)
+        r.raw = _RecordedBody(self, request, r, start)
+
+        with self._lock:
+            self._pending.add(r.raw)
+
+        return r
+
+    def close(self):
+        """Save the index and close the archive and the adapter."""
+
+        # Responses that are still open are saved with the rest of the body.
+        for body in list(self._pending):
+            body.close()
+
+        with self._lock:
+            if self._archive.fp:
+                self._archive.writestr(
+                    INDEX, json.dumps(self._entries), zipfile.ZIP_DEFLATED
+                )
+                self._archive.close()
+
+        self.adapter.close()
+
+    def _save(self, body, request, r, duration):
+        """Save a completely read exchange in the archive."""
+
+        # The body is saved decoded, so the headers have to say so.
+        headers = {
+            key: value
+            for key, value in r.headers.items()
+            if key.lower() != "content-encoding"
+        }
+        # A broken transfer keeps its length, so it's broken when replayed.
+        if "Content-Length" in r.headers and body.complete:
+            headers["Content-Length"] = str(body.size)
+
+        content_type = r.headers.get("Content-Type", "")
+        compress = content_type.startswith(("text/", "application/json"))
+
+        with self._lock:
+            self._pending.discard(body)
+
+            # The archive is closed if recording stopped in the meantime.
+            if not self._archive.fp:
+                return
+
+            name = f"{len(self._entries):06}.body"
+            self._entries.append(
+                {
+                    "method": request.method,
+                    "url": request.url,
+                    "range": request.headers.get("Range"),
+                    "status": r.status_code,
+                    "reason": r.reason,
+                    "headers": headers,
+                    "elapsed": r.elapsed.total_seconds(),
+                    "duration": duration,
+                    "body": name,
+                }
+            )
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = (
+                zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            )
+            body.file.seek(0)
+            with self._archive.open(info, "w", force_zip64=True) as f:
+                shutil.copyfileobj(body.file, f, CHUNK_SIZE)
+
+
+class _RecordedBody:
+    """Raw response body that is copied to a temporary file as it's read.
+
+    Everything else is passed on to the raw response from the adapter.
+    """
+
+    def __init__(self, adapter, request, response, start):
+        self._adapter = adapter
+        self._request = request
+        self._response = response
+        self._raw = response.raw
+        self._start = start
+        self._done = False
+        self.complete = False
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def stream(self, amt=CHUNK_SIZE, decode_content=None):
+        """Yield decoded chunks of the body and record them."""
+
+        for chunk in self._raw.stream(amt, decode_content=True):
+            self._record(chunk)
+            yield chunk
+
+        self.complete = True
+        self._finish()
+
+    def read(self, amt=None, *args, **kwargs):
+        """Return decoded bytes of the body and record them."""
+
+        chunk = self._raw.read(amt, decode_content=True)
+        self._record(chunk)
+
+        if not chunk or amt is None:
+            self.complete = True
+            self._finish()
+
+        return chunk
+
+    def close(self):
+        """Save the exchange and close the raw response."""
+
+        if not self._done:
+            # Record the whole body even if the caller didn't read it.
+            try:
+                for chunk in self._raw.stream(CHUNK_SIZE, decode_content=True):
+                    self._record(chunk)
+                self.complete = True
+            except Exception:
+                pass
+            self._finish()
+
+        self._raw.close()
+
+    def release_conn(self):
+        self._raw.release_conn()
+
+    def _record(self, chunk):
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def _finish(self):
+        """Save the exchange once the body has been read."""
+
+        if self._done:
+            return
+
+        self._done = True
+        duration = time.perf_counter() - self._start
+
+        try:
+            self._adapter._save(self, self._request, self._response, duration)
+        finally:
+            self.file.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers requests from a recorded archive.
+
+    Requests are matched by method, url and range. Repeated requests get
+    the recorded responses in the same order as they were recorded, and
+    the last one over and over again when there are no more.
+
+    Attributes:
+        path (str): Path to the archive.
+        realtime (bool): Take as long time as the recorded exchange did,
+            otherwise answer right away.
+
+    """
+
+    def __init__(self, path, realtime=False):
+        """Open the archive and index the recorded exchanges."""
+
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.replayed = 0
+        self._archive = zipfile.ZipFile(path)
+        self._responses = defaultdict(deque)
+        self._lock = threading.Lock()
+
+        try:
+            entries = json.loads(self._archive.read(INDEX))
+        except KeyError:
+            raise SystemExit(f"{path} isn't a recorded archive.")
+
+        for entry in entries:
+            key = (entry["method"], entry["url"], entry["range"])
+            self._responses[key].append(entry)
+
+    @property
+    def stats(self):
+        """Return number of replayed requests, nothing is sent."""
+        return {"requests": 0, "connections": 0, "replayed": self.replayed}
+
+    def send(self, request, **kwargs):
+        """Return the recorded response to the request."""
+
+        key = (request.method, request.url, request.headers.get("Range"))
+
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise requests.exceptions.ConnectionError(
+                    f"No recorded response to {request.method} {request.url}",
+                    request=request,
+                )
+            entry = responses.popleft() if len(responses) > 1 else responses[0]
+            body = self._archive.read(entry["body"])
+            self.replayed += 1
+
+        if self.realtime:
+            time.sleep(entry["duration"])
+
+        r = requests.Response()
+        r.status_code = entry["status"]
+        r.reason = entry["reason"]
+        r.headers = CaseInsensitiveDict(entry["headers"])
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.raw = io.BytesIO(body)
+        r.url = request.url
+        r.request = request
+        r.connection = self
+
+        return r
+
+    def close(self):
+        """Close the archive."""
+        self._archive.close()
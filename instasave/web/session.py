@@ -0,0 +1,175 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instasave.utils.settings import (
+    MAX_RETRIES,
+    POOL_CONNECTIONS,
+    POOL_MAXSIZE,
+    RETRY_BACKOFF,
+)
+from instasave.web.ratelimit import THROTTLE_STATUSES
+from instasave.web.replay import RecordAdapter, ReplayAdapter
+
+# Server errors that are retried without slowing down the requests.
+SERVER_ERRORS = [500, 502, 504]
+
+
+class PoolAdapter(HTTPAdapter):
+    """Transport adapter that keeps track of the connection pools it uses.
+
+    urllib3 counts sent requests and opened connections for every pool,
+    which is what the connection reuse statistics are calculated from.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._pools = {}
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, url, proxies=None):
+        """Return connection pool for the url and remember it."""
+
+        pool = super().get_connection(url, proxies)
+
+        with self._lock:
+            self._pools[id(pool)] = pool
+
+        return pool
+
+    @property
+    def stats(self):
+        """Return number of requests sent and connections opened."""
+
+        with self._lock:
+            pools = list(self._pools.values())
+
+        return {
+            "requests": sum(pool.num_requests for pool in pools),
+            "connections": sum(pool.num_connections for pool in pools),
+        }
+
+
+class HTTPSession(requests.Session):
+    """Connection pooled session shared by every request in a run.
+
+    Connections are kept alive and reused between requests to the same
+    host, so the TCP and TLS handshakes and the DNS lookup are only done
+    when a new connection has to be opened.
+
+    Attributes:
+        headers (dict): HTTP headers sent with every request.
+        pool_connections (int): Number of hosts to keep connection pools for.
+        pool_maxsize (int): Max number of connections to a single host.
+        max_retries (int): Retries on connection and read errors.
+        pool_block (bool): Wait for a free connection instead of opening
+            more than `pool_maxsize` connections to a single host.
+        limiter (obj): RateLimiter that schedules every request, requests
+            are sent right away if not set.
+
+    """
+
+    def __init__(
+        self,
+        headers=None,
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=MAX_RETRIES,
+        pool_block=True,
+        limiter=None,
+    ):
+        """Initialize session and mount a pooled adapter for http(s)."""
+
+        super().__init__()
+        self.limiter = limiter
+
+        if headers:
+            self.headers.update(headers)
+
+        # Only retry broken connections and server errors here, throttled
+        # responses are returned and left to the rate limiter.
+        retries = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            status_forcelist=SERVER_ERRORS,
+            backoff_factor=RETRY_BACKOFF,
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        self.adapter = PoolAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+            pool_block=pool_block,
+        )
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+
+    def record(self, path):
+        """Record every exchange into an archive at the path."""
+
+        self.adapter = RecordAdapter(self.adapter, path)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+
+    def replay(self, path, realtime=False):
+        """Answer every request from an archive recorded by `record`.
+
+        Args:
+            path (str): Path to the archive.
+            realtime (bool): Replay with the recorded latency.
+
+        """
+
+        self.adapter.close()
+        self.adapter = ReplayAdapter(path, realtime)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+
+    @property
+    def stats(self):
+        """Return dict with request, connection, reuse and replay counters."""
+
+        stats = self.adapter.stats
+        stats.setdefault("replayed", 0)
+        stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+        stats["throttled"] = (
+            self.limiter.throttled_requests if self.limiter else 0
+        )
+
+        return stats
+
+    def request(self, method, url, *args, **kwargs):
+        """Send request when the rate limiter allows it.
+
+        Requests that are throttled are retried after backing off. The
+        last response is returned if every attempt was throttled.
+        """
+
+        if not self.limiter:
+            return super().request(method, url, *args, **kwargs)
+
+        host = urlsplit(url).netloc
+
+        for attempt in range(self.limiter.retries + 1):
+            self.limiter.wait(host)
+            r = super().request(method, url, *args, **kwargs)
+
+            if r.status_code not in THROTTLE_STATUSES:
+                self.limiter.success(host)
+                return r
+
+            retry_after = r.headers.get("Retry-After")
+            delay = self.limiter.throttled(host, attempt, retry_after)
+
+            if attempt < self.limiter.retries:
+                r.close()
+                time.sleep(delay)
+
+        return r
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+import requests
+
+from instasave.utils.path import check_path
+from instasave.utils.settings import CHUNK_SIZE, MAX_RETRIES
+
+# Errors that leave a partial download that can be resumed.
+RESUMABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+
+class IncompleteDownload(Exception):
+    """Raised when the server sent fewer bytes than expected."""
+
+
+class PartialDownload:
+    """Download a file to a `.part` file that can be resumed.
+
+    The part file is named after the file in the url, since Instagram's
+    CDN urls contain signatures that change between runs. Validators and
+    the expected size are recorded in a `.part.json` file next to it, so
+    an interrupted download continues from where it stopped with a
+    `Range` request, or starts over if the file has changed on the server
+    or the server doesn't support ranges.
+
+    Attributes:
+        url (str): Url to the file.
+        output (str): Folder to save the part file in.
+        headers (dict): HTTP headers.
+        session (obj): Session to send requests with.
+        path (str): Path to the part file.
+        content_type (str): Content type of the downloaded file.
+        digest (str): Hash of the downloaded content, calculated while the
+            file is streamed to disk.
+
+    """
+
+    def __init__(self, url, output, headers=None, session=None):
+        """Initialize paths to the part file and its recorded state."""
+
+        self.url = url
+        self.output = output
+        self.headers = dict(headers or {})
+        self.session = session or requests
+        self.content_type = None
+        self.digest = None
+
+        name = os.path.basename(urlsplit(url).path) or "download"
+        self.path = os.path.join(output, name + ".part")
+        self._meta_path = self.path + ".json"
+
+        # Byte ranges only make sense for the content as it is stored.
+        self.headers["Accept-Encoding"] = "identity"
+
+    @property
+    def offset(self):
+        """Return number of bytes already downloaded."""
+
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def fetch(self, retries=MAX_RETRIES):
+        """Download the file, resuming any earlier partial download.
+
+        Args:
+            retries (int): Times to resume after a broken connection.
+
+        Returns:
+            Path to the complete part file.
+
+        """
+
+        check_path(self.output)
+
+        for attempt in range(retries + 1):
+            try:
+                self._fetch()
+                return self.path
+            except RESUMABLE_ERRORS + (IncompleteDownload,):
+                if attempt == retries:
+                    raise SystemExit(f"Couldn't download {self.url}")
+
+    def remove(self):
+        """Remove the recorded state of the download."""
+
+        if os.path.exists(self._meta_path):
+            os.remove(self._meta_path)
+
+    def _fetch(self):
+        """Send one request and append the response to the part file."""
+
+        meta = self._load_meta()
+        offset = self.offset if meta else 0
+        headers = dict(self.headers)
+
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            # Only resume if the file is the same as the one started on.
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+
+        r = self.session.get(self.url, headers=headers, stream=True)
+
+        try:
+            # The part file is already complete.
+            if r.status_code == 416 and offset == meta.get("size"):
+                self.content_type = meta.get("content_type")
+                self.digest = self._hash_part().hexdigest()
+                return
+
+            if r.status_code == 206 and self._range_start(r) == offset:
+                mode = "ab"
+                size = self._range_size(r)
+            # The server ignored the range or the file has changed.
+            elif r.status_code == 200:
+                mode = "wb"
+                size = r.headers.get("Content-Length")
+                size = int(size) if size else None
+            elif r.status_code in [206, 416]:
+                self._reset()
+                raise IncompleteDownload(self.url)
+            else:
+                raise SystemExit(f"Couldn't download {self.url}")
+
+            self.content_type = r.headers.get("Content-Type")
+            self._save_meta(
+                {
+                    "url": self._key,
+                    "etag": r.headers.get("ETag"),
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "content_type": self.content_type,
+                    "size": size,
+                }
+            )
+
+            # Continue the hash of the bytes that are already downloaded.
+            digest = self._hash_part() if mode == "ab" else _new_hash()
+
+            with open(self.path, mode) as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+        finally:
+            r.close()
+
+        self.digest = digest.hexdigest()
+
+        if size is not None and self.offset != size:
+            raise IncompleteDownload(self.url)
+
+    @property
+    def _key(self):
+        """Return the url without the signature in the query string."""
+
+        url = urlsplit(self.url)
+        return url.netloc + url.path
+
+    def _range_start(self, r):
+        """Return first byte in a partial response."""
+
+        match = re.match(r"bytes (\d+)-", r.headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+
+    def _range_size(self, r):
+        """Return size of the whole file from a partial response."""
+
+        match = re.search(r"/(\d+)$", r.headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+
+    def _hash_part(self):
+        """Return hash of the bytes in the part file."""
+
+        digest = _new_hash()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+        return digest
+
+    def _load_meta(self):
+        """Return recorded state if it belongs to the same file."""
+
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+        if meta.get("url") != self._key:
+            return {}
+
+        return meta
+
+    def _save_meta(self, meta):
+        """Record validators and size of the file being downloaded."""
+
+        with open(self._meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def _reset(self):
+        """Throw away the partial download and start over."""
+
+        for path in [self.path, self._meta_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _new_hash():
+    """Return new hash object for downloaded content."""
+    return hashlib.blake2b(digest_size=20)
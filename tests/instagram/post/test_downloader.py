@@ -0,0 +1,134 @@
+import os.path
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from instasave.instagram.post import Downloader
+
+HTML = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "test_data",
+    "html",
+)
+
+POSTS = {
+    "https://www.instagram.com/p/B2UUzbyAMrD": "graphimage_html.txt",
+    "https://www.instagram.com/p/B2MmijPgt_B": "graphvideo_html.txt",
+    "https://www.instagram.com/p/B0ObD8SA0Sq": "graphsidecar_html.txt",
+}
+
+
+def fake_get(url, **kwargs):
+    """Return post page for post urls and an image for anything else."""
+
+    response = Mock(status_code=200, headers={"Content-Type": "image/jpeg"})
+    if url in POSTS:
+        with open(os.path.join(HTML, POSTS[url])) as f:
+            response.text = f.read()
+    else:
+        response.iter_content.return_value = [url.encode()]
+
+    return response
+
+
+class TestDownloader(unittest.TestCase):
+    def setUp(self):
+        self.session = Mock()
+        self.session.get.side_effect = fake_get
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def download_all(self, workers):
+        meta = Mock()
+        downloader = Downloader(
+            {},
+            (self.tempdir.name, "out"),
+            session=self.session,
+            workers=workers,
+            meta=meta,
+        )
+        with patch("instasave.instagram.post.save_file") as save_file, patch(
+            "builtins.print"
+        ) as self.mock_print:
+            downloader.download_all(list(POSTS))
+
+        self.downloader = downloader
+
+        return save_file, meta.add
+
+    def test_download_all_sequential(self):
+        save_file, save_meta = self.download_all(1)
+        self.assertEqual(save_file.call_count, 8)
+        self.assertEqual(save_meta.call_count, 8)
+
+    def test_download_all_concurrent(self):
+        save_file, save_meta = self.download_all(4)
+        self.assertEqual(save_file.call_count, 8)
+        self.assertEqual(save_meta.call_count, 8)
+
+    def test_download_all_in_processor(self):
+        processor = Mock()
+        downloader = Downloader(
+            {},
+            (self.tempdir.name, "out"),
+            session=self.session,
+            workers=4,
+            processor=processor,
+        )
+        with patch("instasave.instagram.post.save_file") as save_file, patch(
+            "builtins.print"
+        ):
+            downloader.download_all(list(POSTS))
+
+        save_file.assert_not_called()
+        self.assertEqual(processor.submit.call_count, 8)
+
+    def test_download_all_sidecar_indexes(self):
+        save_file, save_meta = self.download_all(4)
+        indexes = sorted(
+            call[0][1]
+            for call in save_meta.call_args_list
+            if call[0][0].type == "GraphSidecar"
+        )
+        self.assertEqual(indexes, list(range(6)))
+
+    def test_download_all_saves_in_post_folders(self):
+        save_file, save_meta = self.download_all(4)
+        folders = {call[0][1] for call in save_file.call_args_list}
+        self.assertEqual(
+            {os.path.basename(folder) for folder in folders},
+            {"B2UUzbyAMrD", "B2MmijPgt_B", "B0ObD8SA0Sq"},
+        )
+
+    def test_download_all_skips_unavailable_post(self):
+        unavailable = "https://www.instagram.com/p/B2MmijPgt_B"
+
+        def get(url, **kwargs):
+            if url == unavailable:
+                return Mock(status_code=404)
+            return fake_get(url, **kwargs)
+
+        self.session.get.side_effect = get
+        save_file, save_meta = self.download_all(4)
+
+        self.assertEqual(save_file.call_count, 7)
+        self.assertEqual(self.downloader.failed, [unavailable])
+        warnings = [
+            call[0][0]
+            for call in self.mock_print.call_args_list
+            if unavailable in str(call[0][0])
+        ]
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("Sorry, this page isn't available.", warnings[0])
+
+    def test_download_all_fetches_every_post_page_once(self):
+        self.download_all(4)
+        pages = [
+            call[0][0]
+            for call in self.session.get.call_args_list
+            if call[0][0] in POSTS
+        ]
+        self.assertCountEqual(pages, list(POSTS))
+        self.session.head.assert_not_called()
@@ -1,10 +1,12 @@
 import json
 import os.path
+import tempfile
 import unittest
 from unittest.mock import patch
 
 from instasave.instagram.post import PostScraper
 from instasave.utils import hook
+from instasave.utils.cache import PostCache
 from instasave.web.client import HTTPHeaders
 
 HTML = os.path.join(
@@ -29,6 +31,7 @@ class TestPostScraper(unittest.TestCase):
     def test_property_graphimage(self, mock_requests):
         with open(os.path.join(HTML, "graphimage_html.txt")) as f:
             mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
         self.scraper.post_data("posturltographimage")
         self.assertEqual(self.scraper.username, "instagram")
         self.assertEqual(self.scraper.shortcode, "B2UUzbyAMrD")
@@ -39,6 +42,7 @@ class TestPostScraper(unittest.TestCase):
     def test_property_graphvideo(self, mock_requests):
         with open(os.path.join(HTML, "graphvideo_html.txt")) as f:
             mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
         self.scraper.post_data("posturltographvideo")
         self.assertEqual(self.scraper.username, "instagram")
         self.assertEqual(self.scraper.shortcode, "B2MmijPgt_B")
@@ -49,6 +53,7 @@ class TestPostScraper(unittest.TestCase):
     def test_property_graphsidecar(self, mock_requests):
         with open(os.path.join(HTML, "graphsidecar_html.txt")) as f:
             mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
         self.scraper.post_data("posturltographsidecar")
         self.assertEqual(self.scraper.username, "instagram")
         self.assertEqual(self.scraper.shortcode, "B0ObD8SA0Sq")
@@ -59,6 +64,7 @@ class TestPostScraper(unittest.TestCase):
     def test_post_data_return_graphimage(self, mock_requests):
         with open(os.path.join(HTML, "graphimage_html.txt")) as f:
             mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
 
         url, type = self.scraper.post_data("posturltographimage")
         self.assertRegex(url, r"^http[s]?://[a-zA-Z0-9_\-\./?=&]+$")
@@ -69,6 +75,7 @@ class TestPostScraper(unittest.TestCase):
     def test_post_data_return_graphvideo(self, mock_requests):
         with open(os.path.join(HTML, "graphvideo_html.txt")) as f:
             mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
 
         url, type = self.scraper.post_data("posturltographvideo")
         self.assertRegex(url, r"^http[s]?://[a-zA-Z0-9_\-\./?=&]+$")
@@ -79,6 +86,7 @@ class TestPostScraper(unittest.TestCase):
     def test_post_data_return_graphsidecar(self, mock_requests):
         with open(os.path.join(HTML, "graphsidecar_html.txt")) as f:
             mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
 
         urls, type = self.scraper.post_data("posturltographsidecar")
         for url in urls:
@@ -86,6 +94,52 @@ class TestPostScraper(unittest.TestCase):
         self.assertEqual(type, "GraphSidecar")
         mock_requests.assert_called_once()
 
+    @patch("requests.get")
+    def test_post_data_not_found(self, mock_requests):
+        mock_requests.return_value.status_code = 404
+        with self.assertRaisesRegex(
+            SystemExit, "^Sorry, this page isn't available.$"
+        ):
+            self.scraper.post_data("posturltographimage")
+
+    @patch("requests.get")
+    def test_post_data_from_cache(self, mock_requests):
+        with open(os.path.join(HTML, "graphimage_html.txt")) as f:
+            mock_requests.return_value.text = f.read()
+        mock_requests.return_value.status_code = 200
+        mock_requests.return_value.headers = {"ETag": '"v1"'}
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = PostCache(os.path.join(tempdir, "posts.sqlite3"))
+            self.scraper.cache = cache
+            url = "https://www.instagram.com/p/B2UUzbyAMrD"
+            first = self.scraper.post_data(url)
+            second = self.scraper.post_data(url)
+            cache.close()
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.scraper.shortcode, "B2UUzbyAMrD")
+        self.assertEqual(cache.stats["hits"], 1)
+        mock_requests.assert_called_once()
+
+    @patch("requests.get")
+    def test_post_data_revalidates_old_cache(self, mock_requests):
+        with open(os.path.join(JSON, "graphimage_json.txt")) as f:
+            data = json.loads(f.read(), object_hook=hook.shortcode_media)
+        mock_requests.return_value.status_code = 304
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = PostCache(os.path.join(tempdir, "posts.sqlite3"), ttl=0)
+            cache.put("B0RA4kfgX71", data, '"v1"')
+            self.scraper.cache = cache
+            self.scraper.post_data("https://www.instagram.com/p/B0RA4kfgX71")
+            cache.close()
+
+        self.assertEqual(self.scraper.shortcode, "B0RA4kfgX71")
+        self.assertEqual(cache.stats["revalidated"], 1)
+        headers = mock_requests.call_args[1]["headers"]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+
     def test_get_type_returns_graphimage(self):
         with open(os.path.join(JSON, "graphimage_json.txt")) as f:
             json_data = json.loads(f.read(), object_hook=hook.shortcode_media)
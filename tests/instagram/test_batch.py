@@ -0,0 +1,142 @@
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from instasave.instagram.batch import BatchScraper, Target, read_targets
+from instasave.instagram.feed import FeedScraper
+from instasave.web.fakeserver import FakeInstagram, FakeServer
+from instasave.web.session import HTTPSession
+
+
+class TestReadTargets(unittest.TestCase):
+    def test_read_targets(self):
+        lines = [
+            "user_one\n",
+            "\n",
+            "#tag\n",
+            "https://www.instagram.com/explore/tags/other/\n",
+            "https://www.instagram.com/p/B2UUzbyAMrD/?utm_source=x\n",
+            "https://www.instagram.com/user.two/\n",
+        ]
+        self.assertEqual(
+            read_targets(lines),
+            [
+                Target("user", "https://www.instagram.com/user_one"),
+                Target(
+                    "hashtag", "https://www.instagram.com/explore/tags/tag"
+                ),
+                Target(
+                    "hashtag", "https://www.instagram.com/explore/tags/other"
+                ),
+                Target("post", "https://www.instagram.com/p/B2UUzbyAMrD"),
+                Target("user", "https://www.instagram.com/user.two/"),
+            ],
+        )
+
+    def test_unmatched_lines_are_skipped(self):
+        with patch("builtins.print") as mock_print:
+            targets = read_targets(["x", "user_one", "#not-a-tag"])
+        self.assertEqual(len(targets), 1)
+        self.assertEqual(mock_print.call_count, 2)
+
+
+class TestBatchScraper(unittest.TestCase):
+    def setUp(self):
+        self.instagram = FakeInstagram(users=4, posts=30, hashtags=2)
+        self.server = FakeServer(instagram=self.instagram).start()
+        self.session = HTTPSession()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.scrapers = []
+        patcher = patch("instasave.utils.settings.BASE_URL", self.base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+        self.session.close()
+        self.server.stop()
+
+    @property
+    def base_url(self):
+        return self.server.base_url
+
+    def new_scraper(self):
+        scraper = FeedScraper({}, self.tempdir.name, self.session)
+        self.scrapers.append((scraper, threading.get_ident()))
+        return scraper
+
+    def post_url(self, shortcode):
+        return f"{self.base_url}/p/{shortcode}"
+
+    def test_scrape_merges_and_dedups_urls(self):
+        user = self.instagram.users["user0"]
+        tag = self.instagram.hashtags["tag0"]
+        targets = [
+            Target("post", self.post_url(user[0])),
+            Target("user", f"{self.base_url}/user0"),
+            Target("hashtag", f"{self.base_url}/explore/tags/tag0"),
+            Target("user", f"{self.base_url}/user0"),
+        ]
+
+        urls = BatchScraper(self.new_scraper, 3).scrape(targets, 20)
+
+        expected = [self.post_url(shortcode) for shortcode in user[:20]]
+        expected += [
+            self.post_url(shortcode)
+            for shortcode in tag[:20]
+            if self.post_url(shortcode) not in expected
+        ]
+        self.assertEqual(urls, expected)
+        self.assertEqual(self.server.stats["user"], 1)
+
+    def test_scrapers_are_reused(self):
+        targets = [
+            Target("user", f"{self.base_url}/user{i}") for i in range(4)
+        ]
+        batch = BatchScraper(self.new_scraper, 2)
+        urls = batch.scrape(targets, 30)
+        self.assertEqual(len(urls), 120)
+        self.assertLessEqual(len(self.scrapers), 2)
+        self.assertEqual(batch.stats["pages"], 4 * 2)
+
+    def test_failed_target_is_skipped(self):
+        targets = [
+            Target("user", f"{self.base_url}/user0"),
+            Target("user", f"{self.base_url}/user1"),
+        ]
+        open_page = FeedScraper.open
+
+        def fail_on_user1(scraper, url):
+            if url.endswith("/user1"):
+                raise SystemExit("Unexpected feed page")
+            open_page(scraper, url)
+
+        batch = BatchScraper(self.new_scraper, 2)
+        with patch.object(FeedScraper, "open", fail_on_user1), patch(
+            "builtins.print"
+        ) as mock_print:
+            urls = batch.scrape(targets, 5)
+
+        user = self.instagram.users["user0"]
+        self.assertEqual(urls, [self.post_url(sc) for sc in user[:5]])
+        self.assertEqual(batch.failed, targets[1:])
+        mock_print.assert_called_once()
+        self.assertIn("Unexpected feed page", mock_print.call_args[0][0])
+
+    def test_missing_target_is_named(self):
+        targets = [Target("user", f"{self.base_url}/nobody")]
+        batch = BatchScraper(self.new_scraper)
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(batch.scrape(targets, 5), [])
+
+        self.assertEqual(batch.failed, targets)
+        warning = mock_print.call_args[0][0]
+        self.assertIn(f"{self.base_url}/nobody", warning)
+        self.assertIn("Doesn't exists.", warning)
+
+    def test_only_posts(self):
+        targets = [Target("post", self.post_url("a" * 11))]
+        urls = BatchScraper(self.new_scraper, 4).scrape(targets, 0)
+        self.assertEqual(urls, [self.post_url("a" * 11)])
+        self.assertEqual(self.scrapers, [])
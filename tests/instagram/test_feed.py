@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from instasave.instagram.feed import FeedScraper
+from instasave.web.fakeserver import FakeInstagram, FakeServer
+from instasave.web.session import HTTPSession
+
+
+class TestFeedScraper(unittest.TestCase):
+    def setUp(self):
+        self.instagram = FakeInstagram(users=2, posts=130, hashtags=2)
+        self.server = FakeServer(instagram=self.instagram).start()
+        self.base_url = self.server.base_url
+        self.session = HTTPSession()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.patch = patch("instasave.utils.settings.BASE_URL", self.base_url)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tempdir.cleanup()
+        self.session.close()
+        self.server.stop()
+
+    def scrape(self, path, limit, hashtag=False, filelist=()):
+        scraper = FeedScraper({}, self.tempdir.name, self.session)
+        scraper.filelist = set(filelist)
+        scraper.open(self.base_url + path)
+        try:
+            with patch("builtins.print") as mock_print:
+                urls = scraper.scrape(limit, hashtag)
+        finally:
+            scraper.close()
+
+        return urls, mock_print
+
+    def shortcodes(self, urls):
+        return [url.rsplit("/", 1)[-1] for url in urls]
+
+    def test_user_feed_first_page(self):
+        urls, _ = self.scrape("/user0/", 5)
+        self.assertEqual(
+            self.shortcodes(urls), self.instagram.users["user0"][:5]
+        )
+        self.assertEqual(self.server.stats["feed"], 0)
+
+    def test_user_feed_pages(self):
+        urls, _ = self.scrape("/user1/", 100)
+        self.assertEqual(
+            self.shortcodes(urls), self.instagram.users["user1"][:100]
+        )
+        self.assertEqual(self.server.stats["feed"], 2)
+
+    def test_hashtag_feed_pages(self):
+        urls, _ = self.scrape("/explore/tags/tag1/", 80, hashtag=True)
+        self.assertEqual(
+            self.shortcodes(urls), self.instagram.hashtags["tag1"][:80]
+        )
+
+    def test_downloaded_posts_are_skipped(self):
+        posts = self.instagram.users["user0"]
+        urls, _ = self.scrape("/user0/", 10, filelist=posts[:3])
+        self.assertEqual(self.shortcodes(urls), posts[3:13])
+
+    def test_end_of_feed(self):
+        posts = self.instagram.users["user0"]
+        urls, _ = self.scrape("/user0/", 130, filelist=posts[:10])
+        self.assertEqual(self.shortcodes(urls), posts[10:])
+
+    def test_private_account(self):
+        with self.assertRaisesRegex(SystemExit, "^Account is private.$"):
+            self.scrape("/private/", 5)
+
+    def test_page_not_found(self):
+        with self.assertRaisesRegex(SystemExit, "^Doesn't exists.$"):
+            self.scrape("/nobody/", 5)
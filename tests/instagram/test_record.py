@@ -0,0 +1,55 @@
+import json
+import os.path
+import unittest
+
+from instasave.instagram.record import PostRecord
+from instasave.utils import hook
+
+DATA = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "test_data", "json"
+)
+
+
+def read(name):
+    with open(os.path.join(DATA, name)) as f:
+        return hook.shortcode_media(json.load(f))
+
+
+class TestPostRecord(unittest.TestCase):
+    def test_graphimage(self):
+        post = PostRecord(read("graphimage_json.txt"))
+        self.assertEqual(post.type, "GraphImage")
+        self.assertEqual(len(post.media), 1)
+        self.assertFalse(post.media[0].is_video)
+        self.assertEqual(post.media[0].shortcode, post.shortcode)
+
+    def test_graphvideo(self):
+        post = PostRecord(read("graphvideo_json.txt"))
+        self.assertEqual(post.type, "GraphVideo")
+        self.assertTrue(post.media[0].is_video)
+        self.assertIsNotNone(post.media[0].duration)
+
+    def test_graphsidecar(self):
+        data = read("graphsidecar_json.txt")
+        post = PostRecord(data)
+        edges = data["edge_sidecar_to_children"]["edges"]
+        self.assertEqual(len(post.media), len(edges))
+        self.assertEqual(
+            [item.shortcode for item in post.media],
+            [edge["node"]["shortcode"] for edge in edges],
+        )
+
+    def test_created_at(self):
+        post = PostRecord(read("graphimage_json.txt"))
+        self.assertEqual(len(post.created_at), 14)
+        self.assertTrue(post.created_at.isdigit())
+
+    def test_post_without_caption(self):
+        data = read("graphimage_json.txt")
+        data["edge_media_to_caption"]["edges"] = []
+        self.assertIsNone(PostRecord(data).caption)
+
+    def test_record_has_no_dict(self):
+        post = PostRecord(read("graphimage_json.txt"))
+        self.assertFalse(hasattr(post, "__dict__"))
+        self.assertFalse(hasattr(post.media[0], "__dict__"))
@@ -0,0 +1,236 @@
+import itertools
+import json
+import os.path
+import unittest
+from unittest.mock import Mock, PropertyMock, patch
+
+from selenium.common import exceptions
+
+from instasave.instagram.url import (
+    SCROLL,
+    PageSnapshot,
+    ScrollController,
+    URLScraper,
+    WebDriver,
+)
+
+HTML = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "test_data", "html"
+)
+JSON = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "test_data", "json"
+)
+
+
+def read(name):
+    with open(os.path.join(HTML, name)) as f:
+        return f.read()
+
+
+class TestPageSnapshot(unittest.TestCase):
+    def test_user_page(self):
+        page = PageSnapshot("user", read("username_html.txt"))
+        self.assertTrue(page.exists)
+        self.assertTrue(page.is_public())
+        self.assertIsInstance(page.post_count, int)
+
+    def test_hashtag_page(self):
+        page = PageSnapshot("hashtag", read("hashtag_html.txt"))
+        self.assertTrue(page.is_public(hashtag=True))
+        self.assertEqual(page.post_count, 105667)
+
+    def test_page_not_found(self):
+        page = PageSnapshot("Page Not Found • Instagram", "")
+        self.assertFalse(page.exists)
+
+    def test_data_is_only_parsed_once(self):
+        page = PageSnapshot("user", read("username_html.txt"))
+        with patch(
+            "instasave.instagram.url.parse_json", return_value={}
+        ) as parse_json:
+            page.data
+            page.data
+        parse_json.assert_called_once()
+
+
+class TestURLScraper(unittest.TestCase):
+    def setUp(self):
+        with patch("instasave.instagram.url.WebDriver.__init__"):
+            self.scraper = URLScraper("useragent", "nonexistent")
+        self.scraper.driver = Mock(title="user")
+        self.source = PropertyMock(return_value=read("username_html.txt"))
+        type(self.scraper.driver).page_source = self.source
+
+    def test_page_source_is_only_fetched_once(self):
+        with patch.object(self.scraper, "_get_urls", return_value=[]):
+            self.scraper.scrape(5, False)
+        self.source.assert_called_once()
+
+    def test_open_forgets_previous_page(self):
+        self.scraper.page
+        self.scraper.open("https://www.instagram.com/other")
+        self.scraper.page
+        self.assertEqual(self.source.call_count, 2)
+
+    def test_limit_is_less_than_post_count(self):
+        count = self.scraper.page.post_count
+        self.assertEqual(self.scraper._check_limit(count + 10), count)
+        self.assertEqual(self.scraper._check_limit(1), 1)
+
+    def test_page_not_found(self):
+        self.scraper.driver.title = "Page Not Found • Instagram"
+        with self.assertRaisesRegex(SystemExit, "^Doesn't exists.$"):
+            self.scraper.scrape(5, False)
+
+    def test_private_account(self):
+        with open(os.path.join(JSON, "private_json.txt")) as f:
+            data = json.load(f)
+        with patch.object(
+            PageSnapshot, "data", new_callable=PropertyMock, return_value=data
+        ), self.assertRaisesRegex(SystemExit, "^Account is private.$"):
+            self.scraper.scrape(5, False)
+
+    def test_get_urls_only_new_posts(self):
+        self.scraper.driver = FakeFeed(
+            [["A" * 11, "B" * 11], ["C" * 11, "D" * 11]]
+        )
+        self.scraper.filelist = {"B" * 11}
+
+        with patch("instasave.utils.settings.BASE_URL", "https://x"):
+            urls = self.scraper._get_urls(2)
+
+        self.assertEqual(
+            urls, ["https://x/p/" + "A" * 11, "https://x/p/" + "C" * 11]
+        )
+        self.assertEqual(self.scraper.stats["steps"], 1)
+
+    def test_get_urls_stops_at_end_of_feed(self):
+        self.scraper.driver = FakeFeed([["A" * 11, "B" * 11]])
+        self.scraper.filelist = {"B" * 11}
+
+        # Every check for new posts takes longer than the timeout.
+        with patch("instasave.instagram.url.time") as mock_time:
+            mock_time.monotonic.side_effect = itertools.count(step=10)
+            urls = self.scraper._get_urls(5)
+
+        self.assertEqual(len(urls), 1)
+        self.assertEqual(self.scraper.stats["posts"], 2)
+
+
+class FakeFeed:
+    """Webdriver with a feed that loads a batch of posts per scroll."""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.height = 1000
+        self.loaded = 0
+
+    def execute_script(self, script, *args):
+        if script == SCROLL:
+            # The page only grows while there are posts left to load.
+            if self.loaded < len(self.batches):
+                self.height += 1000
+            return self.height
+
+        if (
+            self.loaded < len(self.batches)
+            and self.height > self.loaded * 1000
+        ):
+            self.loaded += 1
+            return self.batches[self.loaded - 1]
+
+        return []
+
+
+class TestScrollController(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("instasave.instagram.url.time.sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_scroll_waits_for_new_posts(self):
+        driver = Mock()
+        driver.execute_script.side_effect = [2000, [], [], ["A" * 11]]
+        scroller = ScrollController(driver, timeout=10)
+        self.assertEqual(scroller.scroll(), ["A" * 11])
+        self.assertEqual(scroller.stats["steps"], 1)
+        self.assertEqual(scroller.stats["posts"], 1)
+
+    def test_step_grows_when_few_posts_load(self):
+        driver = Mock()
+        driver.execute_script.side_effect = [2000, ["A" * 11]]
+        scroller = ScrollController(driver, step=500)
+        scroller.scroll()
+        self.assertEqual(scroller.step, 1000)
+
+    def test_step_shrinks_when_many_posts_load(self):
+        driver = Mock()
+        driver.execute_script.side_effect = [2000, list(range(100))]
+        scroller = ScrollController(driver, step=4000)
+        scroller.scroll()
+        self.assertEqual(scroller.step, 2000)
+
+    def test_stalled_feed_is_done(self):
+        driver = Mock()
+        driver.execute_script.side_effect = lambda script, *args: (
+            2000 if script == SCROLL else []
+        )
+        scroller = ScrollController(driver, timeout=0, max_stalls=3)
+        steps = 0
+        while not scroller.done:
+            scroller.scroll()
+            steps += 1
+        # The first step makes the page longer, the next three don't.
+        self.assertEqual(steps, 4)
+
+
+class TestWebDriver(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("instasave.instagram.url.webdriver")
+        self.webdriver = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.browsers = []
+        self.webdriver.Firefox.side_effect = self.start_browser
+        self.driver = WebDriver("useragent")
+
+    def start_browser(self, **kwargs):
+        browser = Mock()
+        self.browsers.append(browser)
+        return browser
+
+    def test_browser_is_reused(self):
+        self.driver.open("https://www.instagram.com/a")
+        self.driver.open("https://www.instagram.com/b")
+        self.assertEqual(len(self.browsers), 1)
+        self.assertEqual(self.browsers[0].get.call_count, 2)
+        self.browsers[0].delete_all_cookies.assert_called()
+
+    def test_crashed_browser_is_restarted(self):
+        type(self.browsers[0]).current_url = PropertyMock(
+            side_effect=exceptions.InvalidSessionIdException()
+        )
+        self.driver.open("https://www.instagram.com/a")
+        self.assertEqual(len(self.browsers), 2)
+        self.assertEqual(self.driver.restarts, 1)
+        self.browsers[1].get.assert_called_once_with(
+            "https://www.instagram.com/a"
+        )
+
+    def test_browser_crashes_while_opening_page(self):
+        browser = self.browsers[0]
+        alive = PropertyMock(
+            side_effect=["about:blank", exceptions.WebDriverException()]
+        )
+        type(browser).current_url = alive
+        browser.get.side_effect = exceptions.WebDriverException()
+        self.driver.open("https://www.instagram.com/a")
+        self.browsers[1].get.assert_called_once_with(
+            "https://www.instagram.com/a"
+        )
+
+    def test_page_error_closes_browser(self):
+        self.browsers[0].get.side_effect = exceptions.WebDriverException()
+        with self.assertRaises(SystemExit):
+            self.driver.open("https://www.instagram.com/a")
+        self.browsers[0].quit.assert_called_once()
+        self.assertEqual(len(self.browsers), 1)
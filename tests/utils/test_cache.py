@@ -0,0 +1,68 @@
+import os.path
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from instasave.utils.cache import PostCache
+
+
+class TestPostCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "cache", "posts.sqlite3")
+        self.cache = PostCache(self.path, ttl=60, max_size=1000)
+        self.data = {"shortcode": "B0RA4kfgX71", "owner": {"username": "x"}}
+
+    def tearDown(self):
+        self.cache.close()
+        self.tempdir.cleanup()
+
+    def test_get_missing_post(self):
+        self.assertIsNone(self.cache.get("B0RA4kfgX71"))
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_put_and_get_post(self):
+        self.cache.put("B0RA4kfgX71", self.data, '"etag"', "yesterday")
+        entry = self.cache.get("B0RA4kfgX71")
+        self.assertEqual(entry.data, self.data)
+        self.assertTrue(entry.fresh)
+        self.assertEqual(
+            entry.headers,
+            {"If-None-Match": '"etag"', "If-Modified-Since": "yesterday"},
+        )
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_cache_is_persistent(self):
+        self.cache.put("B0RA4kfgX71", self.data)
+        self.cache.close()
+        self.cache = PostCache(self.path)
+        self.assertEqual(self.cache.get("B0RA4kfgX71").data, self.data)
+
+    def test_old_post_is_not_fresh(self):
+        self.cache.put("B0RA4kfgX71", self.data)
+        with patch("time.time", return_value=10**10):
+            entry = self.cache.get("B0RA4kfgX71")
+        self.assertFalse(entry.fresh)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_revalidate_old_post(self):
+        self.cache.put("B0RA4kfgX71", self.data)
+        with patch("time.time", return_value=10**10):
+            self.cache.get("B0RA4kfgX71")
+            self.cache.revalidate("B0RA4kfgX71")
+            self.assertTrue(self.cache.get("B0RA4kfgX71").fresh)
+        self.assertEqual(self.cache.stats["revalidated"], 1)
+
+    def test_least_recently_used_posts_are_evicted(self):
+        data = {"caption": "x" * 300}
+        for i, shortcode in enumerate(["a", "b", "c"]):
+            with patch("time.time", return_value=1000 + i):
+                self.cache.put(shortcode, data)
+        # Use the oldest post so the second oldest is evicted instead.
+        with patch("time.time", return_value=2000):
+            self.cache.get("a")
+            self.cache.put("d", data)
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+        self.assertIsNotNone(self.cache.get("d"))
@@ -32,6 +32,17 @@ class TestDecorators(unittest.TestCase):
         filename = decorator.unique_filename(func)
         self.assertRegex(filename(), "^generic_filename_[0-9a-z]{20}.jpg$")
 
+    def test_unique_filename_with_key(self):
+        def func():
+            return "generic_filename.jpg"
+
+        filename = decorator.unique_filename(func)
+        self.assertEqual(filename(key="a:0"), filename(key="a:0"))
+        self.assertNotEqual(filename(key="a:0"), filename(key="a:1"))
+        self.assertRegex(
+            filename(key="a:0"), "^generic_filename_[0-9a-z]{20}.jpg$"
+        )
+
     def test_count_calls_verbose_off(self):
         calls = 5
         print_output = "." * calls
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from instasave.utils.decorator import file_id
+from instasave.utils.index import DownloadIndex, file_key
+
+FILENAME = "user_20190912161807_B2UUzbyAMrD_0123456789abcdef0123.jpg"
+FOLDER = "user/2019-09-12/B2UUzbyAMrD"
+
+
+def filename(position, count, extension="jpg"):
+    """Return the name of a file in the post named by its position."""
+
+    id = file_id(file_key("B2UUzbyAMrD", position, count))
+
+    return f"user_20190912161807_B2UUzbyAMrD_{id}.{extension}"
+
+
+class TestDownloadIndex(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = self.tempdir.name
+        self.index = DownloadIndex(self.output)
+
+    def tearDown(self):
+        self.index.close()
+        self.tempdir.cleanup()
+
+    def save(self, folder, filename, data=b"data"):
+        folder = os.path.join(self.output, folder)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        return path
+
+    def test_new_index(self):
+        self.assertTrue(self.index.is_new)
+        self.assertEqual(len(self.index), 0)
+        self.assertNotIn("B2UUzbyAMrD", self.index)
+
+    def test_add_file(self):
+        path = self.save("user/2019-09-12/B2UUzbyAMrD", FILENAME)
+        self.index.add("B2UUzbyAMrD", path)
+        self.assertIn("B2UUzbyAMrD", self.index)
+        self.assertEqual(len(self.index), 1)
+
+    def test_index_is_persistent(self):
+        path = self.save("user/2019-09-12/B2UUzbyAMrD", FILENAME)
+        self.index.add("B2UUzbyAMrD", path)
+        self.index.close()
+        self.index = DownloadIndex(self.output)
+        self.assertFalse(self.index.is_new)
+        self.assertIn("B2UUzbyAMrD", self.index)
+
+    def test_complete_post(self):
+        paths = [
+            self.save("user/2019-09-12/B2UUzbyAMrD", FILENAME),
+            self.save("user/2019-09-12/B2UUzbyAMrD", FILENAME[:-4] + ".mp4"),
+        ]
+        self.index.add("B2UUzbyAMrD", paths[0])
+        self.assertFalse(self.index.is_complete("B2UUzbyAMrD"))
+
+        self.index.add("B2UUzbyAMrD", paths[1])
+        self.index.complete("B2UUzbyAMrD", paths)
+        self.assertTrue(self.index.is_complete("B2UUzbyAMrD"))
+
+        # A removed file has to be downloaded again.
+        os.remove(paths[1])
+        self.assertFalse(self.index.is_complete("B2UUzbyAMrD"))
+
+    def test_other_files_dont_complete_post(self):
+        paths = [self.save(FOLDER, filename(i, 2)) for i in range(2)]
+        self.index.complete("B2UUzbyAMrD", paths)
+
+        # An old file with a random name doesn't replace a missing file.
+        self.index.add("B2UUzbyAMrD", self.save(FOLDER, FILENAME))
+        os.remove(paths[1])
+        self.assertFalse(self.index.is_complete("B2UUzbyAMrD"))
+
+    def test_rebuild_from_files(self):
+        self.save("user/2019-09-12/B2UUzbyAMrD", FILENAME)
+        self.save("user/2019-09-12/B2UUzbyAMrD", FILENAME[:-4] + ".mp4")
+        self.save("user", "data.csv")
+        self.save(".store/01", "0123456789abcdef0123456789abcdef01234567.jpg")
+        self.index.add("B0ObD8SA0Sq", self.save("other", FILENAME))
+        os.remove(os.path.join(self.output, "other", FILENAME))
+
+        self.assertEqual(self.index.rebuild(), 2)
+        self.assertIn("B2UUzbyAMrD", self.index)
+        self.assertNotIn("B0ObD8SA0Sq", self.index)
+        self.assertEqual(len(self.index), 2)
+
+    def test_rebuild_complete_posts(self):
+        for i in range(3):
+            self.save(FOLDER, filename(i, 3, "mp4" if i else "jpg"))
+        self.save(FOLDER, FILENAME)
+
+        self.assertEqual(self.index.rebuild(), 4)
+        self.assertTrue(self.index.is_complete("B2UUzbyAMrD"))
+
+        # A post with a missing file isn't complete after a rebuild.
+        os.remove(os.path.join(self.output, FOLDER, filename(2, 3, "mp4")))
+        self.index.rebuild()
+        self.assertFalse(self.index.is_complete("B2UUzbyAMrD"))
@@ -0,0 +1,81 @@
+import io
+import unittest
+
+from PIL import Image
+
+from instasave.utils.jpeg import JPEGFilter, MalformedJPEG
+
+
+def jpeg(comment=b"", **options):
+    """Return bytes of a small jpeg image with exif data and a comment."""
+
+    exif = Image.Exif()
+    exif[0x010E] = "description"
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "red").save(
+        buffer, "JPEG", exif=exif, comment=comment, **options
+    )
+
+    return buffer.getvalue()
+
+
+def strip(data, size=None, **options):
+    """Return data filtered in chunks of the size."""
+
+    jpeg = JPEGFilter(**options)
+    size = size or len(data)
+    output = b"".join(
+        jpeg.feed(data[i : i + size]) for i in range(0, len(data), size)
+    )
+    jpeg.close()
+
+    return output
+
+
+class TestJPEGFilter(unittest.TestCase):
+    def setUp(self):
+        self.data = jpeg(b"comment", icc_profile=b"profile")
+
+    def test_meta_data_is_removed(self):
+        output = strip(self.data)
+        self.assertIn(b"Exif", self.data)
+        self.assertNotIn(b"Exif", output)
+        self.assertNotIn(b"comment", output)
+        self.assertIn(b"JFIF", output)
+        self.assertIn(b"ICC_PROFILE", output)
+
+    def test_image_data_is_untouched(self):
+        output = strip(self.data)
+        scan = self.data.index(b"\xff\xda")
+        self.assertTrue(output.endswith(self.data[scan:]))
+        with Image.open(io.BytesIO(output)) as image:
+            self.assertEqual(image.size, (16, 16))
+            self.assertEqual(image.getpixel((0, 0)), (254, 0, 0))
+
+    def test_any_chunk_size(self):
+        output = strip(self.data)
+        for size in [1, 2, 3, 7, 100]:
+            self.assertEqual(strip(self.data, size), output)
+
+    def test_allow_list(self):
+        output = strip(self.data, keep=[0xE1])
+        self.assertIn(b"Exif", output)
+        self.assertNotIn(b"JFIF", output)
+        self.assertNotIn(b"ICC_PROFILE", output)
+
+    def test_fill_bytes_before_marker(self):
+        data = self.data[:2] + b"\xff\xff" + self.data[2:]
+        self.assertEqual(strip(data), strip(self.data))
+
+    def test_not_a_jpeg(self):
+        with self.assertRaises(MalformedJPEG):
+            strip(b"\x00\x00\x00\x18ftypmp42")
+
+    def test_invalid_marker(self):
+        with self.assertRaises(MalformedJPEG):
+            strip(b"\xff\xd8\x00\x00")
+
+    def test_truncated_file(self):
+        scan = self.data.index(b"\xff\xda")
+        with self.assertRaises(MalformedJPEG):
+            strip(self.data[: scan - 10])
@@ -3,8 +3,10 @@ import os.path
 import unittest
 from unittest.mock import patch
 
+from bs4 import BeautifulSoup
+
 from instasave.utils import hook
-from instasave.utils.jsonparser import parse_json
+from instasave.utils.jsonparser import MissingKeyError, extract, parse_json
 
 
 class TestJsonParser(unittest.TestCase):
@@ -55,3 +57,56 @@ class TestJsonParser(unittest.TestCase):
             self.graphsidecar, self.selector, hook.shortcode_media
         )
         self.assertEqual(json_data["__typename"], "GraphSidecar")
+
+    def test_parse_json_without_building_a_tree(self):
+        with patch("instasave.utils.jsonparser.BeautifulSoup") as soup:
+            json_data = parse_json(
+                self.graphimage, self.selector, hook.shortcode_media
+            )
+        soup.assert_not_called()
+        self.assertEqual(json_data["__typename"], "GraphImage")
+
+    def test_parse_json_falls_back_to_selector(self):
+        # Variable name in a comment before the real script.
+        page = self.graphvideo.replace(
+            "<head>", "<head><!-- window._sharedData = broken -->", 1
+        )
+        json_data = parse_json(page, self.selector, hook.shortcode_media)
+        self.assertEqual(json_data["__typename"], "GraphVideo")
+
+    def test_parse_json_same_as_selector(self):
+        for page in [self.graphsidecar, self.username, self.hashtag]:
+            script = BeautifulSoup(page, "html.parser").select(self.selector)
+            expected = json.loads(script[0].text[21:-1])
+            self.assertEqual(parse_json(page, self.selector, None), expected)
+
+    def test_parse_json_path(self):
+        json_data = parse_json(
+            self.graphimage, self.selector, path=hook.SHORTCODE_MEDIA
+        )
+        self.assertEqual(json_data["__typename"], "GraphImage")
+
+    def test_parse_json_missing_path(self):
+        with self.assertRaises(MissingKeyError) as cm:
+            parse_json(self.hashtag, self.selector, path=hook.SHORTCODE_MEDIA)
+        self.assertEqual(cm.exception.key, "PostPage")
+        self.assertIn("PostPage", str(cm.exception))
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.data = {"a": {"b": [{"c": 1}, {"c": 2}]}}
+
+    def test_extract(self):
+        self.assertEqual(extract(self.data, "a.b[1].c"), 2)
+        self.assertEqual(extract(self.data, "a.b[0]"), {"c": 1})
+
+    def test_extract_missing_index(self):
+        with self.assertRaises(MissingKeyError) as cm:
+            extract(self.data, "a.b[2].c")
+        self.assertEqual(cm.exception.key, 2)
+        self.assertEqual(str(cm.exception), "2 is missing from a.b[2].c")
+
+    def test_missing_key_is_a_key_error(self):
+        with self.assertRaises(KeyError):
+            extract(self.data, "a.x")
@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from instasave.instagram.record import PostRecord
+from instasave.utils import hook
+from instasave.utils.meta import (
+    FIELDNAMES,
+    CSVSink,
+    JSONLinesSink,
+    open_sink,
+)
+
+DATA = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "test_data", "json"
+)
+
+
+def read_post(name):
+    with open(os.path.join(DATA, name)) as f:
+        return PostRecord(hook.shortcode_media(json.load(f)))
+
+
+class TestCSVSink(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = self.tempdir.name
+        self.csv = os.path.join(self.output, "data.csv")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def read_rows(self):
+        with open(self.csv, newline="") as f:
+            return list(csv.DictReader(f))
+
+    def test_sidecar(self):
+        post = read_post("graphsidecar_json.txt")
+        with CSVSink(self.output) as sink:
+            for i in range(len(post.media)):
+                sink.add(post, i)
+
+        rows = self.read_rows()
+        self.assertEqual(len(rows), len(post.media))
+        self.assertEqual(rows[1]["sub_shortcode"], post.media[1].shortcode)
+        self.assertEqual(rows[1]["shortcode"], post.shortcode)
+        self.assertEqual(rows[1]["type"], "GraphSidecar")
+
+    def test_video(self):
+        post = read_post("graphvideo_json.txt")
+        with CSVSink(self.output) as sink:
+            sink.add(post)
+
+        row = self.read_rows()[0]
+        self.assertEqual(row["username"], post.username)
+        self.assertEqual(row["is_video"], "True")
+        self.assertEqual(row["sub_shortcode"], "")
+        self.assertEqual(row["video_duration"], str(post.media[0].duration))
+
+    def test_header_is_written_once(self):
+        post = read_post("graphimage_json.txt")
+        for _ in range(2):
+            with CSVSink(self.output) as sink:
+                sink.add(post)
+
+        self.assertEqual(len(self.read_rows()), 2)
+
+    def test_rows_are_buffered(self):
+        post = read_post("graphimage_json.txt")
+        sink = CSVSink(self.output, batch_size=3, interval=60)
+
+        with patch.object(sink, "_write", wraps=sink._write) as write:
+            for _ in range(7):
+                sink.add(post)
+            self.assertEqual(sink.written, 6)
+            sink.close()
+
+        self.assertEqual(
+            [len(c[0][0]) for c in write.call_args_list], [3, 3, 1]
+        )
+        self.assertEqual(len(self.read_rows()), 7)
+
+    def test_rows_are_written_after_interval(self):
+        post = read_post("graphimage_json.txt")
+        sink = CSVSink(self.output, batch_size=100, interval=0.05)
+
+        # The rows are written without any more rows being added.
+        sink.add(post)
+        sink.add(post)
+        deadline = time.monotonic() + 5
+        while not sink.written and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(sink.written, 2)
+        self.assertEqual(len(self.read_rows()), 2)
+        sink.close()
+
+    def test_timer_is_stopped_on_close(self):
+        post = read_post("graphimage_json.txt")
+        sink = CSVSink(self.output, batch_size=100, interval=60)
+        sink.add(post)
+        sink.close()
+        self.assertEqual(sink.written, 1)
+        self.assertIsNone(sink._timer)
+
+    def test_concurrent_adds(self):
+        post = read_post("graphimage_json.txt")
+
+        with CSVSink(self.output, batch_size=7) as sink:
+            threads = [
+                threading.Thread(
+                    target=lambda: [sink.add(post) for _ in range(50)]
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(self.read_rows()), 200)
+
+
+class TestOtherSinks(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = self.tempdir.name
+        self.post = read_post("graphsidecar_json.txt")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def save(self, format):
+        with open_sink(format, self.output) as sink:
+            for i in range(len(self.post.media)):
+                sink.add(self.post, i)
+
+        return sink.path
+
+    def test_json_lines(self):
+        path = self.save("jsonl")
+        self.assertEqual(os.path.basename(path), "data.jsonl")
+
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+
+        self.assertEqual(len(rows), len(self.post.media))
+        self.assertEqual(list(rows[0]), FIELDNAMES)
+        self.assertEqual(
+            rows[1]["sub_shortcode"], self.post.media[1].shortcode
+        )
+        self.assertIs(rows[0]["is_video"], self.post.media[0].is_video)
+
+    def test_sqlite(self):
+        path = self.save("sqlite")
+        self.save("sqlite")
+        self.assertEqual(os.path.basename(path), "data.sqlite3")
+
+        db = sqlite3.connect(path)
+        rows = db.execute(
+            "SELECT shortcode, sub_shortcode, likes FROM files"
+        ).fetchall()
+        db.close()
+
+        self.assertEqual(len(rows), len(self.post.media) * 2)
+        self.assertEqual(
+            rows[1],
+            (
+                self.post.shortcode,
+                self.post.media[1].shortcode,
+                self.post.likes,
+            ),
+        )
+
+    def test_open_sink(self):
+        sink = open_sink("jsonl", os.path.join(self.output, "new"))
+        self.assertIsInstance(sink, JSONLinesSink)
+        sink.close()
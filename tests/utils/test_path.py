@@ -0,0 +1,132 @@
+import errno
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+from instasave.utils.jpeg import MalformedJPEG
+from instasave.utils.path import move_file, save_file
+
+MP4 = b"\x00\x00\x00\x18ftypmp42" + bytes(range(256)) * 64
+
+
+def jpeg():
+    """Return bytes of a small jpeg image with exif data."""
+
+    exif = Image.Exif()
+    exif[0x010E] = "description"
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "red").save(buffer, "JPEG", exif=exif)
+
+    return buffer.getvalue()
+
+
+def without_exif(data):
+    """Return jpeg data without the exif segment."""
+
+    start = data.index(b"\xff\xe1")
+    end = start + 2 + int.from_bytes(data[start + 2 : start + 4], "big")
+
+    return data[:start] + data[end:]
+
+
+class TestSaveFile(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tempdir.name, "user", "post")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def download(self, data):
+        """Return path to a downloaded file with the data."""
+
+        file = os.path.join(self.tempdir.name, "file.part")
+        with open(file, "wb") as f:
+            f.write(data)
+
+        return file
+
+    def test_save_file_mp4_is_unmodified(self):
+        save_file(self.download(MP4), self.output, "video.mp4")
+        with open(os.path.join(self.output, "video.mp4"), "rb") as f:
+            self.assertEqual(f.read(), MP4)
+
+    def test_save_file_jpeg_without_exif(self):
+        data = jpeg()
+        self.assertIn(b"Exif", data)
+        save_file(self.download(data), self.output, "image.jpg")
+        with open(os.path.join(self.output, "image.jpg"), "rb") as f:
+            saved = f.read()
+        self.assertTrue(saved.startswith(b"\xff\xd8"))
+        self.assertNotIn(b"Exif", saved)
+
+    def test_save_file_jpeg_image_data_is_unmodified(self):
+        data = jpeg()
+        save_file(self.download(data), self.output, "image.jpg")
+        with open(os.path.join(self.output, "image.jpg"), "rb") as f:
+            saved = f.read()
+        self.assertEqual(saved, without_exif(data))
+
+    def test_save_file_malformed_jpeg_is_saved_again(self):
+        data = jpeg()
+        with patch(
+            "instasave.utils.path.JPEGFilter.close", side_effect=MalformedJPEG
+        ):
+            save_file(self.download(data), self.output, "image.jpg")
+        with open(os.path.join(self.output, "image.jpg"), "rb") as f:
+            saved = f.read()
+        self.assertTrue(saved.startswith(b"\xff\xd8"))
+        self.assertNotIn(b"Exif", saved)
+        self.assertEqual(sorted(os.listdir(self.tempdir.name)), ["user"])
+
+    def test_save_file_unknown_type_is_not_saved(self):
+        file = self.download(b"<html></html>")
+        save_file(file, self.output, "page.jpg")
+        self.assertEqual(os.listdir(self.output), [])
+        self.assertFalse(os.path.exists(file))
+
+    def test_save_file_leaves_no_temporary_files(self):
+        save_file(self.download(jpeg()), self.output, "image.jpg")
+        save_file(self.download(MP4), self.output, "video.mp4")
+        self.assertCountEqual(
+            os.listdir(self.output), ["image.jpg", "video.mp4"]
+        )
+        self.assertEqual(sorted(os.listdir(self.tempdir.name)), ["user"])
+
+
+class TestMoveFile(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tempdir.name, "out")
+        os.mkdir(self.output)
+        self.file = os.path.join(self.tempdir.name, "video.mp4")
+        with open(self.file, "wb") as f:
+            f.write(MP4)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_move_file(self):
+        path = move_file(self.file, self.output)
+        self.assertEqual(path, os.path.join(self.output, "video.mp4"))
+        self.assertFalse(os.path.exists(self.file))
+
+    def test_move_file_to_other_file_system(self):
+        replace = os.replace
+
+        def cross_device(src, dst):
+            if src == self.file:
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            replace(src, dst)
+
+        with patch("os.replace", side_effect=cross_device):
+            path = move_file(self.file, self.output)
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), MP4)
+        self.assertEqual(os.listdir(self.output), ["video.mp4"])
+        self.assertFalse(os.path.exists(self.file))
@@ -0,0 +1,105 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+from instasave.utils.postprocess import PostProcessor
+
+MP4 = b"\x00\x00\x00\x18ftypmp42" + bytes(range(256)) * 64
+
+
+def jpeg():
+    """Return bytes of a small jpeg image with exif data."""
+
+    exif = Image.Exif()
+    exif[0x010E] = "description"
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "red").save(buffer, "JPEG", exif=exif)
+
+    return buffer.getvalue()
+
+
+class TestPostProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tempdir.name, "user", "post")
+        self.processor = PostProcessor(2)
+
+    def tearDown(self):
+        self.processor.close()
+        self.tempdir.cleanup()
+
+    def download(self, name, data):
+        """Return path to a downloaded file with the data."""
+
+        file = os.path.join(self.tempdir.name, name + ".part")
+        with open(file, "wb") as f:
+            f.write(data)
+
+        return file
+
+    def test_save_file(self):
+        file = self.download("image", jpeg())
+        path = self.processor.submit(file, self.output, "image.jpg").result()
+        self.assertEqual(path, os.path.join(self.output, "image.jpg"))
+        with open(path, "rb") as f:
+            self.assertNotIn(b"Exif", f.read())
+        self.assertFalse(os.path.exists(file))
+
+    def test_processes_are_not_forked(self):
+        self.assertIn(
+            self.processor._executor._mp_context.get_start_method(),
+            ["forkserver", "spawn"],
+        )
+
+    def test_submit(self):
+        futures = [
+            self.processor.submit(
+                self.download(f"file{i}", MP4), self.output, f"file{i}.mp4"
+            )
+            for i in range(4)
+        ]
+        paths = [future.result() for future in futures]
+        self.assertEqual(
+            paths,
+            [os.path.join(self.output, f"file{i}.mp4") for i in range(4)],
+        )
+        self.assertEqual(self.processor.stats["files"], 4)
+
+    def test_unknown_type_is_not_saved(self):
+        file = self.download("page", b"<html></html>")
+        self.assertIsNone(
+            self.processor.submit(file, self.output, "page.jpg").result()
+        )
+
+    def test_save_files_from_many_threads(self):
+        files = [
+            (self.download(f"file{i}", data), f"file{i}{ext}")
+            for i, (data, ext) in enumerate(
+                [(jpeg(), ".jpg"), (MP4, ".mp4")] * 4
+            )
+        ]
+        threads = [
+            threading.Thread(
+                target=lambda *args: self.processor.submit(*args).result(),
+                args=(file, self.output, name),
+            )
+            for file, name in files
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertCountEqual(
+            os.listdir(self.output), [name for _, name in files]
+        )
+        stats = self.processor.stats
+        self.assertEqual(stats["files"], 8)
+        self.assertGreaterEqual(stats["max_queued"], 1)
+        self.assertGreater(stats["seconds"], 0)
+        self.assertLessEqual(stats["max_seconds"], stats["seconds"])
+        self.assertEqual(self.processor.queued, 0)
@@ -0,0 +1,92 @@
+import errno
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from instasave.utils.store import ContentStore
+
+
+class TestContentStore(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = self.tempdir.name
+        self.store = ContentStore(self.output)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def save(self, folder, data=b"data"):
+        folder = os.path.join(self.output, folder)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "file.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        return path
+
+    def test_unique_file_is_stored(self):
+        path = self.save("a")
+        self.assertFalse(self.store.add(path, "ab" * 20))
+        stored = os.path.join(self.store.root, "ab", "ab" * 20 + ".jpg")
+        self.assertTrue(os.path.samefile(path, stored))
+        self.assertEqual(
+            self.store.stats, {"files": 1, "duplicates": 0, "saved": 0}
+        )
+
+    def test_duplicate_is_linked(self):
+        first = self.save("a")
+        second = self.save("b")
+        self.store.add(first, "ab" * 20)
+        self.assertTrue(self.store.add(second, "ab" * 20))
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(
+            self.store.stats, {"files": 1, "duplicates": 1, "saved": 4}
+        )
+        self.assertEqual(os.listdir(os.path.dirname(second)), ["file.jpg"])
+
+    def test_same_file_added_again(self):
+        path = self.save("a")
+        self.store.add(path, "ab" * 20)
+        self.assertTrue(self.store.add(path, "ab" * 20))
+        self.assertEqual(self.store.stats["duplicates"], 0)
+
+    def test_store_is_disabled_without_links(self):
+        first = self.save("a")
+        second = self.save("b")
+        error = OSError(errno.EXDEV, "Invalid cross-device link")
+
+        with patch("os.link", side_effect=error), patch(
+            "instasave.utils.store.fcntl", None
+        ), patch("builtins.print") as mock_print:
+            self.assertFalse(self.store.add(first, "ab" * 20))
+            self.assertFalse(self.store.add(second, "ab" * 20))
+
+        self.assertFalse(self.store.enabled)
+        mock_print.assert_called_once()
+        self.assertEqual(os.listdir(os.path.join(self.store.root, "ab")), [])
+        self.assertFalse(os.path.samefile(first, second))
+        self.assertEqual(
+            self.store.stats, {"files": 0, "duplicates": 0, "saved": 0}
+        )
+
+    def test_reflink_without_hardlinks(self):
+        first = self.save("a")
+        second = self.save("b")
+        error = OSError(errno.EXDEV, "Invalid cross-device link")
+
+        def clone(dst, request, src):
+            os.write(dst, os.pread(src, 1024, 0))
+
+        with patch("os.link", side_effect=error), patch(
+            "instasave.utils.store.fcntl.ioctl", side_effect=clone
+        ):
+            self.store.add(first, "ab" * 20)
+            self.assertTrue(self.store.add(second, "ab" * 20))
+
+        with open(second, "rb") as f:
+            self.assertEqual(f.read(), b"data")
+        self.assertEqual(
+            self.store.stats, {"files": 1, "duplicates": 1, "saved": 4}
+        )
+        self.assertEqual(os.listdir(os.path.dirname(second)), ["file.jpg"])
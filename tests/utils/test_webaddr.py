@@ -16,23 +16,17 @@ class TestWebaddr(unittest.TestCase):
         self.username_url = "https://www.instagram.com/somename/"
         self.name = "somename"
 
+    @patch("requests.head")
     @patch("requests.get")
-    def test_validate_url_success(self, mock_requests):
-        mock_requests.return_value.status_code = requests.codes.ok
+    def test_validate_url_sends_no_request(self, mock_get, mock_head):
         self.assertEqual(
             webaddr.validate_url(self.post_url), self.post_url[:39]
         )
         self.assertEqual(
             webaddr.validate_url(self.igtv_url), self.igtv_url[:40]
         )
-
-    @patch("requests.get")
-    def test_validate_url_failure(self, mock_requests):
-        mock_requests.return_value.status_code = requests.codes.not_found
-        with self.assertRaisesRegex(
-            SystemExit, "^Sorry, this page isn't available.$"
-        ):
-            webaddr.validate_url(self.post_url)
+        mock_get.assert_not_called()
+        mock_head.assert_not_called()
 
     def test_clean_url_return_clean_url(self):
         self.assertEqual(webaddr.clean_url(self.post_url), self.post_url[:39])
@@ -76,27 +70,55 @@ class TestWebaddr(unittest.TestCase):
         ):
             webaddr.get_url(self.no_match, False)
 
-    @patch("requests.get")
+    @patch("requests.head")
     def test_is_working_url_returns_ok(self, mock_requests):
         mock_requests.return_value.status_code = requests.codes.ok
         self.assertTrue(webaddr.is_working(self.post_url))
 
-    @patch("requests.get")
+    @patch("requests.head")
     def test_is_working_url_returns_not_found(self, mock_requests):
         mock_requests.return_value.status_code = requests.codes.not_found
         self.assertFalse(webaddr.is_working(self.post_url))
 
-    @patch.object(requests, "get", side_effect=exceptions.Timeout)
+    @patch.object(requests, "head", side_effect=exceptions.Timeout)
     def test_is_working_raises_timeout(self, mock_requests):
         with self.assertRaisesRegex(SystemExit, "^Timeout$"):
             webaddr.is_working(self.post_url)
 
-    @patch.object(requests, "get", side_effect=exceptions.ConnectionError)
+    @patch.object(requests, "head", side_effect=exceptions.ConnectionError)
     def test_is_working_raises_connection_error(self, mock_requests):
         with self.assertRaisesRegex(SystemExit, "^Connection error$"):
             webaddr.is_working(self.post_url)
 
-    @patch.object(requests, "get", side_effect=exceptions.MissingSchema)
+    @patch.object(requests, "head", side_effect=exceptions.MissingSchema)
     def test_is_working_raises_missing_schema(self, mock_requests):
         with self.assertRaisesRegex(SystemExit, "^Invalid URL$"):
             webaddr.is_working(self.post_url)
+
+    @patch("requests.get")
+    def test_fetch_page_returns_source(self, mock_requests):
+        mock_requests.return_value.status_code = requests.codes.ok
+        mock_requests.return_value.text = "<html></html>"
+        self.assertEqual(
+            webaddr.fetch_page(self.post_url).text, "<html></html>"
+        )
+        mock_requests.assert_called_once()
+
+    @patch("requests.get")
+    def test_fetch_page_not_modified(self, mock_requests):
+        mock_requests.return_value.status_code = requests.codes.not_modified
+        r = webaddr.fetch_page(self.post_url, headers={"If-None-Match": "x"})
+        self.assertEqual(r.status_code, 304)
+
+    @patch("requests.get")
+    def test_fetch_page_not_found(self, mock_requests):
+        mock_requests.return_value.status_code = requests.codes.not_found
+        with self.assertRaisesRegex(
+            SystemExit, "^Sorry, this page isn't available.$"
+        ):
+            webaddr.fetch_page(self.post_url)
+
+    @patch.object(requests, "get", side_effect=exceptions.Timeout)
+    def test_fetch_page_raises_timeout(self, mock_requests):
+        with self.assertRaisesRegex(SystemExit, "^Timeout$"):
+            webaddr.fetch_page(self.post_url)
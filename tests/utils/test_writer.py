@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from instasave.utils.writer import DiskWriter
+
+
+class TestDiskWriter(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def save(self, name):
+        path = os.path.join(self.tempdir.name, name)
+        with open(path, "w") as f:
+            f.write(name)
+
+        return path
+
+    def test_jobs_run_in_order(self):
+        writer = DiskWriter()
+        done = []
+        futures = [writer.submit(done.append, i) for i in range(50)]
+        writer.close()
+
+        self.assertEqual(done, list(range(50)))
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(writer.stats["jobs"], 50)
+        self.assertEqual(writer.queued, 0)
+
+    def test_result(self):
+        writer = DiskWriter()
+        future = writer.submit(self.save, "file.jpg")
+        self.assertEqual(
+            future.result(), os.path.join(self.tempdir.name, "file.jpg")
+        )
+        writer.close()
+
+    def test_full_queue_blocks(self):
+        writer = DiskWriter(maxsize=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        writer.submit(block)
+        started.wait()
+        writer.submit(int)
+
+        # The queue is full until the first job is done.
+        submitted = threading.Event()
+        thread = threading.Thread(
+            target=lambda: (writer.submit(int), submitted.set())
+        )
+        thread.start()
+        self.assertFalse(submitted.wait(0.1))
+        release.set()
+        thread.join()
+        writer.close()
+
+        self.assertEqual(writer.stats["max_queued"], 1)
+        self.assertGreater(writer.stats["blocked"], 0)
+
+    def test_failed_job(self):
+        writer = DiskWriter()
+        future = writer.submit(os.remove, "missing")
+        with self.assertRaises(FileNotFoundError):
+            future.result()
+        with self.assertRaises(FileNotFoundError):
+            writer.submit(int)
+        with self.assertRaises(FileNotFoundError):
+            writer.close()
+
+    def test_fsync_in_batches(self):
+        writer = DiskWriter(batch_size=10, fsync=True)
+        started = threading.Event()
+        release = threading.Event()
+        writer.submit(lambda: (started.set(), release.wait()))
+        started.wait()
+
+        with patch("os.fsync") as fsync:
+            for i in range(4):
+                writer.submit(self.save, f"file{i}.jpg")
+            release.set()
+            writer.close()
+
+        # Four files and the folder they are in.
+        self.assertEqual(fsync.call_count, 5)
+        self.assertEqual(writer.stats["batches"], 2)
+
+    def test_folders_are_created_once_per_batch(self):
+        writer = DiskWriter()
+        started = threading.Event()
+        release = threading.Event()
+        writer.submit(lambda: (started.set(), release.wait()))
+        started.wait()
+
+        folders = [
+            os.path.join(self.tempdir.name, "a", "b"),
+            self.tempdir.name,
+        ]
+        futures = [
+            writer.submit(os.path.isdir, folder, folder=folder)
+            for folder in folders * 3
+        ]
+        release.set()
+        writer.close()
+
+        self.assertEqual([future.result() for future in futures], [True] * 6)
+        self.assertEqual(writer.stats["folders"], 2)
+
+    def test_failed_folder(self):
+        file = self.save("file")
+        writer = DiskWriter()
+        future = writer.submit(int, folder=os.path.join(file, "folder"))
+        with self.assertRaises(NotADirectoryError):
+            future.result()
+        with self.assertRaises(NotADirectoryError):
+            writer.close()
@@ -0,0 +1,269 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from instasave.instagram.post import Downloader, PostScraper
+from instasave.utils import hook
+from instasave.utils.index import DownloadIndex
+from instasave.utils.jsonparser import parse_json
+from instasave.utils.postprocess import PostProcessor
+from instasave.utils.settings import JSON_CSS_SELECTOR
+from instasave.utils.store import ContentStore
+from instasave.utils.writer import DiskWriter
+from instasave.web.fakeserver import FakeInstagram, FakeServer
+from instasave.web.session import HTTPSession
+
+
+class TestFakeServer(unittest.TestCase):
+    def setUp(self):
+        instagram = FakeInstagram(users=2, posts=15, media_size=2048)
+        self.server = FakeServer(instagram=instagram).start()
+        self.base_url = self.server.base_url
+        self.session = HTTPSession()
+        self.instagram = instagram
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def test_posts_are_generated_from_seed(self):
+        other = FakeInstagram(users=2, posts=15, media_size=2048)
+        self.assertEqual(list(other.posts), list(self.instagram.posts))
+        self.assertEqual(len(self.instagram.posts), 30)
+
+    def test_post_page(self):
+        for shortcode, post in self.instagram.posts.items():
+            scraper = PostScraper({}, self.session)
+            _, type = scraper.post_data(f"{self.base_url}/p/{shortcode}")
+            self.assertEqual(scraper.shortcode, shortcode)
+            self.assertEqual(scraper.username, post["username"])
+            self.assertEqual(type, post["type"])
+
+    def test_user_page(self):
+        r = self.session.get(f"{self.base_url}/user0/")
+        count = parse_json(r.text, JSON_CSS_SELECTOR, hook.user_post_count)
+        private = parse_json(r.text, JSON_CSS_SELECTOR, hook.private_profile)
+        self.assertEqual(count, 15)
+        self.assertFalse(private)
+        self.assertEqual(r.text.count('class="eLAPa"'), 15)
+
+    def test_private_user_page(self):
+        r = self.session.get(f"{self.base_url}/private/")
+        private = parse_json(r.text, JSON_CSS_SELECTOR, hook.private_profile)
+        self.assertTrue(private)
+
+    def test_hashtag_page(self):
+        r = self.session.get(f"{self.base_url}/explore/tags/tag0/")
+        count = parse_json(r.text, JSON_CSS_SELECTOR, hook.hashtag_post_count)
+        self.assertEqual(count, len(self.instagram.hashtags["tag0"]))
+
+    def test_page_not_found(self):
+        r = self.session.get(f"{self.base_url}/nobody/")
+        self.assertEqual(r.status_code, 404)
+        self.assertIn("Page Not Found", r.text)
+
+    def test_media_range(self):
+        url = f"{self.base_url}/media/{'a' * 11}_0.jpg"
+        r = self.session.get(url)
+        self.assertEqual(len(r.content), 2048)
+        self.assertTrue(r.content.startswith(b"\xff\xd8\xff"))
+        r = self.session.get(url, headers={"Range": "bytes=1000-"})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(
+            r.content, self.instagram.media(f"{'a' * 11}_0.jpg")[1000:]
+        )
+        r = self.session.get(url, headers={"Range": "bytes=2048-"})
+        self.assertEqual(r.status_code, 416)
+
+    def test_throttle_and_error_rates(self):
+        self.server.throttle_rate = 1
+        r = self.session.get(f"{self.base_url}/user0/")
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r.headers["Retry-After"], "1")
+        self.server.throttle_rate = 0
+        self.server.error_rate = 1
+        session = HTTPSession(max_retries=0)
+        r = session.get(f"{self.base_url}/user0/")
+        session.close()
+        self.assertEqual(r.status_code, 500)
+        self.assertEqual(self.server.stats["429"], 1)
+        self.assertEqual(self.server.stats["500"], 1)
+
+    def test_download_all(self):
+        urls = [
+            f"{self.base_url}/p/{sc}" for sc in self.instagram.users["user1"]
+        ]
+        files = sum(
+            len(post["children"]) or 1
+            for post in self.instagram.posts.values()
+            if post["username"] == "user1"
+        )
+
+        with tempfile.TemporaryDirectory() as tempdir, patch(
+            "instasave.utils.settings.BASE_URL", self.base_url
+        ), patch("builtins.print"):
+            index = DownloadIndex(os.path.join(tempdir, "out"))
+            store = ContentStore(os.path.join(tempdir, "out"))
+            downloader = Downloader(
+                {},
+                (tempdir, "out"),
+                session=self.session,
+                workers=4,
+                index=index,
+                store=store,
+            )
+            downloader.download_all(urls)
+            indexed = len(index)
+            rebuilt = index.rebuild()
+            index.close()
+
+            saved = [
+                name
+                for root, _, names in os.walk(tempdir)
+                if not root.startswith(store.root)
+                for name in names
+                if name.endswith((".jpg", ".mp4"))
+            ]
+
+        self.assertEqual(len(saved), files)
+        self.assertEqual(indexed, files)
+        self.assertEqual(rebuilt, files)
+        self.assertEqual(store.stats["files"], files)
+        self.assertEqual(self.server.stats["post"], 15)
+        self.assertEqual(self.server.stats["media"], files)
+
+    def test_download_again(self):
+        urls = [
+            f"{self.base_url}/p/{sc}" for sc in self.instagram.users["user0"]
+        ]
+
+        with tempfile.TemporaryDirectory() as tempdir, patch(
+            "instasave.utils.settings.BASE_URL", self.base_url
+        ), patch("builtins.print"):
+
+            def download_all():
+                index = DownloadIndex(os.path.join(tempdir, "out"))
+                Downloader(
+                    {},
+                    (tempdir, "out"),
+                    session=self.session,
+                    workers=4,
+                    index=index,
+                ).download_all(urls)
+                index.close()
+
+                return index.path
+
+            path = download_all()
+            stats = dict(self.server.stats)
+
+            # Posts in the index are skipped without fetching anything.
+            download_all()
+            self.assertEqual(self.server.stats, stats)
+
+            # Posts are still skipped after the index is rebuilt.
+            os.remove(path)
+            index = DownloadIndex(os.path.join(tempdir, "out"))
+            index.rebuild()
+            index.close()
+            download_all()
+            self.assertEqual(self.server.stats, stats)
+
+            # Files are found by their names without the index.
+            os.remove(path)
+            download_all()
+            self.assertEqual(self.server.stats["post"], stats["post"] * 2)
+            self.assertEqual(self.server.stats["media"], stats["media"])
+
+    def test_download_all_with_writer(self):
+        urls = [
+            f"{self.base_url}/p/{sc}" for sc in self.instagram.users["user1"]
+        ]
+
+        with tempfile.TemporaryDirectory() as tempdir, patch(
+            "instasave.utils.settings.BASE_URL", self.base_url
+        ), patch(
+            "instasave.instagram.post.STAGING_DIR",
+            os.path.join(tempdir, "staging"),
+        ), patch(
+            "builtins.print"
+        ):
+            index = DownloadIndex(os.path.join(tempdir, "out"))
+            writer = DiskWriter(maxsize=2, fsync=True)
+            Downloader(
+                {},
+                (tempdir, "out"),
+                session=self.session,
+                workers=4,
+                index=index,
+                writer=writer,
+            ).download_all(urls)
+            writer.close()
+
+            shortcodes = self.instagram.users["user1"]
+            complete = [index.is_complete(sc) for sc in shortcodes]
+            index.close()
+            staged = os.listdir(os.path.join(tempdir, "staging"))
+
+        self.assertEqual(complete, [True] * len(shortcodes))
+        self.assertEqual(staged, [])
+        self.assertEqual(
+            writer.stats["jobs"], self.server.stats["media"] + len(urls)
+        )
+        # Post folders are created by the writer.
+        self.assertGreaterEqual(writer.stats["folders"], len(urls))
+
+    def test_download_all_with_writer_and_processor(self):
+        urls = [
+            f"{self.base_url}/p/{sc}" for sc in self.instagram.users["user1"]
+        ]
+        release = threading.Event()
+
+        with tempfile.TemporaryDirectory() as tempdir, patch(
+            "instasave.utils.settings.BASE_URL", self.base_url
+        ), patch(
+            "instasave.instagram.post.STAGING_DIR",
+            os.path.join(tempdir, "staging"),
+        ), patch(
+            "builtins.print"
+        ):
+            index = DownloadIndex(os.path.join(tempdir, "out"))
+            writer = DiskWriter()
+            processor = PostProcessor(2)
+
+            # Files are processed while the writer is busy.
+            writer.submit(release.wait)
+            Downloader(
+                {},
+                (tempdir, "out"),
+                session=self.session,
+                workers=4,
+                index=index,
+                writer=writer,
+                processor=processor,
+            ).download_all(urls)
+
+            deadline = time.monotonic() + 10
+            while processor.stats["files"] < self.server.stats["media"]:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+            self.assertEqual(len(index), 0)
+            # Nothing is written to the download location but the writer.
+            self.assertFalse(
+                os.path.exists(os.path.join(tempdir, "out", "user1"))
+            )
+
+            release.set()
+            writer.close()
+            processor.close()
+
+            shortcodes = self.instagram.users["user1"]
+            complete = [index.is_complete(sc) for sc in shortcodes]
+            indexed = len(index)
+            index.close()
+
+        self.assertEqual(complete, [True] * len(shortcodes))
+        self.assertEqual(indexed, self.server.stats["media"])
@@ -0,0 +1,138 @@
+import time
+import unittest
+from email.utils import formatdate
+from unittest.mock import patch
+
+from instasave.web.ratelimit import (
+    CircuitBreaker,
+    RateLimiter,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    """Clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.multiple(
+            "instasave.web.ratelimit.time",
+            monotonic=self.clock.monotonic,
+            sleep=self.clock.sleep,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_bucket_allows_burst(self):
+        bucket = TokenBucket(rate=5)
+        for _ in range(5):
+            bucket.acquire()
+        self.assertEqual(self.clock.slept, [])
+
+    def test_token_bucket_waits_when_empty(self):
+        bucket = TokenBucket(rate=5)
+        for _ in range(7):
+            bucket.acquire()
+        self.assertEqual(len(self.clock.slept), 2)
+        self.assertAlmostEqual(self.clock.now, 1000.4)
+
+    def test_token_bucket_slow_down_and_speed_up(self):
+        bucket = TokenBucket(rate=10)
+        bucket.slow_down()
+        self.assertEqual(bucket.rate, 5)
+        for _ in range(10):
+            bucket.speed_up()
+        self.assertEqual(bucket.rate, 10)
+
+    def test_token_bucket_slows_down_once_per_window(self):
+        bucket = TokenBucket(rate=10)
+        self.assertTrue(bucket.slow_down())
+        # Responses throttled at the same time only halve the rate once.
+        self.assertFalse(bucket.slow_down())
+        self.assertFalse(bucket.slow_down())
+        self.assertEqual(bucket.rate, 5)
+        self.clock.sleep(0.2)
+        self.assertTrue(bucket.slow_down())
+        self.assertEqual(bucket.rate, 2.5)
+
+    def test_token_bucket_never_stops(self):
+        bucket = TokenBucket(rate=1)
+        for _ in range(20):
+            bucket.slow_down()
+            self.clock.sleep(60)
+        self.assertGreater(bucket.rate, 0)
+
+    def test_circuit_breaker_opens_after_threshold(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=60)
+        self.assertFalse(breaker.record(True))
+        self.assertFalse(breaker.record(True))
+        self.assertTrue(breaker.record(True))
+        self.assertTrue(breaker.is_open)
+        breaker.wait()
+        self.assertFalse(breaker.is_open)
+        self.assertAlmostEqual(sum(self.clock.slept), 60)
+
+    def test_circuit_breaker_resets_on_success(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.record(True)
+        breaker.record(False)
+        self.assertFalse(breaker.record(True))
+        self.assertFalse(breaker.is_open)
+
+    def test_circuit_breaker_honours_longer_delay(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        breaker.record(True, 600)
+        breaker.wait()
+        self.assertAlmostEqual(sum(self.clock.slept), 600)
+
+    def test_rate_limiter_throttled_uses_retry_after(self):
+        limiter = RateLimiter(rate=5)
+        self.assertEqual(limiter.throttled("host", 0, "7"), 7)
+        self.assertEqual(limiter.throttled_requests, 1)
+        self.assertEqual(limiter._bucket("host").rate, 2.5)
+
+    def test_rate_limiter_throttled_backs_off_exponentially(self):
+        limiter = RateLimiter(rate=5)
+        with patch("random.uniform", side_effect=lambda a, b: b):
+            delays = [limiter.throttled("host", i) for i in range(3)]
+        self.assertEqual(delays, [2, 4, 8])
+
+    def test_rate_limiter_buckets_per_host(self):
+        limiter = RateLimiter(rate=2)
+        for _ in range(2):
+            limiter.wait("a")
+            limiter.wait("b")
+        self.assertEqual(self.clock.slept, [])
+
+    def test_rate_limiter_without_rate(self):
+        limiter = RateLimiter(rate=0)
+        for _ in range(100):
+            limiter.wait("host")
+        self.assertEqual(self.clock.slept, [])
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_parse_retry_after_seconds(self):
+        self.assertEqual(parse_retry_after("120"), 120)
+
+    def test_parse_retry_after_date(self):
+        date = formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(date), 60, delta=2)
+
+    def test_parse_retry_after_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
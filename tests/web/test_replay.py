@@ -0,0 +1,112 @@
+import os.path
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+import requests
+
+from instasave.instagram.post import PostScraper
+from instasave.web.fakeserver import FakeInstagram, FakeServer
+from instasave.web.session import HTTPSession
+from instasave.web.transfer import PartialDownload
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.tempdir.name, "run.zip")
+        self.instagram = FakeInstagram(users=1, posts=3, media_size=4096)
+        self.shortcode = list(self.instagram.posts)[0]
+
+        server = FakeServer(instagram=self.instagram).start()
+        self.post_url = f"{server.base_url}/p/{self.shortcode}"
+        self.media_url = f"{server.base_url}/media/{self.shortcode}_0.jpg"
+
+        # Record a workload, then take the server down.
+        session = HTTPSession()
+        session.record(self.archive)
+        self.page = session.get(self.post_url).text
+        session.get(self.media_url, headers={"Range": "bytes=100-"})
+        session.get(self.media_url, stream=True)
+        session.close()
+        server.stop()
+
+        self.session = HTTPSession()
+        self.session.replay(self.archive)
+
+    def tearDown(self):
+        self.session.close()
+        self.tempdir.cleanup()
+
+    def test_archive_contains_every_exchange(self):
+        with zipfile.ZipFile(self.archive) as archive:
+            names = archive.namelist()
+        self.assertEqual(len(names), 4)
+        self.assertIn("index.json", names)
+
+    def test_download_is_streamed_while_recorded(self):
+        archive = os.path.join(self.tempdir.name, "stream.zip")
+        server = FakeServer(instagram=self.instagram).start()
+        url = f"{server.base_url}/media/{self.shortcode}_0.jpg"
+        session = HTTPSession()
+        session.record(archive)
+
+        r = session.get(url, stream=True)
+        self.assertEqual(r.raw.size, 0)
+        chunks = list(r.iter_content(1024))
+        self.assertEqual(r.raw.size, 4096)
+        r.close()
+
+        # A response that is never read is recorded when recording stops.
+        session.get(url, stream=True)
+        session.close()
+        server.stop()
+
+        with zipfile.ZipFile(archive) as f:
+            bodies = [f.read(name) for name in ["000000.body", "000001.body"]]
+        self.assertEqual(bodies, [b"".join(chunks)] * 2)
+
+    def test_replay_response(self):
+        r = self.session.get(self.post_url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.text, self.page)
+        self.assertEqual(self.session.stats["replayed"], 1)
+        self.assertEqual(self.session.stats["requests"], 0)
+        self.assertEqual(self.session.stats["reused"], 0)
+
+    def test_replay_range_request(self):
+        r = self.session.get(self.media_url, headers={"Range": "bytes=100-"})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(len(r.content), 4096 - 100)
+
+    def test_replay_post_and_download(self):
+        scraper = PostScraper({}, self.session)
+        url, _ = scraper.post_data(self.post_url)
+        self.assertEqual(scraper.shortcode, self.shortcode)
+
+        part = PartialDownload(
+            self.media_url, self.tempdir.name, session=self.session
+        )
+        with open(part.fetch(), "rb") as f:
+            content = f.read()
+        self.assertEqual(
+            content, self.instagram.media(f"{self.shortcode}_0.jpg")
+        )
+
+    def test_request_that_was_not_recorded(self):
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.session.get(self.post_url + "/other")
+
+    def test_replay_in_realtime(self):
+        self.session.replay(self.archive, realtime=True)
+        with patch("instasave.web.replay.time.sleep") as sleep:
+            self.session.get(self.post_url)
+        sleep.assert_called_once()
+        self.assertGreater(sleep.call_args[0][0], 0)
+
+    def test_archive_without_index(self):
+        with zipfile.ZipFile(self.archive, "w") as archive:
+            archive.writestr("000000.body", b"")
+        with self.assertRaises(SystemExit):
+            self.session.replay(self.archive)
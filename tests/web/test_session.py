@@ -0,0 +1,128 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+from instasave.web.ratelimit import RateLimiter
+from instasave.web.session import HTTPSession
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        # Fail or throttle the first requests.
+        if self.server.errors:
+            self.server.errors -= 1
+            self.send_response(500)
+        elif self.server.throttle:
+            self.server.throttle -= 1
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.server.throttle = 0
+        self.server.errors = 0
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_headers_are_sent_with_every_request(self):
+        session = HTTPSession({"User-Agent": "instasave"})
+        self.assertEqual(session.headers["User-Agent"], "instasave")
+        session.close()
+
+    def test_adapter_pool_settings(self):
+        session = HTTPSession(pool_connections=3, pool_maxsize=7)
+        self.assertIs(session.get_adapter("https://"), session.adapter)
+        self.assertIs(session.get_adapter("http://"), session.adapter)
+        self.assertEqual(session.adapter._pool_connections, 3)
+        self.assertEqual(session.adapter._pool_maxsize, 7)
+        session.close()
+
+    def test_adapter_retries(self):
+        session = HTTPSession(max_retries=5)
+        self.assertEqual(session.adapter.max_retries.total, 5)
+        session.close()
+
+    def test_stats_before_any_request(self):
+        session = HTTPSession()
+        self.assertEqual(
+            session.stats,
+            {
+                "requests": 0,
+                "connections": 0,
+                "replayed": 0,
+                "reused": 0,
+                "throttled": 0,
+            },
+        )
+        session.close()
+
+    def test_stats_count_reused_connections(self):
+        session = HTTPSession()
+        for _ in range(3):
+            self.assertEqual(session.get(self.url).text, "ok")
+        self.assertEqual(
+            session.stats,
+            {
+                "requests": 3,
+                "connections": 1,
+                "replayed": 0,
+                "reused": 2,
+                "throttled": 0,
+            },
+        )
+        session.close()
+
+    def test_throttled_requests_are_retried(self):
+        self.server.throttle = 2
+        session = HTTPSession(limiter=RateLimiter(rate=0))
+        r = session.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(session.stats["requests"], 3)
+        self.assertEqual(session.stats["throttled"], 2)
+        session.close()
+
+    def test_throttled_request_gives_up_after_retries(self):
+        self.server.throttle = 10
+        session = HTTPSession(limiter=RateLimiter(rate=0, retries=2))
+        r = session.get(self.url)
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(session.stats["requests"], 3)
+        session.close()
+
+    def test_throttled_request_without_limiter(self):
+        self.server.throttle = 1
+        session = HTTPSession()
+        self.assertEqual(session.get(self.url).status_code, 429)
+        session.close()
+
+    def test_server_errors_are_retried_without_throttling(self):
+        self.server.errors = 1
+        limiter = RateLimiter(rate=5)
+        session = HTTPSession(limiter=limiter)
+        self.assertEqual(session.get(self.url).status_code, 200)
+        self.assertEqual(session.stats["requests"], 2)
+        self.assertEqual(session.stats["throttled"], 0)
+        self.assertEqual(limiter._bucket(urlsplit(self.url).netloc).rate, 5)
+        session.close()
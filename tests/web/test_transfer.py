@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from instasave.web.session import HTTPSession
+from instasave.web.transfer import PartialDownload
+
+DATA = bytes(range(256)) * 400
+DIGEST = hashlib.blake2b(DATA, digest_size=20).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if server.ranges and match and if_range in [None, server.etag]:
+            start = int(match.group(1))
+
+        body = DATA[start:]
+        if start:
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(DATA) - 1}/{len(DATA)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+
+        # Break the connection half way through the first response.
+        if server.truncate:
+            server.truncate -= 1
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPartialDownload(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.requests = []
+        self.server.ranges = True
+        self.server.truncate = 0
+        self.server.etag = '"v1"'
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.url = self.base + "/media/video.mp4?oh=signature"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.output = self.tempdir.name
+        self.session = HTTPSession(max_retries=0)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tempdir.cleanup()
+
+    def interrupted(self, size, etag='"v1"'):
+        """Leave a part file from an interrupted download."""
+
+        part = PartialDownload(self.url, self.output)
+        with open(part.path, "wb") as f:
+            f.write(DATA[:size])
+        with open(part.path + ".json", "w") as f:
+            json.dump(
+                {
+                    "url": part._key,
+                    "etag": etag,
+                    "last_modified": None,
+                    "content_type": "video/mp4",
+                    "size": len(DATA),
+                },
+                f,
+            )
+
+    def fetch(self, url=None):
+        part = PartialDownload(url or self.url, self.output, {}, self.session)
+        with open(part.fetch(), "rb") as f:
+            return part, f.read()
+
+    def test_fetch_new_file(self):
+        part, data = self.fetch()
+        self.assertEqual(data, DATA)
+        self.assertEqual(part.content_type, "video/mp4")
+        self.assertEqual(part.digest, DIGEST)
+        self.assertEqual(os.path.basename(part.path), "video.mp4.part")
+        self.assertNotIn("Range", self.server.requests[0])
+
+    def test_fetch_resumes_with_range(self):
+        self.interrupted(1000)
+        part, data = self.fetch()
+        self.assertEqual(data, DATA)
+        self.assertEqual(self.server.requests[0]["Range"], "bytes=1000-")
+        self.assertEqual(self.server.requests[0]["If-Range"], '"v1"')
+        self.assertEqual(part.digest, DIGEST)
+
+    def test_fetch_server_ignores_range(self):
+        self.server.ranges = False
+        self.interrupted(1000)
+        part, data = self.fetch()
+        self.assertEqual(data, DATA)
+
+    def test_fetch_file_changed_on_server(self):
+        self.interrupted(1000, etag='"v0"')
+        part, data = self.fetch()
+        self.assertEqual(data, DATA)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(part.digest, DIGEST)
+
+    def test_fetch_resumes_broken_download(self):
+        self.server.truncate = 1
+        part, data = self.fetch()
+        self.assertEqual(data, DATA)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(
+            self.server.requests[1]["Range"], f"bytes={len(DATA) // 2}-"
+        )
+        self.assertEqual(part.digest, DIGEST)
+
+    def test_fetch_digest_includes_resumed_bytes(self):
+        self.interrupted(len(DATA) - 1)
+        part, data = self.fetch()
+        self.assertEqual(data, DATA)
+        self.assertEqual(part.digest, DIGEST)
+
+    def test_fetch_gives_up_after_retries(self):
+        self.server.truncate = 10
+        part = PartialDownload(self.url, self.output, {}, self.session)
+        with self.assertRaisesRegex(SystemExit, "^Couldn't download"):
+            part.fetch(retries=2)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertTrue(os.path.isfile(part.path + ".json"))
+
+    def test_fetch_not_found(self):
+        with self.assertRaisesRegex(SystemExit, "^Couldn't download"):
+            self.fetch(self.base + "/missing.jpg")
+
+    def test_remove_recorded_state(self):
+        part, data = self.fetch()
+        part.remove()
+        self.assertEqual(os.listdir(self.output), ["video.mp4.part"])